@@ -1,5 +1,6 @@
 import tops.dynamic as dps
 from tops.simulator import Simulator
+from tops.events import EventEngine
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -19,26 +20,6 @@ class ResultKeeper:
         return df
 
 
-class Events:
-    def __init__(self, sim, data):
-        self.data = data
-        self.next_event_time = None
-        self.next_event_data = None
-
-    def update(self, sim):
-        if len(self.data) == 0 and self.next_event_time is None:
-            # Could be stopped
-            return
-        
-        if self.next_event_time is None:
-            self.next_event_time, self.next_event_data = self.data.pop(0)
-
-        if self.next_event_time <= sim.sol.t:
-            if self.next_event_data[0] == 'line':
-                sim.ps.lines['Line'].event(sim.ps, self.next_event_data[1], self.next_event_data[2])
-            self.next_event_time = None
-
-
 if __name__ == '__main__':
 
     import tops.ps_models.ieee39 as model_data
@@ -51,13 +32,13 @@ if __name__ == '__main__':
     # ps.ode_fun(0, ps.x0)
     sim = Simulator(ps, dt=5e-3, t_end=10)
     res_keeper = ResultKeeper(sim)
-    events = Events(sim, [
-        (1, ('line', 'L16-19', 'disconnect')),
-        (1.2, ('line', 'L16-19', 'connect')),
-    ])
+    events = EventEngine(ps, [
+        (1, 'line', 'L16-19', 'disconnect'),
+        (1.2, 'line', 'L16-19', 'connect'),
+    ], dt=sim.dt)
+    events.attach(sim)
 
     sim.interface_functions['ResultKeeper'] = res_keeper.update
-    sim.interface_functions['Events'] = events.update
     sim.main_loop()
     
 
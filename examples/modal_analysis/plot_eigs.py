@@ -21,8 +21,8 @@ if __name__ == '__main__':
 
     # Get mode shape for electromechanical modes
     mode_idx = ps_lin.get_mode_idx(['em'], damp_threshold=0.3)
-    rev = ps_lin.rev
-    mode_shape = rev[np.ix_(ps.gen['GEN'].state_idx_global['speed'], mode_idx)]
+    report = ps_lin.modal_report(mode_idx)
+    mode_shape = report['speed_mode_shapes']
 
     # Plot mode shape
     fig, ax = plt.subplots(1, mode_shape.shape[1], subplot_kw={'projection': 'polar'})
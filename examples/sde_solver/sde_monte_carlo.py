@@ -0,0 +1,34 @@
+import matplotlib.pyplot as plt
+import tops.dynamic as dps
+from tops.solvers_sde import EulerDAE_SDE
+from tops.monte_carlo import MonteCarloSDE
+
+
+def setup():
+    # Called once in each worker process
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen_speed_state_idx = ps.gen['GEN'].state_idx_global['speed']
+
+    def make_solver(rng):
+        return EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, max_step=5e-3, dim_w=4,
+                            b=[(idx, 1e-3) for idx in gen_speed_state_idx], rng=rng)
+
+    return ps, make_solver
+
+
+if __name__ == '__main__':
+    mc = MonteCarloSDE(setup, signals=[('gen', 'GEN', 'speed')], n_paths=100, t_end=10, n_workers=4, seed=0)
+    mc.run()
+
+    fig, ax = plt.subplots(2)
+    ax[0].plot(mc.t, mc.mean, color='k')
+    for p, q in mc.quantiles.items():
+        ax[0].plot(mc.t, q.value, '--', alpha=0.5)
+    ax[0].set_ylabel('Gen speed')
+    ax[0].set_xlabel('Time [s]')
+    ax[1].semilogy(mc.psd_freq, mc.psd.mean)
+    ax[1].set_ylabel('PSD')
+    ax[1].set_xlabel('Frequency [Hz]')
+    plt.show()
@@ -3,7 +3,7 @@ from collections import defaultdict
 import matplotlib.pyplot as plt
 import time
 import tops.dynamic as dps
-from tops.solvers_sde import EulerDAE_SDE
+from tops.solvers_sde import EulerDAE_SDE, StateNoise
 import numpy as np
 
 if __name__ == '__main__':
@@ -27,18 +27,12 @@ if __name__ == '__main__':
     # Solver
     sol = EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, t_end, max_step=5e-3, dim_w = 2)
 
-    def b_func(t, x, v):
-        mat = np.zeros((len(sol.x), sol.dim_w))
-        mat[load_state_idx_g[0], 0] = 0.1
-        mat[load_state_idx_b[0], 0] = 0.1
-        mat[load_state_idx_g[1], 1] = 0.1
-        mat[load_state_idx_b[1], 1] = 0.1
-        return mat
-
-    # plt.imshow(b_func(*[None]*3))
-    # plt.show()
-
-    sol.b = b_func
+    # Noise source 0 acts on both filters of load 0, noise source 1 on both filters of load 1
+    sol.b = StateNoise(
+        state_idx=[load_state_idx_g[0], load_state_idx_b[0], load_state_idx_g[1], load_state_idx_b[1]],
+        gain=0.1,
+        noise_idx=[0, 0, 1, 1],
+    )
         
     # Initialize simulation
     t = 0
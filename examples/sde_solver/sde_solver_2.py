@@ -26,16 +26,8 @@ if __name__ == '__main__':
     # Solver
     sol = EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, t_end, max_step=5e-3, dim_w = 4)
 
-    def b_func(t, x, v):
-        mat = np.zeros((len(sol.x), sol.dim_w))
-        for i, idx in enumerate(gen_speed_state_idx):
-            mat[idx, i] = 1e-3
-        return mat
-
-    # plt.imshow(b_func(*[None]*3))
-    # plt.show()
-
-    sol.b = b_func
+    # One independent noise source on the speed of each generator, given as (state index, gain) pairs
+    sol.b = [(idx, 1e-3) for idx in gen_speed_state_idx]
         
     # Initialize simulation
     t = 0
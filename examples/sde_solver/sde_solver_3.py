@@ -0,0 +1,54 @@
+import sys
+from collections import defaultdict
+import matplotlib.pyplot as plt
+import tops.dynamic as dps
+from tops.solvers_sde import EulerDAE_SDE, InputNoise
+import numpy as np
+
+if __name__ == '__main__':
+
+    # Load model
+    import tops.ps_models.k2a as model_data
+    model = model_data.load()
+    model['loads'] = {'DynamicLoadFiltered':  [
+        model['loads'][0] + ['T_g', 'T_b'],
+        *[row + [0.1, 0.1] for row in model['loads'][1:]]
+    ]}
+
+    # Power system model
+    ps = dps.PowerSystemModel(model=model)
+    ps.init_dyn_sim()
+    load = ps.loads['DynamicLoadFiltered']
+
+    t_end = 20
+    # Solver, with noise injected into the conductance setpoint of both loads (instead of into the states)
+    sol = EulerDAE_SDE(
+        ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, t_end, max_step=5e-3, dim_w=2,
+        input_noise=[InputNoise(load, 'g_setp', gain=0.01)]
+    )
+
+    # Initialize simulation
+    t = 0
+    res = defaultdict(list)
+
+    # Run simulation
+    while t < t_end:
+        sys.stdout.write("\r%d%%" % (t/(t_end)*100))
+
+        # Simulate next step
+        result = sol.step()
+        x = sol.y
+        v = sol.v
+        t = sol.t
+
+        res['time'].append(t)
+        res['g_load'].append(load.g_load(x, v).copy())
+        res['gen_speed'].append(ps.gen['GEN'].speed(x, v).copy())
+
+    fig, ax = plt.subplots(2, sharex=True)
+    ax[0].plot(res['time'], res['gen_speed'])
+    ax[0].set_ylabel('Gen speed')
+    ax[1].plot(res['time'], res['g_load'])
+    ax[1].set_ylabel('G Load [p.u.]')
+    ax[1].set_xlabel('Time [s]')
+    plt.show()
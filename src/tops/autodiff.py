@@ -0,0 +1,416 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as sp_linalg
+
+
+class DualArray(np.lib.mixins.NDArrayOperatorsMixin):
+    def __init__(self, val, tan):
+        '''
+        Array of dual numbers for forward mode automatic differentiation. Holds the values (val) and k tangents
+        (derivatives in k directions) for each element, with shape (k,) + val.shape. Works with NumPy ufuncs and
+        the most common array functions, so that model equations written with NumPy (e.g. state_derivatives of
+        DAEModels) give exact Jacobian-vector products for k directions in one evaluation.
+
+        Complex values are treated as pairs of real numbers (the tangents are d(real) + 1j*d(imag)), so
+        non-holomorphic functions (abs, conj, real, imag, angle) are differentiated correctly for real directions.
+
+        Indexing with slices gives views (as for ndarrays), and local_view-style structured views are supported
+        with view(dtype), so that models can write derivatives with dX['state'][:] = ...
+        :param val: Values.
+        :param tan: Tangents, shape (k,) + val.shape.
+        '''
+        self.val = val
+        self.tan = tan
+
+    @classmethod
+    def seed(cls, x, directions):
+        # Dual array with tangents given by the columns of directions (shape (len(x), k))
+        return cls(np.array(x, dtype=float), np.array(np.asarray(directions).T, dtype=float))
+
+    @classmethod
+    def zeros(cls, shape, n_tan, dtype=float):
+        shape = (shape,) if isinstance(shape, (int, np.integer)) else tuple(shape)
+        return cls(np.zeros(shape, dtype=dtype), np.zeros((n_tan,) + shape, dtype=dtype))
+
+    @property
+    def n_tan(self):
+        return self.tan.shape[0]
+
+    @property
+    def shape(self):
+        return np.shape(self.val)
+
+    @property
+    def ndim(self):
+        return np.ndim(self.val)
+
+    @property
+    def size(self):
+        return np.size(self.val)
+
+    @property
+    def dtype(self):
+        return np.result_type(self.val)
+
+    def __len__(self):
+        return len(self.val)
+
+    def __repr__(self):
+        return 'DualArray({}, n_tan={})'.format(self.val, self.n_tan)
+
+    @property
+    def real(self):
+        return DualArray(self.val.real, self.tan.real)
+
+    @property
+    def imag(self):
+        return DualArray(self.val.imag, self.tan.imag)
+
+    def conj(self):
+        return DualArray(np.conj(self.val), np.conj(self.tan))
+
+    def copy(self):
+        return DualArray(np.copy(self.val), self.tan.copy())
+
+    def astype(self, dtype):
+        return DualArray(self.val.astype(dtype), self.tan.astype(dtype))
+
+    def flatten(self):
+        return DualArray(self.val.flatten(), self.tan.reshape(self.n_tan, -1))
+
+    def reshape(self, *shape):
+        shape = shape[0] if len(shape) == 1 and isinstance(shape[0], tuple) else shape
+        val = self.val.reshape(shape)
+        return DualArray(val, self.tan.reshape((self.n_tan,) + val.shape))
+
+    def sum(self, axis=None):
+        return _sum(self, axis=axis)
+
+    @staticmethod
+    def _tan_idx(idx):
+        # Index of tangents, for index idx of values
+        if isinstance(idx, DualArray):
+            idx = idx.val
+        if not isinstance(idx, tuple):
+            idx = (idx,)
+        return (slice(None),) + tuple(i.val if isinstance(i, DualArray) else i for i in idx)
+
+    def __getitem__(self, idx):
+        val = self.val[idx.val if isinstance(idx, DualArray) else idx]
+        return DualArray(val, self.tan[self._tan_idx(idx)])
+
+    def __setitem__(self, idx, value):
+        val_idx = idx.val if isinstance(idx, DualArray) else idx
+        self.val[val_idx] = value.val if isinstance(value, DualArray) else value
+        if isinstance(value, DualArray):
+            shape = self.tan[self._tan_idx(idx)].shape
+            self.tan[self._tan_idx(idx)] = np.broadcast_to(_expand(value, len(shape) - 1), shape)
+        else:
+            self.tan[self._tan_idx(idx)] = 0
+
+    def view(self, dtype):
+        # Structured view (as x[idx].view(dtype=dtypes) in local_view), with one field per state
+        return DualRecords(self, [field[0] for field in np.dtype(dtype).descr])
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        out = kwargs.pop('out', None)
+        if method == 'at' and ufunc in (np.add, np.subtract):
+            target, idx, value = inputs[0], inputs[1], inputs[2] if len(inputs) > 2 else None
+            if not isinstance(target, DualArray):
+                return NotImplemented
+            value_val = value.val if isinstance(value, DualArray) else value
+            ufunc.at(target.val, idx, value_val)
+            if isinstance(value, DualArray):
+                shape = target.tan[self._tan_idx(idx)].shape
+                ufunc.at(target.tan, self._tan_idx(idx), np.broadcast_to(_expand(value, len(shape) - 1), shape))
+            return None
+        if method != '__call__' or ufunc not in _ufuncs or kwargs:
+            return NotImplemented
+
+        result = _ufuncs[ufunc](*inputs)
+        if out is not None:
+            target = out[0]
+            if isinstance(target, DualArray) and isinstance(result, DualArray):
+                target.val[...] = result.val
+                target.tan[...] = np.broadcast_to(_expand(result, target.ndim), target.tan.shape)
+                return target
+            return NotImplemented
+        return result
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func not in _functions:
+            return NotImplemented
+        return _functions[func](*args, **kwargs)
+
+
+class DualRecords:
+    def __init__(self, x, fields):
+        # Fields of a DualArray (interleaved, as in the state vector of a model)
+        self.x = x
+        self.fields = fields
+
+    def __getitem__(self, field):
+        return self.x[self.fields.index(field)::len(self.fields)]
+
+    def __setitem__(self, field, value):
+        self.x[self.fields.index(field)::len(self.fields)] = value
+
+
+def value(x):
+    # Values of dual arrays, and the input for other types
+    return x.val if isinstance(x, DualArray) else x
+
+
+def _expand(x, ndim):
+    # Tangents of x, with dimensions inserted after the first axis, for broadcasting with values with ndim dimensions
+    return x.tan.reshape((x.n_tan,) + (1,)*(ndim - x.ndim) + x.shape)
+
+
+def _result(val, terms):
+    # Dual array with values val, and tangents from the sum of terms (pairs of dual array and factor)
+    tan = None
+    for x, factor in terms:
+        if not isinstance(x, DualArray):
+            continue
+        term = _expand(x, np.ndim(val))*factor
+        tan = term if tan is None else tan + term
+    return DualArray(val, np.broadcast_to(tan, tan.shape[:1] + np.shape(val)).copy())
+
+
+def _unary(f, df):
+    def fun(x):
+        val = f(x.val)
+        return _result(val, [(x, df(x.val, val))])
+    return fun
+
+
+def _absolute(x):
+    val = np.abs(x.val)
+    if np.iscomplexobj(x.val):
+        factor = np.divide(np.conj(x.val), val, out=np.zeros_like(x.val), where=val != 0)
+        return DualArray(val, (_expand(x, x.ndim)*factor).real)
+    return _result(val, [(x, np.sign(x.val))])
+
+
+def _angle(z, deg=False):
+    if not isinstance(z, DualArray):
+        return np.angle(z, deg)
+    val = np.angle(z.val)
+    abs2 = np.abs(z.val)**2
+    factor = np.divide(np.conj(z.val), abs2, out=np.zeros_like(z.val*1j), where=abs2 != 0)
+    tan = (z.tan*factor).imag
+    if deg:
+        return DualArray(np.rad2deg(val), np.rad2deg(tan))
+    return DualArray(val, tan)
+
+
+def _add(a, b):
+    return _result(value(a) + value(b), [(a, 1), (b, 1)])
+
+
+def _subtract(a, b):
+    return _result(value(a) - value(b), [(a, 1), (b, -1)])
+
+
+def _multiply(a, b):
+    return _result(value(a)*value(b), [(a, value(b)), (b, value(a))])
+
+
+def _divide(a, b):
+    val = value(a)/value(b)
+    return _result(val, [(a, 1/value(b)), (b, -val/value(b))])
+
+
+def _power(a, b):
+    val = value(a)**value(b)
+    terms = [(a, value(b)*value(a)**(value(b) - 1))]
+    if isinstance(b, DualArray):
+        terms.append((b, val*np.log(value(a))))
+    return _result(val, terms)
+
+
+def _arctan2(a, b):
+    val = np.arctan2(value(a), value(b))
+    r2 = value(a)**2 + value(b)**2
+    return _result(val, [(a, value(b)/r2), (b, -value(a)/r2)])
+
+
+def _select(compare):
+    def fun(a, b):
+        take_a = compare(value(a), value(b))
+        val = np.where(take_a, value(a), value(b))
+        return _result(val, [(a, take_a*1.), (b, ~take_a*1.)])
+    return fun
+
+
+def _constant(f):
+    # Functions with zero derivative (or non-differentiable output, e.g. comparisons)
+    def fun(*args):
+        return f(*[value(arg) for arg in args])
+    return fun
+
+
+_ufuncs = {
+    np.add: _add,
+    np.subtract: _subtract,
+    np.multiply: _multiply,
+    np.true_divide: _divide,
+    np.power: _power,
+    np.arctan2: _arctan2,
+    np.maximum: _select(np.greater_equal),
+    np.minimum: _select(np.less_equal),
+    np.fmax: _select(np.greater_equal),
+    np.fmin: _select(np.less_equal),
+    np.negative: lambda x: DualArray(-x.val, -x.tan),
+    np.positive: lambda x: x.copy(),
+    np.conjugate: lambda x: x.conj(),
+    np.absolute: _absolute,
+    np.exp: _unary(np.exp, lambda x, y: y),
+    np.log: _unary(np.log, lambda x, y: 1/x),
+    np.sqrt: _unary(np.sqrt, lambda x, y: 0.5/y),
+    np.square: _unary(np.square, lambda x, y: 2*x),
+    np.reciprocal: _unary(np.reciprocal, lambda x, y: -y**2),
+    np.sin: _unary(np.sin, lambda x, y: np.cos(x)),
+    np.cos: _unary(np.cos, lambda x, y: -np.sin(x)),
+    np.tan: _unary(np.tan, lambda x, y: 1 + y**2),
+    np.tanh: _unary(np.tanh, lambda x, y: 1 - y**2),
+    np.arctan: _unary(np.arctan, lambda x, y: 1/(1 + x**2)),
+    np.arcsin: _unary(np.arcsin, lambda x, y: 1/np.sqrt(1 - x**2)),
+    np.arccos: _unary(np.arccos, lambda x, y: -1/np.sqrt(1 - x**2)),
+}
+for _ufunc in [np.sign, np.floor, np.ceil, np.rint, np.isnan, np.isfinite, np.isinf, np.greater, np.greater_equal,
+               np.less, np.less_equal, np.equal, np.not_equal, np.logical_and, np.logical_or, np.logical_not]:
+    _ufuncs[_ufunc] = _constant(_ufunc)
+
+
+def _as_dual(x, n_tan):
+    if isinstance(x, DualArray):
+        return x
+    x = np.asarray(x)
+    return DualArray(x, np.zeros((n_tan,) + x.shape, dtype=x.dtype))
+
+
+def _n_tan(arrays):
+    return next(x.n_tan for x in arrays if isinstance(x, DualArray))
+
+
+def _concatenate(arrays, axis=0):
+    n_tan = _n_tan(arrays)
+    arrays = [_as_dual(x, n_tan) for x in arrays]
+    return DualArray(np.concatenate([x.val for x in arrays], axis=axis),
+                     np.concatenate([x.tan for x in arrays], axis=axis + 1 if axis >= 0 else axis))
+
+
+def _stack(arrays, axis=0):
+    n_tan = _n_tan(arrays)
+    arrays = [_as_dual(x, n_tan) for x in arrays]
+    return DualArray(np.stack([x.val for x in arrays], axis=axis),
+                     np.stack([x.tan for x in arrays], axis=axis + 1 if axis >= 0 else axis))
+
+
+def _vstack(arrays):
+    n_tan = _n_tan(arrays)
+    return _concatenate([_as_dual(x, n_tan).reshape(1, -1) if np.ndim(value(x)) < 2 else x for x in arrays])
+
+
+def _where(condition, a, b):
+    condition = value(condition)
+    val = np.where(condition, value(a), value(b))
+    return _result(val, [(a, condition*1.), (b, ~np.asarray(condition, dtype=bool)*1.)])
+
+
+def _sum(x, axis=None):
+    if axis is None:
+        return DualArray(np.sum(x.val), x.tan.reshape(x.n_tan, -1).sum(axis=1))
+    return DualArray(np.sum(x.val, axis=axis), np.sum(x.tan, axis=axis + 1 if axis >= 0 else axis))
+
+
+def _clip(x, a_min, a_max):
+    return np.minimum(np.maximum(x, a_min), a_max)
+
+
+def _zeros_like(x, dtype=None):
+    return DualArray.zeros(x.shape, x.n_tan, dtype=x.dtype if dtype is None else dtype)
+
+
+_functions = {
+    np.angle: _angle,
+    np.real: lambda x: x.real,
+    np.imag: lambda x: x.imag,
+    np.conj: lambda x: x.conj(),
+    np.concatenate: _concatenate,
+    np.stack: _stack,
+    np.vstack: _vstack,
+    np.where: _where,
+    np.sum: _sum,
+    np.clip: _clip,
+    np.copy: lambda x: x.copy(),
+    np.zeros_like: _zeros_like,
+    np.shape: lambda x: x.shape,
+    np.ndim: lambda x: x.ndim,
+    np.iscomplexobj: lambda x: np.iscomplexobj(x.val),
+    np.unwrap: lambda p, **kwargs: DualArray(np.unwrap(p.val, **kwargs), p.tan.copy()),
+}
+
+
+def solve_algebraic(ps, t, x):
+    '''
+    Solves the algebraic equations of a PowerSystemModel for a DualArray of states (as
+    PowerSystemModel.solve_algebraic). The network matrix is factorized once, and the tangents of the voltages are
+    found by solving with all tangents of the current injections (and variable admittances) at once:
+    dv = (Y)^-1*(di - dY*v).
+    '''
+    n_tan = x.n_tan
+    i_inj = DualArray.zeros(ps.n_bus_red, n_tan, dtype=complex)
+    for mdl in ps.mdl_instructions['current_injections']:
+        bus_idx_red, i_inj_mdl = mdl.current_injections(x, None)
+        np.add.at(i_inj, bus_idx_red, _as_dual(i_inj_mdl, n_tan))
+
+    y_var = sp.csr_matrix((ps.n_bus,)*2, dtype=complex)
+    y_var_entries = []
+    for mdl in ps.mdl_instructions['dyn_var_adm']:
+        data, (row_idx, col_idx) = mdl.dyn_var_adm(x, None)
+        data = _as_dual(data, n_tan).flatten()
+        row_idx, col_idx = row_idx.flatten(), col_idx.flatten()
+        y_var = y_var + sp.csr_matrix((data.val, (row_idx, col_idx)), shape=(ps.n_bus,)*2)
+        y_var_entries.append((data, row_idx, col_idx))
+
+    lu = sp_linalg.splu(sp.csc_matrix(ps.y_bus_red + y_var + ps.y_bus_red_mod, dtype=complex))
+    v = lu.solve(i_inj.val.astype(complex))
+    rhs = i_inj.tan.astype(complex)
+    for data, row_idx, col_idx in y_var_entries:
+        np.add.at(rhs, (slice(None), row_idx), -data.tan*v[col_idx])
+    return DualArray(v, lu.solve(rhs.T).T if n_tan > 0 else rhs)
+
+
+def jacobian(ps, t, x, directions=None):
+    '''
+    Jacobian (or Jacobian-vector products) of ps.ode_fun, computed with forward mode automatic differentiation in one
+    evaluation of the model equations.
+    :param ps: PowerSystemModel
+    :param x: States.
+    :param directions: Matrix with directions as columns (shape (n_states, k)). Defaults to the identity matrix, giving
+    the full Jacobian.
+    :return: ode_fun(t, x) and the Jacobian times directions (shape (n_states, k)).
+    '''
+    directions = np.eye(len(x)) if directions is None else directions
+    dx = ps.ode_fun(t, DualArray.seed(x, directions))
+    dx = _as_dual(dx, np.shape(directions)[1])
+    return dx.val, dx.tan.T
+
+
+def jacobian_colored(ps, t, x, pattern, colors):
+    '''
+    Sparse Jacobian of ps.ode_fun with automatic differentiation, with one direction per color of the columns (see
+    utility_functions.color_columns).
+    :return: Jacobian (sparse csr-matrix)
+    '''
+    pattern = sp.csc_matrix(pattern, dtype=bool)
+    n_colors = max(colors, default=-1) + 1
+    directions = np.zeros((len(x), n_colors))
+    directions[np.arange(len(x)), colors] = 1
+    _, jac_compressed = jacobian(ps, t, x, directions)
+
+    rows = pattern.indices
+    cols = np.repeat(np.arange(pattern.shape[1]), np.diff(pattern.indptr))
+    return sp.csr_matrix((jac_compressed[rows, colors[cols]], (rows, cols)), shape=pattern.shape)
@@ -6,14 +6,17 @@ class GEN(DAEModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        for req_attr, default in zip(['PF_n', 'N_par', 'R', 'X_l'], [1, 1, 0, 0]):
-            if not req_attr in self.par.dtype.names:
-                new_field = np.ones(len(self.par), dtype=[(req_attr, float)])
-                new_field[req_attr] *= default
-                self.par = dps_uf.combine_recarrays(self.par, new_field)
+        # Missing parameters are added with default values (in one operation)
+        defaults = [(req_attr, default) for req_attr, default in zip(['PF_n', 'N_par', 'R', 'X_l'], [1, 1, 0, 0])
+                    if not req_attr in self.par.dtype.names]
+        if len(defaults) > 0:
+            new_fields = np.empty(len(self.par), dtype=[(req_attr, float) for req_attr, _ in defaults])
+            for req_attr, default in defaults:
+                new_fields[req_attr] = default
+            self.par = dps_uf.combine_recarrays(self.par, new_fields)
  
         fix_idx = self.par['V_n'] == 0
-        gen_bus_idx = dps_uf.lookup_strings(self.par['bus'], self.sys_par['bus_names'])
+        gen_bus_idx = self.sys_par['bus_index'].lookup(self.par['bus'])
         self.par['V_n'][fix_idx] = self.sys_par['bus_v_n'][gen_bus_idx][fix_idx]
 
         fix_idx = self.par['S_n'] == 0
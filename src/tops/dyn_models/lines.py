@@ -1,6 +1,5 @@
 import numpy as np
 from tops.dyn_models.utils import DAEModel
-from tops.utility_functions import lookup_strings
 from scipy.sparse import lil_matrix
 
 
@@ -20,7 +19,17 @@ class Line(DAEModel):
         return {'from_bus': self.par['from_bus'], 'to_bus': self.par['to_bus']}
 
     def event(self, ps, line_name, event_name):
-        line_idx = lookup_strings(line_name, ps.lines['Line'].par['name'])
+        y_event = self.event_admittance(ps, line_name, event_name)
+        if y_event is not None:
+            ps.y_bus_red += y_event
+
+    def event_admittance(self, ps, line_name, event_name):
+        '''
+        Change of the reduced admittance matrix caused by connecting or disconnecting a line (None if the line
+        is not part of the reduced system). Used by event (and by tops.events.EventEngine, which sums the changes of
+        simultaneous events, to update the network once).
+        '''
+        line_idx = self.name_index.lookup(line_name)
 
         if event_name in ['connect', 'disconnect']:
 
@@ -37,7 +46,7 @@ class Line(DAEModel):
             admittance = self.admittance[line_idx]
             shunt = self.shunt[line_idx]
 
-            buses_in_red_sys = idx_from in ps.bus_idx_red and idx_to in ps.bus_idx_red
+            buses_in_red_sys = idx_from >= 0 and idx_to >= 0
             data = np.array([admittance + shunt/2,
                              admittance + shunt/2,
                              -admittance,
@@ -48,7 +57,7 @@ class Line(DAEModel):
                 cols_red = np.array([idx_from, idx_to, idx_to, idx_from])
                 y_line_red = lil_matrix((ps.n_bus_red,) * 2, dtype=complex)
                 y_line_red[rows_red, cols_red] = data
-                ps.y_bus_red += y_line_red*sign
+                return y_line_red*sign
 
             else:
                 print('Line buses are not in reduced system, line event failed.')
@@ -1,6 +1,7 @@
 import numpy as np
 from tops.dyn_models.utils import DAEModel
 from tops.dyn_models.blocks import TimeConstant
+from scipy.sparse import lil_matrix
 
 
 class Load(DAEModel):
@@ -9,6 +10,7 @@ class Load(DAEModel):
         self.data = data
         self.par = data
         self.n_units = len(data)
+        self.connected = np.ones(self.n_units, dtype=bool)
 
         self.bus_idx = np.array(np.zeros(self.n_units), dtype=[(key, int) for key in self.bus_ref_spec().keys()])
         self.bus_idx_red = np.array(np.zeros(self.n_units), dtype=[(key, int) for key in self.bus_ref_spec().keys()])
@@ -17,6 +19,32 @@ class Load(DAEModel):
     def bus_ref_spec(self):
         return {'terminal': self.par['bus']}
 
+    def event(self, ps, load_name, event_name, *args):
+        y_event = self.event_admittance(ps, load_name, event_name, *args)
+        if y_event is not None:
+            ps.y_bus_red += y_event
+
+    def event_admittance(self, ps, load_name, event_name, P=None, Q=None):
+        '''
+        Change of the reduced admittance matrix caused by connecting or disconnecting a load, or by changing its
+        power (event_name 'set', with P and Q in MW and MVAr, at the initial voltage).
+        '''
+        load_idx = self.name_index.lookup(load_name)
+        bus_idx = self.bus_idx_red['terminal'][load_idx]
+        y_old = self.y_load[load_idx]*self.connected[load_idx]
+        if event_name == 'connect':
+            self.connected[load_idx] = True
+        elif event_name == 'disconnect':
+            self.connected[load_idx] = False
+        elif event_name == 'set':
+            s_load = (P + 1j*Q)/self.sys_par['s_n']
+            self.y_load[load_idx] = np.conj(s_load/abs(self.v_0[load_idx])**2)
+        else:
+            return
+        y_event = lil_matrix((ps.n_bus_red,) * 2, dtype=complex)
+        y_event[bus_idx, bus_idx] = self.y_load[load_idx]*self.connected[load_idx] - y_old
+        return y_event
+
     def reduced_system(self):
         return self.par['bus']
 
@@ -33,10 +61,10 @@ class Load(DAEModel):
         self.I_n = self.sys_par['s_n']/(np.sqrt(3)*V_n)
 
     def dyn_const_adm(self):
-        return self.y_load, (self.bus_idx_red['terminal'],)*2
+        return self.y_load*self.connected, (self.bus_idx_red['terminal'],)*2
 
     def i(self, x, v):
-        return v[self.bus_idx_red['terminal']]*self.y_load
+        return v[self.bus_idx_red['terminal']]*self.y_load*self.connected
     
     def I(self, x, v):
         return self.i(x, v)*self.I_n
@@ -1,5 +1,6 @@
 import numpy as np
 from tops.dyn_models.utils import DAEModel
+from scipy.sparse import lil_matrix
 
 
 class Trafo(DAEModel):
@@ -17,6 +18,50 @@ class Trafo(DAEModel):
     def bus_ref_spec(self):
         return {'from_bus': self.par['from_bus'], 'to_bus': self.par['to_bus']}
 
+    def event(self, ps, trafo_name, event_name):
+        y_event = self.event_admittance(ps, trafo_name, event_name)
+        if y_event is not None:
+            ps.y_bus_red += y_event
+
+    def event_admittance(self, ps, trafo_name, event_name):
+        '''
+        Change of the reduced admittance matrix caused by connecting or disconnecting a transformer (None if the
+        transformer is not part of the reduced system).
+        '''
+        trafo_idx = self.name_index.lookup(trafo_name)
+
+        if event_name in ['connect', 'disconnect']:
+
+            if event_name == 'connect':
+                sign = 1
+                self.connected[trafo_idx] = True
+            elif event_name == 'disconnect':
+                sign = -1
+                self.connected[trafo_idx] = False
+
+            idx_from = self.bus_idx_red['from_bus'][trafo_idx]
+            idx_to = self.bus_idx_red['to_bus'][trafo_idx]
+
+            admittance = self.admittance[trafo_idx]
+            ratio_from = self.ratio_from_0[trafo_idx]
+            ratio_to = self.ratio_to_0[trafo_idx]
+
+            buses_in_red_sys = idx_from >= 0 and idx_to >= 0
+            data = np.array([ratio_from*np.conj(ratio_from)*admittance,
+                             ratio_to*np.conj(ratio_to)*admittance,
+                             -ratio_from*np.conj(ratio_to)*admittance,
+                             -np.conj(ratio_from)*ratio_to*admittance])
+
+            if buses_in_red_sys:
+                rows_red = np.array([idx_from, idx_to, idx_from, idx_to])
+                cols_red = np.array([idx_from, idx_to, idx_to, idx_from])
+                y_trafo_red = lil_matrix((ps.n_bus_red,) * 2, dtype=complex)
+                y_trafo_red[rows_red, cols_red] = data
+                return y_trafo_red*sign
+
+            else:
+                print('Transformer buses are not in reduced system, transformer event failed.')
+
     def init_extras(self):
         self.idx_from = self.bus_idx_red['from_bus']
         self.idx_to = self.bus_idx_red['to_bus']
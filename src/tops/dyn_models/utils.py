@@ -2,6 +2,7 @@ import numpy as np
 import inspect
 import functools
 import tops.utility_functions as dps_uf
+from tops.autodiff import DualArray
 from scipy.optimize import least_squares
 
 
@@ -29,8 +30,8 @@ def determine_connections(dyn_mdls, order_by='input'):
                         source_container = dyn_mdls[conn['source']['container']]
                         for source_mdl_key, source_mdl in source_container.items():
                             if conn['source']['mdl'] == '*' or conn['source']['mdl'] == source_mdl_key:
-                                source_idx, mask = dps_uf.lookup_strings(
-                                    conn['source']['id'], source_mdl.par['name'], return_mask=True
+                                source_idx, mask = source_mdl.name_index.lookup(
+                                    conn['source']['id'], return_mask=True
                                 )
                                 dest_idx = np.where(mask)[0]
                                 if len(source_idx) > 0:
@@ -55,8 +56,8 @@ def determine_connections(dyn_mdls, order_by='input'):
                         dest_container = dyn_mdls[dest_container_key]
                         for dest_mdl_key, dest_mdl in dest_container.items():
                             if conn['destination']['mdl'] == '*' or conn['destination']['mdl'] == dest_mdl_key:
-                                dest_idx, mask = dps_uf.lookup_strings(
-                                    conn['destination']['id'], dest_mdl.par['name'], return_mask=True
+                                dest_idx, mask = dest_mdl.name_index.lookup(
+                                    conn['destination']['id'], return_mask=True
                                 )
                                 source_idx = np.where(mask)[0]
                                 if len(dest_idx) > 0:
@@ -77,6 +78,14 @@ def determine_connections(dyn_mdls, order_by='input'):
 
 
 def get_submodules(mdl):
+    # Returns the model followed by all sub-modules (recursively, ordered by attribute name). Sub-modules of a
+    # DAEModel are registered when assigned as attributes (see DAEModel.__setattr__), so attributes are not inspected.
+    if isinstance(mdl, DAEModel):
+        output = [mdl]
+        for attr in sorted(mdl._submodules):
+            output += get_submodules(mdl._submodules[attr])
+        return output
+
     attributes = inspect.getmembers(mdl)
     attributes = [a for a in attributes if not (a[0].startswith('__') and a[0].endswith('__'))]
     output = [mdl]
@@ -90,7 +99,8 @@ def get_submodules(mdl):
 def output(f):
     @functools.wraps(f)
     def wrap(self, *args):
-        if self._store_output:
+        if self._store_output and not any(isinstance(arg, DualArray) for arg in args):
+            # Outputs are not cached for dual arrays (automatic differentiation)
             if not self._output_ready[f.__name__]:
                 # print('Output not ready, calculating output')
                 self._output_values[f.__name__] = f(self, *args)
@@ -114,6 +124,23 @@ class DynMdl:
 
 class DAEModel:
     """Base class for dynamic models"""
+    def __new__(cls, *args, **kwargs):
+        mdl = super().__new__(cls)
+        mdl.__dict__['_submodules'] = {}
+        return mdl
+
+    def __setattr__(self, name, value):
+        # Registry of sub-modules (blocks), used by get_submodules
+        if isinstance(value, DAEModel):
+            self._submodules[name] = value
+        elif name in self._submodules:
+            del self._submodules[name]
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        self._submodules.pop(name, None)
+        super().__delattr__(name)
+
     def __init__(self, par=None, sys_par=None, first_state_idx=0, n_units=None, **kwargs):
         # type(self)._ids = count(0)
         # self.id = next(type(self)._ids)
@@ -200,43 +227,38 @@ class DAEModel:
             return self._input_values[input_name]
         setattr(type(self), input_name, input)
 
+    @property
+    def name_index(self):
+        # Hash index of unit names (see utility_functions.NameIndex), rebuilt if par is replaced
+        par, index = self.__dict__.get('_name_index', (None, None))
+        if par is not self.par:
+            index = dps_uf.NameIndex(self.par['name'])
+            self._name_index = (self.par, index)
+        return index
+
     def add_blocks(self):
         """Sub-modules can be specified by overwriting this function"""
         pass
 
     def update_block_names(self):
         """Update names of modules and sub-modules"""
-        # names = [mdl.par['name'] for mdl in get_submodules(mdl_0)[1:]]
-        # np.array(names)[:, 1]
-
-        new_names = []
+        # Sub-modules with equal names (for all units) get suffixes -2, -3, ... in the order they are found
+        prefix = np.char.add(self.par['name'], '/')
+        counts = dict()
         for mdl in get_submodules(self)[1:]:
-            # print(mdl.par['name'])
-            concat_str = np.core.defchararray.add
-            new_names.append(concat_str(self.par['name'], concat_str('/', mdl.par['name'])))
-
-        unique, counts = np.unique(np.array(new_names), return_counts=True, axis=0)
-
-        for x in unique:
-            number = 0
-            for i in range(0, len(new_names)):
-                if np.array_equal(new_names[i], x):
-                    number += 1
-
-                    if number >= 2:
-                        # print(number, new_names[i])
-                        new_names[i] = concat_str(new_names[i], f'-{number}')
-
-        for mdl, names in zip(get_submodules(self)[1:], new_names):
+            names = np.char.add(prefix, mdl.par['name'])
+            key = tuple(names)
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] >= 2:
+                names = np.char.add(names, f'-{counts[key]}')
 
             if mdl.n_states > 0:
                 mdl.state_desc = np.vstack([
                     np.repeat(names, mdl.n_states),
                     np.tile(mdl.state_list(), mdl.n_units)]
                 ).T
-            names = np.array(names, dtype=[('name', names.dtype)])
-            old_par = dps_uf.remove_recarray_field(mdl.par, 'name')
-            mdl.par = dps_uf.combine_recarrays(names, old_par)
+            # The prefixed names are always longer, so the name column is replaced (name_index is rebuilt on use)
+            mdl.par = dps_uf.replace_str_col(mdl.par, 'name', names)
 
     def parse_input_data(self, **kwargs):
         """Read parameters from kwargs"""
@@ -252,11 +274,7 @@ class DAEModel:
             names.append('name')
             data.append(np.array([self.__class__.__name__]*len(list(kwargs.values())[0])))
 
-        entries = [entry for entry in zip(*data)]
-        col_dtypes = [np.array(col).dtype for col in data]
-        dtypes = [(name_, dtype_) for name_, dtype_ in zip(names, col_dtypes)]
-
-        return np.array(entries, dtype=dtypes)
+        return dps_uf.structured_array_from_columns(names, data)
 
     def local_view(self, x):
         return x[self.idx].view(dtype=self.dtypes)
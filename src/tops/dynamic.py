@@ -2,6 +2,8 @@ import numpy as np
 
 import tops.utility_functions as dps_uf
 import tops.dyn_models as mdl_lib
+import tops.autodiff as autodiff
+from tops.autodiff import DualArray
 import scipy.sparse as sp
 from scipy.sparse import linalg as sp_linalg
 from scipy.sparse import diags as sp_diags
@@ -50,6 +52,7 @@ class PowerSystemModel:
         self.slack_bus = model['slack_bus'] if 'slack_bus' in model else None
         self.buses = dps_uf.structured_array_from_list(model['buses'][0], model['buses'][1:])
         self.n_bus = len(self.buses)
+        self.bus_index = dps_uf.NameIndex(self.buses['name'])
 
         self.y_bus_lf = None
         self.power_flow_ready = False
@@ -80,6 +83,7 @@ class PowerSystemModel:
             'n_bus': self.n_bus,
             'bus_v_n': self.buses['V_n'],
             'bus_names': self.buses['name'],
+            'bus_index': self.bus_index,
             'red_to_full': None
         }
         self.dyn_mdls = []
@@ -145,7 +149,7 @@ class PowerSystemModel:
             for mdl in self.mdl_instructions['reduced_system']:
                 [buses_red.append(bus) for bus in mdl.reduced_system()]
 
-            bus_idx_red = dps_uf.lookup_strings(buses_red, self.buses['name'])
+            bus_idx_red = self.bus_index.lookup(buses_red)
         else:
             bus_idx_red = np.arange(self.n_bus)
 
@@ -154,11 +158,12 @@ class PowerSystemModel:
         self.bus_idx_red = bus_idx_red_sort
         self.n_bus_red = len(self.bus_idx_red)
 
+        bus_index_red = dps_uf.NameIndex(self.bus_idx_red)
         for mdl in self.mdl_instructions['bus_ref_spec']:
             for identifier, bus_names in mdl.bus_ref_spec().items():
-                bus_idx = dps_uf.lookup_strings(bus_names, self.buses['name'])
+                bus_idx = self.bus_index.lookup(bus_names)
                 mdl.bus_idx[identifier] = bus_idx
-                lookup, mask  = dps_uf.lookup_strings(bus_idx, self.bus_idx_red, return_mask=True)
+                lookup, mask = bus_index_red.lookup(bus_idx, return_mask=True)
                 mdl.bus_idx_red[identifier][mask] = lookup
                 mdl.bus_idx_red[identifier][~mask] = -99999
 
@@ -214,7 +219,7 @@ class PowerSystemModel:
             sl_idx = bus_idx[0]
             self.slack_bus = self.buses[sl_idx]['name']
         else:
-            sl_idx = dps_uf.lookup_strings(self.slack_bus, self.buses['name'])
+            sl_idx = self.bus_index.lookup(self.slack_bus)
 
         for mdl in self.mdl_instructions['load_flow_pv']:
             bus_idx, p, v = mdl.load_flow_pv()
@@ -314,7 +319,11 @@ class PowerSystemModel:
                     input = init_vals
                     for c in conn:
                         source_fun = getattr(self.dyn_mdls_dict[c['container']][c['mdl']], c['output'])
-                        input[c['dest_idx']] = source_fun(x, v)[c['source_idx']]
+                        value = source_fun(x, v)[c['source_idx']]
+                        if isinstance(value, DualArray) and not isinstance(input, DualArray):
+                            # Automatic differentiation (see autodiff.py)
+                            input = DualArray(init_vals.copy(), np.zeros((value.n_tan,) + init_vals.shape))
+                        input[c['dest_idx']] = value
                     return input
                 setattr(mdl, input_key, new_input_fun)
         
@@ -342,7 +351,7 @@ class PowerSystemModel:
             mdl.reset_outputs()
             mdl._store_output = True
 
-        dx = np.zeros(self.n_states)
+        dx = DualArray.zeros(self.n_states, x.n_tan) if isinstance(x, DualArray) else np.zeros(self.n_states)
         for mdl in self.mdl_instructions['state_derivatives']:
             mdl.state_derivatives(dx, x, v_red)
 
@@ -358,6 +367,9 @@ class PowerSystemModel:
         :param x:
         :return:
         '''
+        if isinstance(x, DualArray):
+            return autodiff.solve_algebraic(self, t, x)
+
         i_inj = np.zeros(self.n_bus_red, dtype=complex)
         for mdl in self.mdl_instructions['current_injections']:
             bus_idx_red, i_inj_mdl = mdl.current_injections(x, None)
@@ -0,0 +1,116 @@
+import numpy as np
+import scipy.sparse as sp
+from tops.utility_functions import lookup_strings
+
+
+class EventEngine:
+    def __init__(self, ps, events, dt, t_0=0., fault_admittance=1e6):
+        '''
+        Timed events, given as a schedule instead of conditions in the simulation loop. Each event is a tuple
+        (t, kind, *args):
+            (t, 'fault', bus, 'apply' | 'clear'[, admittance])
+            (t, 'line', name, 'connect' | 'disconnect')
+            (t, 'trafo', name, 'connect' | 'disconnect')
+            (t, 'load', name, 'connect' | 'disconnect' | 'set'[, P, Q])   (static loads, P and Q in MW and MVAr)
+            (t, 'setpoint', (container, model, input), value[, unit])    (e.g. load steps of DynamicLoad g_setp)
+        Event times are aligned to the time steps: an event at time t is applied after the first step reaching t.
+        Events falling on the same step are applied together, with one update of the reduced admittance matrix and
+        one solution of the algebraic equations (if the network was changed). Events at the same step are applied in
+        the order they are given.
+
+        With a Simulator, use attach, which adds one timed function per group to the timing heap of the simulator,
+        so that no checks are done in steps without events. With a plain solver loop, call update(sol) after each
+        step.
+        :param ps: PowerSystemModel
+        :param events: List of events.
+        :param dt: Time step.
+        :param t_0: Start time.
+        :param fault_admittance: Fault admittance used when not given in the event.
+        '''
+        self.ps = ps
+        self.dt = dt
+        self.t_0 = t_0
+        self.fault_admittance = fault_admittance
+
+        events = sorted(events, key=lambda event: event[0])
+        for event in events:
+            self._check_event(event)
+        step_idx = np.ceil((np.array([event[0] for event in events]) - t_0)/dt - 1e-9).astype(int)
+        self.groups = []
+        for k in np.unique(step_idx):
+            self.groups.append((t_0 + k*dt, [event for event, k_ in zip(events, step_idx) if k_ == k]))
+        self._next = 0
+        self.log = []
+
+    def _check_event(self, event):
+        kinds = {'fault': ['apply', 'clear'], 'line': ['connect', 'disconnect'], 'trafo': ['connect', 'disconnect'],
+                 'load': ['connect', 'disconnect', 'set']}
+        kind = event[1]
+        if kind == 'setpoint':
+            return
+        if kind not in kinds:
+            raise ValueError('Unknown event type {}.'.format(kind))
+        if event[3] not in kinds[kind]:
+            raise ValueError('Unknown action {} for event type {}.'.format(event[3], kind))
+
+    def _bus_idx_red(self, bus_name):
+        bus_idx = self.ps.bus_index.lookup(bus_name)
+        bus_idx_red = lookup_strings(bus_idx, self.ps.bus_idx_red)
+        if np.isnan(bus_idx_red):
+            raise ValueError('Bus {} is not in reduced system.'.format(bus_name))
+        return int(bus_idx_red)
+
+    def apply(self, events, sol):
+        '''
+        Applies a group of events, with one network update and one solution of the algebraic equations.
+        '''
+        ps = self.ps
+        y_event = sp.csr_matrix((ps.n_bus_red,)*2, dtype=complex)
+        fault_admittances = dict()
+        for event in events:
+            kind, args = event[1], event[2:]
+            if kind == 'fault':
+                bus_name, action = args[:2]
+                admittance = args[2] if len(args) > 2 else self.fault_admittance
+                fault_admittances[self._bus_idx_red(bus_name)] = admittance if action == 'apply' else 0
+            elif kind == 'line':
+                y_event = y_event + ps.lines['Line'].event_admittance(ps, *args)
+            elif kind == 'trafo':
+                y_event = y_event + ps.trafos['Trafo'].event_admittance(ps, *args)
+            elif kind == 'load':
+                y_event = y_event + ps.loads['Load'].event_admittance(ps, *args)
+            elif kind == 'setpoint':
+                (container, mdl_key, input_name), value = args[:2]
+                mdl = getattr(ps, container)[mdl_key]
+                unit = args[2] if len(args) > 2 else None
+                idx = mdl.name_index.lookup(unit) if isinstance(unit, str) else unit
+                mdl.set_input(input_name, value, idx)
+
+        network_changed = y_event.nnz > 0 or len(fault_admittances) > 0
+        if y_event.nnz > 0:
+            ps.y_bus_red = ps.y_bus_red + y_event
+        if len(fault_admittances) > 0:
+            bus_idx = np.array(list(fault_admittances.keys()))
+            y_fault = np.array(list(fault_admittances.values())) - ps.y_bus_red_mod[bus_idx, bus_idx].A1
+            ps.y_bus_red_mod = ps.y_bus_red_mod + sp.csr_matrix(
+                (y_fault, (bus_idx, bus_idx)), shape=(ps.n_bus_red,)*2)
+        if network_changed:
+            sol.v[:] = ps.solve_algebraic(sol.t, sol.x)
+        self.log.append((sol.t, events))
+
+    def update(self, sol):
+        # For plain solver loops: applies events that are due after the last step
+        while self._next < len(self.groups) and sol.t >= self.groups[self._next][0] - 0.5*self.dt:
+            self.apply(self.groups[self._next][1], sol)
+            self._next += 1
+
+    def attach(self, sim, priority=0):
+        '''
+        Schedules the events in a Simulator, as timed functions. Events are applied together with the scheduled
+        interface functions due at the same step, in order of decreasing priority (see Simulator.add_interface_function),
+        i.e. after functions with higher priority and before functions with lower priority.
+        '''
+        for i, (t, events) in enumerate(self.groups[self._next:]):
+            sim.add_timed_function(t - 0.5*self.dt, lambda sim, events=events: self.apply(events, sim.sol),
+                                   name='EventEngine_{}_{}'.format(id(self), i), priority=priority)
+        self._next = len(self.groups)
@@ -0,0 +1,291 @@
+import asyncio
+import collections
+import json
+import socket
+import threading
+import numpy as np
+
+
+def encode_values(values):
+    # Complex values (e.g. voltages and currents) are encoded as [re, im] pairs, since JSON has no complex numbers
+    if np.iscomplexobj(values):
+        return np.stack([values.real, values.imag], axis=-1).tolist()
+    return values.tolist()
+
+
+class ClientWriter:
+    def __init__(self, writer, max_pending=1000):
+        '''
+        Outgoing messages to one client, written by a task that waits for the transport to drain after each
+        message, so that output for slow clients does not pile up: when max_pending messages are waiting, new data
+        messages are dropped (counted in n_dropped). Replies and errors are always queued.
+        Created and used in the event loop thread.
+        '''
+        self.writer = writer
+        self.max_pending = max_pending
+        self.pending = collections.deque()
+        self.ready = asyncio.Event()
+        self.n_dropped = 0
+        self.task = asyncio.ensure_future(self._write_messages())
+
+    def send(self, msg, droppable=False):
+        if droppable and len(self.pending) >= self.max_pending:
+            self.n_dropped += 1
+            return
+        try:
+            line = json.dumps(msg)
+        except (TypeError, ValueError) as e:
+            line = json.dumps({'op': 'error', 'message': 'Could not encode message: {}'.format(e)})
+        self.pending.append((line + '\n').encode())
+        self.ready.set()
+
+    async def _write_messages(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.pending:
+                    self.writer.write(self.pending.popleft())
+                    await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+
+class InterfaceServer:
+    def __init__(self, sim, host='127.0.0.1', port=0, path=None, name='InterfaceServer', max_pending=1000):
+        '''
+        Control interface to a running Simulator, for external controllers and test harnesses. An asyncio server
+        (TCP, or Unix socket if path is given) runs in its own thread, and exchanges newline-delimited JSON messages
+        with clients:
+            {"op": "subscribe", "id": "s1", "signals": [["gen", "GEN", "speed"], ...], "rate": 10}
+                Streams {"op": "data", "id": "s1", "t": t, "values": [...]} at the given rate (in simulated time). The
+                reply {"op": "subscribed", "id": "s1", "desc": [[unit, output], ...]} describes the values. Values of
+                complex outputs (e.g. voltages and currents) are sent as [re, im] pairs.
+            {"op": "unsubscribe", "id": "s1"}
+            {"op": "set", "setpoints": [["vsc", "VSC", "p_ref", value, unit], ...]}
+                Sets inputs (as DAEModel.set_input). The unit (name or index) is optional, and all setpoints in one
+                message are applied at the same step.
+        Errors are reported as {"op": "error", "message": ...}.
+
+        The simulation thread never waits for network I/O: requests are passed to it through a deque, which is
+        drained by an interface function after each step, and outgoing data is handed to the event loop with
+        call_soon_threadsafe. Messages are written to each client by its own task, which waits for the transport to
+        drain (see ClientWriter).
+        :param sim: Simulator
+        :param host: Host (for TCP).
+        :param port: Port (for TCP). With port=0, a free port is chosen (see self.address).
+        :param path: Path of Unix socket. If given, host and port are not used.
+        :param name: Name of interface function in the Simulator.
+        :param max_pending: Number of waiting messages per client before data messages are dropped.
+        '''
+        self.sim = sim
+        self.host = host
+        self.port = port
+        self.path = path
+        self.name = name
+        self.address = None
+        self.max_pending = max_pending
+
+        self.requests = collections.deque()
+        self.subscriptions = dict()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._clients = dict()
+        self._handlers = set()
+
+        sim.add_interface_function(self.name, self.interface_fun)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self.address
+
+    def stop(self):
+        with self.sim.interface_functions_lock:
+            self.sim.remove_interface_function(self.name)
+            for key in list(self.subscriptions):
+                self.sim.remove_interface_function(key)
+            self.subscriptions.clear()
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    async def _shutdown(self):
+        # Client connections are closed before waiting for the server, since wait_closed waits for all connections
+        # (Python >= 3.12)
+        self._server.close()
+        for client in list(self._clients.values()):
+            client.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        if self.path is not None:
+            self._server = self._loop.run_until_complete(asyncio.start_unix_server(self._handle_client, self.path))
+            self.address = self.path
+        else:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port))
+            self.address = self._server.sockets[0].getsockname()[:2]
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    # Event loop thread
+    async def _handle_client(self, reader, writer):
+        client = self._clients[writer] = ClientWriter(writer, max_pending=self.max_pending)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self._handle_message(json.loads(line), writer)
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send(writer, {'op': 'error', 'message': str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            self.requests.append(('disconnect', writer))
+            self._clients.pop(writer, None)
+            self._handlers.discard(asyncio.current_task())
+            client.close()
+            try:
+                await client.task
+            except asyncio.CancelledError:
+                pass
+
+    def _handle_message(self, msg, writer):
+        op = msg['op']
+        if op == 'subscribe':
+            if float(msg['rate']) <= 0:
+                raise ValueError('Rate must be positive.')
+            self.requests.append(('subscribe', writer, str(msg['id']), msg['signals'], float(msg['rate'])))
+        elif op == 'unsubscribe':
+            self.requests.append(('unsubscribe', writer, str(msg['id'])))
+        elif op == 'set':
+            self.requests.append(('set', writer, msg['setpoints']))
+        else:
+            raise ValueError('Unknown operation: {}'.format(op))
+
+    def _send(self, writer, msg, droppable=False):
+        # Messages to clients that have disconnected are discarded
+        if writer in self._clients:
+            self._clients[writer].send(msg, droppable=droppable)
+
+    def _send_data(self, writer, sub_id, t, values):
+        self._send(writer, {'op': 'data', 'id': sub_id, 't': t, 'values': values}, droppable=True)
+
+    def _send_threadsafe(self, writer, msg):
+        self._loop.call_soon_threadsafe(self._send, writer, msg)
+
+    # Simulation thread
+    def interface_fun(self, sim):
+        while self.requests:
+            request = self.requests.popleft()
+            op, writer = request[:2]
+            try:
+                if op == 'set':
+                    self._apply_setpoints(request[2])
+                elif op == 'subscribe':
+                    self._subscribe(writer, *request[2:])
+                elif op == 'unsubscribe':
+                    self._unsubscribe(writer, request[2])
+                elif op == 'disconnect':
+                    for key in [key for key, sub in self.subscriptions.items() if sub[0] is writer]:
+                        self._unsubscribe(writer, self.subscriptions[key][1])
+            except (ValueError, KeyError, TypeError, AttributeError, IndexError) as e:
+                self._send_threadsafe(writer, {'op': 'error', 'message': '{}: {}'.format(type(e).__name__, e)})
+
+    def _get_model(self, container, mdl_key):
+        return getattr(self.sim.ps, container)[mdl_key]
+
+    def _apply_setpoints(self, setpoints):
+        # All setpoints are validated before any are applied
+        resolved = []
+        for setpoint in setpoints:
+            container, mdl_key, input_name, value = setpoint[:4]
+            mdl = self._get_model(container, mdl_key)
+            if input_name not in mdl._input_values.dtype.names:
+                raise KeyError('{} has no input {}'.format(mdl_key, input_name))
+            idx = setpoint[4] if len(setpoint) > 4 else None
+            if isinstance(idx, str):
+                if idx not in mdl.name_index:
+                    raise KeyError('Unit {} not found in {}'.format(idx, mdl_key))
+                idx = mdl.name_index.lookup(idx)
+            resolved.append((mdl, input_name, value, idx))
+        for mdl, input_name, value, idx in resolved:
+            mdl.set_input(input_name, value, idx)
+
+    def _subscribe(self, writer, sub_id, signals, rate):
+        key = '{}:{}:{}'.format(self.name, id(writer), sub_id)
+        funs = []
+        desc = []
+        for container, mdl_key, output in signals:
+            mdl = self._get_model(container, mdl_key)
+            funs.append(getattr(mdl, output))
+            desc += [[name, output] for name in mdl.par['name']]
+
+        def send_data(sim):
+            x, v = sim.sol.x, sim.sol.v
+            values = []
+            for fun in funs:
+                values += encode_values(np.atleast_1d(fun(x, v)))
+            self._loop.call_soon_threadsafe(self._send_data, writer, sub_id, sim.sol.t, values)
+
+        self.subscriptions[key] = (writer, sub_id)
+        self._send_threadsafe(writer, {'op': 'subscribed', 'id': sub_id, 'desc': desc})
+        self.sim.add_interface_function(key, send_data, period=1/rate, phase=self.sim.sol.t)
+
+    def _unsubscribe(self, writer, sub_id):
+        key = '{}:{}:{}'.format(self.name, id(writer), sub_id)
+        if self.subscriptions.pop(key, None) is None:
+            raise KeyError('No subscription {}'.format(sub_id))
+        self.sim.remove_interface_function(key)
+
+
+class InterfaceClient:
+    def __init__(self, address):
+        '''
+        Simple blocking client for InterfaceServer.
+        :param address: (host, port) for TCP, or path of Unix socket.
+        '''
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.file = self.socket.makefile('r')
+
+    def send(self, msg):
+        self.socket.sendall((json.dumps(msg) + '\n').encode())
+
+    def receive(self):
+        return json.loads(self.file.readline())
+
+    def subscribe(self, sub_id, signals, rate):
+        self.send({'op': 'subscribe', 'id': sub_id, 'signals': [list(sig) for sig in signals], 'rate': rate})
+
+    def unsubscribe(self, sub_id):
+        self.send({'op': 'unsubscribe', 'id': sub_id})
+
+    def set(self, setpoints):
+        self.send({'op': 'set', 'setpoints': [list(sp) for sp in setpoints]})
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
@@ -1,5 +1,11 @@
 import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as sp_linalg
+import scipy.linalg as sc_linalg
+import warnings
 import tops.utility_functions as utils
+import tops.autodiff as ad
+from tops.dyn_models.utils import get_submodules
 
 
 class PowerSystemModelLinearization:
@@ -10,6 +16,7 @@ class PowerSystemModelLinearization:
         self.linearize_inputs_v2 = self.linearize_inputs
         self.linearization_ready = False
         self.eigenvalues_ready = False
+        self.tracked_modes = None
 
         self.a = np.empty((self.n,)*2)
         self.b = np.empty((self.n, 0))
@@ -22,21 +29,33 @@ class PowerSystemModelLinearization:
         self.freq = np.empty(self.n)
         self.damping = np.empty(self.n)
 
-    def linearize(self, get_eigs=False, ps=None, t0=0, x0=np.array([]), input_description=np.array([]), output_description=np.array([])):
+    def linearize(self, get_eigs=False, ps=None, t0=0, x0=np.array([]), input_description=np.array([]), output_description=np.array([]),
+                  sparse=False, check=True, autodiff=False):
         # Linearizes non-linear ODEs at operating point x0.
+        # With sparse=True, the A-matrix is computed with column coloring (see jacobian_pattern) and stored as a
+        # sparse matrix. With check=True, the result is verified in a random direction (falls back to the dense
+        # computation if the check fails).
+        # With autodiff=True, the A-matrix is computed exactly with forward mode automatic differentiation (see
+        # autodiff.py) in one evaluation of the model equations, instead of finite differences.
         if ps:
             self.ps = ps
 
         self.x0 = x0 if len(x0) > 0 else self.ps.x0
-        self.a = utils.jacobian_num(lambda x: self.ps.ode_fun(t0, x), self.x0, eps=self.eps)
+        if sparse:
+            self.a = self.linearize_sparse(t0, check=check, autodiff=autodiff)
+        elif autodiff and self._autodiff_supported(t0):
+            self.a = ad.jacobian(self.ps, t0, self.x0)[1]
+        else:
+            self.a = utils.jacobian_num(lambda x: self.ps.ode_fun(t0, x), self.x0, eps=self.eps)
         # self.n = self.a.shape[0]
+        self.snapshot = self.parameter_snapshot()
 
         if len(input_description) > 0:
             self.linearize_inputs(input_description)
         else:
             self.b = np.zeros((self.n, 0))
 
-        if len(input_description) > 0:
+        if len(output_description) > 0:
             self.linearize_outputs(output_description)
         else:
             self.c = np.zeros((0, self.n))
@@ -48,16 +67,295 @@ class PowerSystemModelLinearization:
 
         self.linearization_ready = True
 
+    def _autodiff_supported(self, t0=0):
+        # Checks that the model equations can be evaluated with dual arrays (i.e. only use supported NumPy functions)
+        try:
+            ad.jacobian(self.ps, t0, self.x0, np.zeros((self.n, 1)))
+            return True
+        except (TypeError, ValueError) as e:
+            warnings.warn('Automatic differentiation not supported by model ({}), using finite differences.'.format(e))
+            return False
+
+    def linearize_sparse(self, t0=0, check=True, autodiff=False):
+        f = lambda x: self.ps.ode_fun(t0, x)
+        self.pattern = self.jacobian_pattern(t0)
+        self.colors = utils.color_columns(self.pattern)
+        if autodiff and self._autodiff_supported(t0):
+            a = ad.jacobian_colored(self.ps, t0, self.x0, self.pattern, self.colors)
+        else:
+            a = utils.jacobian_num_colored(f, self.x0, self.pattern, self.colors, eps=self.eps)
+
+        if check:
+            d = np.random.default_rng(0).standard_normal(self.n)
+            eps = self.eps*np.sqrt(self.n)
+            df = (f(self.x0 + eps*d) - f(self.x0 - eps*d))/(2*eps)
+            if np.linalg.norm(df - a.dot(d)) > 1e-3*max(np.linalg.norm(df), 1):
+                warnings.warn('Sparse linearization failed directional check, using dense linearization.')
+                a = sp.csr_matrix(utils.jacobian_num(f, self.x0, eps=self.eps))
+        return a
+
+    def parameter_snapshot(self):
+        # Copies of the parameters of all models (with sub-modules) and the network, for detecting changes
+        ps = self.ps
+        return {
+            'par': {id(submodule): submodule.par.copy() for submodule in ps.dyn_mdls},
+            'network': (ps.y_bus_red.copy(), ps.y_bus_red_mod.copy()),
+        }
+
+    def changed_units(self):
+        '''
+        Finds the model units with parameters changed since the last linearization.
+        :return: Set of keys (id(model), unit) as in state_clusters (for top-level models), and whether any
+        parameters of models interfacing with the network (current injections and admittances) or the network
+        itself have changed.
+        '''
+        ps = self.ps
+        changed = set()
+        network_changed = any((y - y_0).count_nonzero() > 0
+                              for y, y_0 in zip([ps.y_bus_red, ps.y_bus_red_mod], self.snapshot['network']))
+        network_mdls = [mdl for key in ['current_injections', 'dyn_var_adm', 'dyn_const_adm']
+                        for mdl in ps.mdl_instructions[key]]
+        for mdls in ps.dyn_mdls_dict.values():
+            for mdl in mdls.values():
+                for submodule in get_submodules(mdl):
+                    par_0 = self.snapshot['par'].get(id(submodule))
+                    par = submodule.par
+                    if par_0 is None or par_0.dtype.names != par.dtype.names or len(par_0) != len(par):
+                        units = np.ones(mdl.n_units, dtype=bool)
+                    else:
+                        units = np.zeros(len(par), dtype=bool)
+                        for field in par.dtype.names:
+                            units |= par_0[field] != par[field]
+                        if len(par) != mdl.n_units:
+                            units = np.full(mdl.n_units, np.any(units))
+                    if np.any(units):
+                        changed |= {(id(mdl), unit) for unit in np.where(units)[0]}
+                        network_changed |= any(submodule is mdl_ for mdl_ in network_mdls)
+        return changed, network_changed
+
+    def relinearize(self, t0=0, mode_idx=None, autodiff=False):
+        '''
+        Updates the A-matrix after parameter changes (e.g. retuning of AVRs or PSSs), by recomputing only the rows
+        belonging to the states of the changed model units and of the units depending on their outputs (see
+        state_clusters). The columns are perturbed simultaneously with column coloring of the affected rows of the
+        Jacobian pattern. Falls back to a full linearization if models interfacing with the network (or the network
+        itself) have changed. The operating point x0 is kept, and so are the input and output matrices b and c in both
+        cases (see linearize_inputs and linearize_outputs to update them).
+        The eigenvalue decomposition is invalidated (eigenvalues_ready is set to False), but selected modes can be
+        tracked (see track_modes), without a new decomposition.
+        :param mode_idx: Indices of modes to track, in the last eigenvalue decomposition. The modes are tracked from
+        the decomposition, or from the last call with the same modes (if there has been no decomposition since). The
+        results are stored in self.tracked_modes, a dict with keys 'mode_idx', 'eigs', 'rev', 'lev' and 'mac', while
+        self.eigs, self.rev and self.lev are not changed.
+        :return: Indices of recomputed rows (all rows for a full linearization).
+        '''
+        if not self.linearization_ready:
+            self.linearize(t0=t0, autodiff=autodiff)
+            return np.arange(self.n)
+
+        changed, network_changed = self.changed_units()
+        if len(changed) == 0 and not network_changed:
+            return np.zeros(0, dtype=int)
+
+        eigenvalues_ready = self.eigenvalues_ready
+        if network_changed:
+            b, c = self.b, self.c
+            self.linearize(t0=t0, x0=self.x0, sparse=sp.issparse(self.a), autodiff=autodiff)
+            self.b, self.c = b, c
+            rows = np.arange(self.n)
+        else:
+            clusters, upstream = self.state_clusters()
+            rows = np.unique(np.concatenate([clusters[key] for key, sources in upstream.items()
+                                             if len(sources & changed) > 0] + [[]]).astype(int))
+            if not hasattr(self, 'pattern'):
+                self.pattern = self.jacobian_pattern(t0)
+            row_mask = np.isin(np.arange(self.n), rows)
+            pattern = sp.csc_matrix(sp.diags(row_mask.astype(float)).dot(sp.csr_matrix(self.pattern, dtype=float)))
+            colors = utils.color_columns(pattern)
+            if autodiff and self._autodiff_supported(t0):
+                a_rows = ad.jacobian_colored(self.ps, t0, self.x0, pattern, colors)
+            else:
+                f = lambda x: self.ps.ode_fun(t0, x)
+                a_rows = utils.jacobian_num_colored(f, self.x0, pattern, colors, eps=self.eps)
+
+            a_new = sp.diags((~row_mask).astype(float)).dot(sp.csr_matrix(self.a)) + a_rows
+            self.a = a_new.tocsr() if sp.issparse(self.a) else a_new.toarray()
+            self.snapshot = self.parameter_snapshot()
+
+        self.eigenvalues_ready = False
+        if mode_idx is not None:
+            mode_idx = np.atleast_1d(mode_idx)
+            tracked = self.tracked_modes
+            if tracked is not None and np.array_equal(tracked['mode_idx'], mode_idx):
+                eigs, rev, lev = tracked['eigs'], tracked['rev'], tracked['lev']
+            elif eigenvalues_ready:
+                eigs, rev = self.eigs[mode_idx], self.rev[:, mode_idx]
+                lev = self.lev[mode_idx]/np.sum(self.lev[mode_idx]*rev.T, axis=1)[:, None]
+            else:
+                raise ValueError('No eigenvalues to track the modes from, see eigenvalue_decomposition.')
+            eigs, rev, lev, mac = self.track_modes(eigs, rev, lev)
+            self.tracked_modes = {'mode_idx': mode_idx, 'eigs': eigs, 'rev': rev, 'lev': lev, 'mac': mac}
+        return rows
+
+    def state_clusters(self):
+        # Groups the states of each unit of each model (including sub-modules) into clusters, and finds the clusters
+        # that each cluster receives inputs from (directly or through other clusters).
+        ps = self.ps
+        clusters = dict()
+        for mdls in ps.dyn_mdls_dict.values():
+            for mdl in mdls.values():
+                for unit in range(mdl.n_units):
+                    clusters[(id(mdl), unit)] = []
+                for submodule in get_submodules(mdl):
+                    if submodule.n_states == 0:
+                        continue
+                    idx = np.array([submodule.state_idx_global[state] for state in submodule.state_list()]).T
+                    if submodule.n_units == mdl.n_units:
+                        for unit in range(mdl.n_units):
+                            clusters[(id(mdl), unit)] += list(idx[unit])
+                    else:
+                        for unit in range(mdl.n_units):
+                            clusters[(id(mdl), unit)] += list(idx.flatten())
+
+        sources = {key: set() for key in clusters}
+        for dest_mdl, connections in ps.mdl_connections.items():
+            for conn_list in connections.values():
+                for conn in conn_list:
+                    source_mdl = ps.dyn_mdls_dict[conn['container']][conn['mdl']]
+                    for source_unit, dest_unit in zip(conn['source_idx'], conn['dest_idx']):
+                        sources[(id(dest_mdl), dest_unit)].add((id(source_mdl), source_unit))
+
+        # Transitive closure: outputs of source models may depend on their own inputs
+        upstream = dict()
+        for key in clusters:
+            visited = {key}
+            stack = [key]
+            while stack:
+                for source in sources[stack.pop()]:
+                    if source not in visited:
+                        visited.add(source)
+                        stack.append(source)
+            upstream[key] = visited
+        return clusters, upstream
+
+    def jacobian_pattern(self, t0=0):
+        '''
+        Sparsity pattern of the A-matrix, given by
+            - states of each model unit (with sub-modules) depending on each other, and on the states of units
+              connected to its inputs (directly or indirectly),
+            - states depending on bus voltages (found by perturbing the voltages) depending on all states affecting
+              current injections or variable admittances (found by perturbing states in these functions only, which
+              does not require solving the network equations).
+        :return: Sparse boolean matrix.
+        '''
+        ps = self.ps
+        x0 = self.x0
+        n = self.n
+        clusters, upstream = self.state_clusters()
+
+        rows = []
+        cols = []
+        assigned = np.zeros(n, dtype=bool)
+        for key, idx in clusters.items():
+            assigned[idx] = True
+            idx_upstream = np.unique(np.concatenate([clusters[source] for source in upstream[key]] + [[]]).astype(int))
+            rows.append(np.repeat(idx, len(idx_upstream)))
+            cols.append(np.tile(idx_upstream, len(idx)))
+        # States not belonging to any cluster are assumed to depend on all states
+        for i in np.where(~assigned)[0]:
+            rows.append(np.full(n, i))
+            cols.append(np.arange(n))
+
+        # Rows depending on bus voltages
+        v0 = ps.solve_algebraic(t0, x0)
+        dv = 1e-6*np.array([1, 1j]).dot(np.random.default_rng(0).standard_normal((2, len(v0))))
+        v_rows = np.where(ps.state_derivatives(t0, x0, v0 + dv) != ps.state_derivatives(t0, x0, v0 - dv))[0]
+
+        # Columns affecting current injections or variable admittances
+        def injections(x):
+            out = []
+            for mdl in ps.mdl_instructions['current_injections']:
+                out.append(np.atleast_1d(mdl.current_injections(x, None)[1]).ravel())
+            for mdl in ps.mdl_instructions['dyn_var_adm']:
+                out.append(np.atleast_1d(mdl.dyn_var_adm(x, None)[0]).ravel())
+            return np.concatenate(out + [np.zeros(0)])
+
+        injecting = np.zeros(n, dtype=bool)
+        for j in range(n):
+            x1 = x0.copy()
+            x2 = x0.copy()
+            x1[j] += 1e-6
+            x2[j] -= 1e-6
+            injecting[j] = np.any(injections(x1) != injections(x2))
+        inj_cols = np.where(injecting)[0]
+        rows.append(np.repeat(v_rows, len(inj_cols)))
+        cols.append(np.tile(inj_cols, len(v_rows)))
+
+        rows = np.concatenate(rows).astype(int)
+        cols = np.concatenate(cols).astype(int)
+        return sp.csc_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n, n))
+
     def residues(self, mode_idx):
         if not self.eigenvalues_ready:
             self.eigenvalue_decomposition()
         return self.lev.dot(self.b)[[mode_idx], :]*self.c.dot(self.rev)[:, [mode_idx]]
 
+    def modal_report(self, mode_idx=None):
+        '''
+        Computes modal quantities for several modes at once, from the columns/rows of the eigenvector matrices
+        belonging to the selected modes:
+            'participation':      Participation factors p_ki = rev_ki*lev_ik, shape (n_states, n_modes). The sum over
+                                  the states is 1 for each mode (use abs for the magnitudes).
+            'state_desc':         Description (model, state) of each row in 'participation' (ps.state_desc).
+            'speed_mode_shapes':  Generator speed mode shapes, normalized such that the largest element is 1 for each
+                                  mode, shape (n_gen, n_modes).
+            'gen_names':          Names of generators (rows in 'speed_mode_shapes').
+            'residues':           Residues c.dot(rev_i)*lev_i.dot(b) of the input/output system (see linearize),
+                                  shape (n_modes, n_outputs, n_inputs).
+        Also included are 'mode_idx', 'eigs', 'freq' and 'damping' of the selected modes.
+        :param mode_idx: Indices of modes. Defaults to the electromechanical modes (see get_mode_idx).
+        :return: Dict with the quantities above.
+        '''
+        if not self.eigenvalues_ready:
+            self.eigenvalue_decomposition()
+        if mode_idx is None:
+            mode_idx = self.get_mode_idx(['em', 'non_conj'])
+        mode_idx = np.atleast_1d(mode_idx)
+        rev = self.rev[:, mode_idx]
+        lev = self.lev[mode_idx]
+
+        speed_idx = []
+        gen_names = []
+        for mdl in self.ps.gen.values():
+            if 'speed' in mdl.state_idx_global.dtype.names:
+                speed_idx.append(mdl.state_idx_global['speed'])
+                gen_names.append(mdl.par['name'])
+        speed_idx = np.concatenate(speed_idx + [np.zeros(0, dtype=int)])
+        speed_mode_shapes = rev[speed_idx]
+        if len(speed_idx) > 0:
+            max_idx = np.argmax(abs(speed_mode_shapes), axis=0)
+            scale = speed_mode_shapes[max_idx, np.arange(len(mode_idx))]
+            speed_mode_shapes = np.divide(speed_mode_shapes, scale, out=np.zeros_like(speed_mode_shapes),
+                                          where=scale != 0)
+
+        return {
+            'mode_idx': mode_idx,
+            'eigs': self.eigs[mode_idx],
+            'freq': self.freq[mode_idx],
+            'damping': self.damping[mode_idx],
+            'state_desc': self.ps.state_desc,
+            'participation': rev*lev.T,
+            'gen_names': np.concatenate(gen_names + [np.zeros(0, dtype=str)]),
+            'speed_mode_shapes': speed_mode_shapes,
+            'residues': self.c.dot(rev).T[:, :, None]*lev.dot(self.b)[:, None, :],
+        }
+
     def eigenvalue_decomposition(self):
         if not self.linearization_ready:
             self.linearize()
 
-        self.eigs, evs = np.linalg.eig(self.a)
+        a = self.a.toarray() if sp.issparse(self.a) else self.a
+        self.eigs, evs = np.linalg.eig(a)
 
         # Right/left rigenvectors (rev/lev)
         self.rev = evs
@@ -71,6 +369,381 @@ class PowerSystemModelLinearization:
         self.freq = self.eigs.imag / (2 * np.pi)
 
         self.eigenvalues_ready = True
+        self.tracked_modes = None
+
+    def eigenvalue_decomposition_targeted(self, targets=None, freq_range=[0.1, 3], damping=0.1, n_targets=10, k=10,
+                                          tol=1e-6):
+        '''
+        Computes only the eigenvalues closest to given targets (by default spread over the frequency range of
+        electromechanical modes), using ARPACK in shift-invert mode on the (sparse) A-matrix. Modes found for several
+        targets are only stored once (repeated eigenvalues are kept as long as the eigenvectors are linearly
+        independent). Left eigenvectors are computed by inverse iteration with (A - lambda*I)^T for each eigenvalue
+        (or group of repeated eigenvalues), instead of inverting the full matrix of right eigenvectors, and
+        normalized such that lev.dot(rev) = I.
+        Only modes with non-negative imaginary part are kept. The results are stored in the same attributes as for
+        eigenvalue_decomposition (eigs, rev, lev, freq, damping), but with one entry per mode found.
+        :param targets: Complex target points. Defaults to n_targets points in freq_range, with the given damping.
+        :param k: Number of eigenvalues computed for each target.
+        :param tol: Relative tolerance used to group (repeated) eigenvalues.
+        '''
+        if not self.linearization_ready:
+            self.linearize(sparse=True)
+
+        a = sp.csc_matrix(self.a, dtype=complex)
+        n = a.shape[0]
+        if targets is None:
+            omega = 2*np.pi*np.linspace(freq_range[0], freq_range[1], n_targets)
+            targets = omega*(-damping + 1j*np.sqrt(1 - damping**2))
+
+        def same(val_1, val_2):
+            return abs(val_1 - val_2) <= tol*max(1, abs(val_1))
+
+        eigs = []
+        rev = []
+        for target in targets:
+            try:
+                vals, vecs = sp_linalg.eigs(a, k=min(k, n - 2), sigma=target, ncv=min(n - 1, 4*k))
+            except sp_linalg.ArpackNoConvergence as e:
+                vals, vecs = e.eigenvalues, e.eigenvectors
+            for val, vec in zip(vals, vecs.T):
+                if val.imag < 0:
+                    continue
+                vec = vec/np.linalg.norm(vec)
+                group = [vec_ for val_, vec_ in zip(eigs, rev) if same(val, val_)]
+                if len(group) > 0:
+                    # Only keep if not in the span of the eigenvectors already found
+                    q, _ = np.linalg.qr(np.array(group).T)
+                    if np.linalg.norm(vec - q.dot(q.conj().T.dot(vec))) < 1e-3:
+                        continue
+                eigs.append(val)
+                rev.append(vec)
+
+        order = np.argsort(np.imag(eigs), kind='stable')
+        self.eigs = np.array(eigs, dtype=complex)[order]
+        self.rev = np.array(rev, dtype=complex).reshape(-1, n)[order].T
+        self.lev = np.zeros((len(self.eigs), n), dtype=complex)
+
+        eye = sp.identity(n, dtype=complex, format='csc')
+        rng = np.random.default_rng(0)
+        done = np.zeros(len(self.eigs), dtype=bool)
+        for i, val in enumerate(self.eigs):
+            if done[i]:
+                continue
+            group = np.array([j for j in range(len(self.eigs)) if not done[j] and same(val, self.eigs[j])])
+            done[group] = True
+            lu = sp_linalg.splu((a - (val + 1e-8*max(1, abs(val)))*eye).T.tocsc())
+            w = rng.standard_normal((n, len(group))) + 0j
+            for _ in range(3):
+                w = lu.solve(w)
+                w /= np.linalg.norm(w, axis=0)
+            # Bi-orthonormalize with the right eigenvectors
+            self.lev[group] = np.linalg.solve(w.T.dot(self.rev[:, group]), w.T)
+
+        self.damping = np.divide(
+            -self.eigs.real, abs(self.eigs),
+            out=np.zeros_like(self.eigs.real)*np.nan,
+            where=self.eigs.real != 0,
+        )
+        self.freq = self.eigs.imag / (2 * np.pi)
+
+        self.eigenvalues_ready = True
+        self.tracked_modes = None
+
+    def _expand_parameters(self, parameters):
+        # Parameters given as (model, field, unit), where model is a DAEModel or (container, key), and unit is an
+        # index, a name or None (all units).
+        expanded = []
+        for mdl, field, unit in parameters:
+            if isinstance(mdl, tuple):
+                mdl = getattr(self.ps, mdl[0])[mdl[1]]
+            if unit is None:
+                units = range(mdl.n_units)
+            elif isinstance(unit, str):
+                units = [int(mdl.name_index.lookup(unit))]
+            else:
+                units = [unit]
+            expanded += [(mdl, field, unit_) for unit_ in units]
+        return expanded
+
+    def _a_dot(self, t0, directions):
+        # A-matrix times directions, at the current parameters (exact with automatic differentiation if supported)
+        if self._autodiff_ok:
+            return ad.jacobian(self.ps, t0, self.x0, directions)[1]
+        eps = 1e-5
+        return np.array([(self.ps.ode_fun(t0, self.x0 + eps*d) - self.ps.ode_fun(t0, self.x0 - eps*d))/(2*eps)
+                         for d in directions.T]).T
+
+    def eigenvalue_sensitivities(self, parameters, mode_idx=None, t0=0, rel_step=None):
+        '''
+        Computes the sensitivities of eigenvalues to model parameters, dlambda/dp = lev.dot(dA/dp).dot(rev)/
+        lev.dot(rev), from the current eigenvalue decomposition. For each parameter, the directional derivatives
+        (dA/dp).dot(rev) for all selected modes are found from two evaluations of the model equations (with the
+        parameter increased and decreased), using automatic differentiation in the directions of the right
+        eigenvectors (finite differences if not supported by the model). No new linearization is needed.
+        For parameters of models contributing to the admittance matrix (e.g. X of lines), the reduced admittance
+        matrix is rebuilt for each evaluation (only the change is applied, so events are kept).
+        The operating point x0 is kept fixed, and parameters that are only used at initialization (or cached by
+        the model) are not captured.
+        :param parameters: List of (model, field, unit), where model is a DAEModel (also sub-modules, e.g.
+        ps.pss['STAB1'].gain) or (container, key), e.g. ('gen', 'GEN'), and unit is an index, a name or None (all
+        units).
+        :param mode_idx: Indices of modes. Defaults to the electromechanical modes (see get_mode_idx).
+        :param rel_step: Relative step size for the parameters.
+        :return: Sensitivities, shape (n_parameters, n_modes). The expanded list of parameters (one per unit) is
+        stored in self.sensitivity_parameters.
+        '''
+        if not self.eigenvalues_ready:
+            self.eigenvalue_decomposition()
+        if mode_idx is None:
+            mode_idx = self.get_mode_idx(['em', 'non_conj'])
+        mode_idx = np.atleast_1d(mode_idx)
+        ps = self.ps
+        self.x0 = getattr(self, 'x0', ps.x0)
+
+        rev = self.rev[:, mode_idx]
+        lev = self.lev[mode_idx]
+        directions = np.hstack([rev.real, rev.imag])
+        n_modes = len(mode_idx)
+        self._autodiff_ok = self._autodiff_supported(t0)
+        if rel_step is None:
+            rel_step = 1e-6 if self._autodiff_ok else 1e-4
+
+        self.sensitivity_parameters = self._expand_parameters(parameters)
+        network_mdls = ps.mdl_instructions['dyn_const_adm']
+        y_bus_dyn_0, red_to_full_0, y_bus_red_0 = ps.y_bus_dyn, ps.red_to_full, ps.y_bus_red
+        y_bus_red_nominal = None
+        sensitivities = np.zeros((len(self.sensitivity_parameters), n_modes), dtype=complex)
+        for i, (mdl, field, unit) in enumerate(self.sensitivity_parameters):
+            network = any(mdl is mdl_ for mdl_ in network_mdls)
+            if network and y_bus_red_nominal is None:
+                y_bus_red_nominal = ps.kron_reduction(ps.build_y_bus_dyn(), ps.bus_idx_red)
+
+            def set_par(par):
+                # Some models (e.g. Line and Load) read the parameters from mdl.data, which is the same array
+                if getattr(mdl, 'data', None) is mdl.par:
+                    mdl.data = par
+                mdl.par = par
+
+            par_0 = mdl.par
+            p_0 = par_0[field][unit]
+            h = rel_step*max(abs(p_0), 1)
+            a_v = []
+            try:
+                if not np.issubdtype(par_0.dtype[field], np.floating):
+                    # Integer parameters (e.g. gains given as integers in the model data) are perturbed in a
+                    # temporary copy with float dtype
+                    set_par(par_0.astype([(name, float if name == field else par_0.dtype[name])
+                                          for name in par_0.dtype.names]))
+                for p in [p_0 + h, p_0 - h]:
+                    mdl.par[field][unit] = p
+                    if network:
+                        y_bus_red = ps.kron_reduction(ps.build_y_bus_dyn(), ps.bus_idx_red)
+                        ps.y_bus_red = y_bus_red_0 + sp.csr_matrix(y_bus_red - y_bus_red_nominal)
+                    a_v.append(self._a_dot(t0, directions))
+            finally:
+                mdl.par[field][unit] = p_0
+                set_par(par_0)
+                if network:
+                    # The network models store their admittances (e.g. Line.admittance) when the admittance matrix
+                    # is built, so it is built again with the original parameters
+                    ps.build_y_bus_dyn()
+                    ps.y_bus_dyn, ps.red_to_full, ps.y_bus_red = y_bus_dyn_0, red_to_full_0, y_bus_red_0
+
+            da_v = (a_v[0] - a_v[1])/(2*h)
+            if not np.any(da_v):
+                warnings.warn('Parameter {} of {} (unit {}) does not change the model equations at the operating '
+                              'point (it may only be used at initialization).'.format(field, type(mdl).__name__,
+                                                                                       unit))
+            da_v = da_v[:, :n_modes] + 1j*da_v[:, n_modes:]
+            sensitivities[i] = np.sum(lev.T*da_v, axis=0)/np.sum(lev.T*rev, axis=0)
+
+        return sensitivities
+
+    def frequency_response(self, freq, method=None, b=None, c=None, d=None):
+        '''
+        Evaluates the frequency response c*(j*omega*I - a)^-1*b + d over a frequency grid, for all inputs and outputs
+        at once. With method='schur', a is reduced once to complex (upper triangular) Schur form a = z*t*z^H, so that
+        each frequency only needs a triangular solve. With method='lu' (for sparse a), (j*omega*I - a) is factorized
+        with sparse LU at each frequency. Defaults to 'lu' if a is sparse, and 'schur' otherwise.
+        :param freq: Frequencies in Hz.
+        :param b: Input matrix. Defaults to self.b (see linearize_inputs).
+        :param c: Output matrix. Defaults to self.c (see linearize_outputs).
+        :param d: Feedthrough matrix. Defaults to self.d, or zero if the shape of self.d does not match b and c.
+        :return: Frequency response, shape (len(freq), n_outputs, n_inputs).
+        '''
+        b = self.b if b is None else b
+        c = self.c if c is None else c
+        b = b.toarray() if sp.issparse(b) else np.asarray(b)
+        c = c.toarray() if sp.issparse(c) else np.asarray(c)
+        if d is None:
+            d = self.d if self.d.shape == (c.shape[0], b.shape[1]) else np.zeros((c.shape[0], b.shape[1]))
+        if method is None:
+            method = 'lu' if sp.issparse(self.a) else 'schur'
+
+        omega = 2*np.pi*np.atleast_1d(freq)
+        n = self.a.shape[0]
+        h = np.zeros((len(omega), c.shape[0], b.shape[1]), dtype=complex)
+        if method == 'schur':
+            a = self.a.toarray() if sp.issparse(self.a) else self.a
+            t, z = sc_linalg.schur(a, output='complex')
+            b_t = z.conj().T.dot(b)
+            c_t = c.dot(z)
+            for i, omega_ in enumerate(omega):
+                x = sc_linalg.solve_triangular(1j*omega_*np.eye(n) - t, b_t, check_finite=False)
+                h[i] = c_t.dot(x)
+        elif method == 'lu':
+            a = sp.csc_matrix(self.a, dtype=complex)
+            eye = sp.identity(n, dtype=complex, format='csc')
+            for i, omega_ in enumerate(omega):
+                x = sp_linalg.splu(1j*omega_*eye - a).solve(b.astype(complex))
+                h[i] = c.dot(x)
+        else:
+            raise ValueError('Unknown method {}.'.format(method))
+
+        return h + d
+
+    def _solver(self, a, sigma):
+        # Factorizes a - sigma*I, returning functions solving with the matrix and its transpose
+        n = a.shape[0]
+        if sp.issparse(a):
+            lu = sp_linalg.splu(sp.csc_matrix(a - sigma*sp.identity(n, format='csc'), dtype=complex))
+            return lu.solve, lambda b: lu.solve(b, trans='T')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            lu = sc_linalg.lu_factor(a - sigma*np.eye(n))
+        return lambda b: sc_linalg.lu_solve(lu, b), lambda b: sc_linalg.lu_solve(lu, b, trans=1)
+
+    def rayleigh_quotient_iteration(self, eig, rev, lev, tol=1e-8, max_iter=20):
+        '''
+        Two-sided Rayleigh quotient iteration on the current A-matrix, starting from an approximate eigenvalue and
+        approximate right and left eigenvectors (e.g. those of the same mode at a nearby operating point). Converges
+        cubically close to the eigenvalue, so typically only a few factorizations are needed.
+        :return: Eigenvalue, right eigenvector (unit norm), left eigenvector (scaled such that lev.dot(rev) = 1), and
+        whether the iteration converged.
+        '''
+        a = self.a
+        v = rev/np.linalg.norm(rev)
+        w = lev/np.linalg.norm(lev)
+        eig = complex(eig)
+        converged = False
+        for _ in range(max_iter):
+            if np.linalg.norm(a.dot(v) - eig*v) <= tol*max(1, abs(eig)):
+                converged = True
+                break
+            try:
+                solve, solve_t = self._solver(a, eig)
+            except RuntimeError:  # Exactly singular, so eig is an eigenvalue
+                converged = True
+                break
+            v = solve(v)
+            w = solve_t(w)
+            if not (np.all(np.isfinite(v)) and np.all(np.isfinite(w))):
+                break
+            v /= np.linalg.norm(v)
+            w /= np.linalg.norm(w)
+            eig = w.dot(a.dot(v))/w.dot(v)
+        else:
+            converged = np.linalg.norm(a.dot(v) - eig*v) <= tol*max(1, abs(eig))
+
+        return eig, v, w/w.dot(v), converged
+
+    def track_modes(self, eigs, rev, lev, eigs_pred=None, mac_threshold=0.8, tol=1e-8, max_iter=20, k=6):
+        '''
+        Finds the modes of the current A-matrix that continue the given modes (e.g. after a parameter change), by
+        Rayleigh quotient iteration started from the previous eigenvalues and eigenvectors. A mode is accepted if the
+        iteration converges and the modal assurance criterion (MAC) between the old and new right eigenvectors is
+        above mac_threshold, and if it was not already assigned to another tracked mode. Otherwise, k eigenvalues
+        closest to the predicted eigenvalue are computed with ARPACK, and the one with the highest MAC is used. If all
+        of them are already assigned to other tracked modes, the one closest to the predicted eigenvalue is used (with
+        a warning), and the mode is not tracked reliably (see the MAC value).
+        :param eigs: Eigenvalues of modes to track.
+        :param rev: Right eigenvectors (as columns).
+        :param lev: Left eigenvectors (as rows).
+        :param eigs_pred: Predicted eigenvalues (starting points). Defaults to eigs.
+        :return: Eigenvalues, right eigenvectors, left eigenvectors and MAC values.
+        '''
+        eigs_pred = eigs if eigs_pred is None else eigs_pred
+        n = self.a.shape[0]
+        eigs_new = np.zeros(len(eigs), dtype=complex)
+        rev_new = np.zeros((n, len(eigs)), dtype=complex)
+        lev_new = np.zeros((len(eigs), n), dtype=complex)
+        mac = np.zeros(len(eigs))
+
+        def get_mac(v_1, v_2):
+            return abs(np.vdot(v_1, v_2))/(np.linalg.norm(v_1)*np.linalg.norm(v_2))
+
+        def is_duplicate(i, eig, v):
+            return any(abs(eig - eigs_new[j]) <= 1e-6*max(1, abs(eig)) and get_mac(v, rev_new[:, j]) > 0.99
+                       for j in range(i))
+
+        for i in range(len(eigs)):
+            eig, v, w, converged = self.rayleigh_quotient_iteration(eigs_pred[i], rev[:, i], lev[i], tol, max_iter)
+            mac[i] = get_mac(rev[:, i], v)
+            if not converged or mac[i] < mac_threshold or is_duplicate(i, eig, v):
+                a = sp.csc_matrix(self.a, dtype=complex)
+                vals, vecs = sp_linalg.eigs(a, k=min(k, n - 2), sigma=eigs_pred[i], ncv=min(n - 1, 4*k))
+                candidates = [j for j, (val, vec) in enumerate(zip(vals, vecs.T)) if not is_duplicate(i, val, vec)]
+                if len(candidates) > 0:
+                    j = max(candidates, key=lambda j: get_mac(rev[:, i], vecs[:, j]))
+                else:
+                    warnings.warn('Mode {} could not be tracked: All {} eigenvalues closest to {:.4f} are assigned to '
+                                  'other modes. Using the closest one.'.format(i, len(vals), eigs_pred[i]))
+                    j = np.argmin(abs(vals - eigs_pred[i]))
+                eig, v, w, _ = self.rayleigh_quotient_iteration(vals[j], vecs[:, j], lev[i], tol, max_iter)
+                mac[i] = get_mac(rev[:, i], v)
+            eigs_new[i] = eig
+            rev_new[:, i] = v
+            lev_new[i] = w
+
+        return eigs_new, rev_new, lev_new, mac
+
+    def eigenvalue_sweep(self, set_parameter, values, mode_idx=None, sparse=False, t0=0, mac_threshold=0.8,
+                         tol=1e-8, max_iter=20, k=6):
+        '''
+        Tracks selected eigenvalues along a parameter path (root locus). The full eigenvalue decomposition is only
+        computed at the first point. At the following points, the system is linearized again and the modes are found
+        with track_modes, starting from a linear extrapolation of the previous eigenvalues.
+        :param set_parameter: Function set_parameter(value), changing the PowerSystemModel. If the operating point is
+        changed (e.g. loading), the function should also compute the power flow and initialize the dynamic
+        simulation (init_dyn_sim).
+        :param values: Parameter values.
+        :param mode_idx: Indices of modes to track, in the eigenvalues at the first point. Defaults to the
+        electromechanical modes (see get_mode_idx).
+        :param sparse: Use sparse linearization (see linearize).
+        :return: Eigenvalues, with shape (len(values), number of modes). The MAC-values between consecutive points
+        are stored in self.sweep_mac.
+        '''
+        set_parameter(values[0])
+        self.linearize(t0=t0, sparse=sparse)
+        self.eigenvalue_decomposition()
+        if mode_idx is None:
+            mode_idx = self.get_mode_idx(['em', 'non_conj'])
+        mode_idx = np.atleast_1d(mode_idx)
+
+        eigs = self.eigs[mode_idx]
+        rev = self.rev[:, mode_idx]
+        lev = self.lev[mode_idx]
+        # Left eigenvectors are scaled such that lev.dot(rev) = 1 for each mode
+        lev = lev/np.sum(lev*rev.T, axis=1)[:, None]
+
+        self.sweep_values = np.array(values)
+        self.sweep_eigs = np.zeros((len(values), len(mode_idx)), dtype=complex)
+        self.sweep_mac = np.ones((len(values), len(mode_idx)))
+        self.sweep_eigs[0] = eigs
+        for i in range(1, len(values)):
+            set_parameter(values[i])
+            self.linearize(t0=t0, sparse=sparse)
+            eigs_pred = eigs
+            if i > 1 and values[i - 1] != values[i - 2]:
+                slope = (self.sweep_eigs[i - 1] - self.sweep_eigs[i - 2])/(values[i - 1] - values[i - 2])
+                eigs_pred = eigs + slope*(values[i] - values[i - 1])
+            eigs, rev, lev, self.sweep_mac[i] = self.track_modes(
+                eigs, rev, lev, eigs_pred=eigs_pred, mac_threshold=mac_threshold, tol=tol, max_iter=max_iter, k=k)
+            self.sweep_eigs[i] = eigs
+
+        # The stored decomposition belongs to the first point
+        self.eigenvalues_ready = False
+        return self.sweep_eigs
 
     def linearize_inputs(self, input_description):
         # Perturbs values in PowerSystemModel-object, as indicated by "input_description", and computes
@@ -112,103 +785,72 @@ class PowerSystemModelLinearization:
         self.b = b
         return b
 
+    def output_jacobian(self, evaluate_outputs, n_outputs, dtype=complex):
+        # Perturbs each state once, and computes the derivatives of all outputs from the same evaluations.
+        # evaluate_outputs(x) should return an array with all outputs.
+        eps = self.eps
+        x = self.ps.x0.copy()
+        c = np.zeros((n_outputs, len(x)), dtype=dtype)
+        for j in range(len(x)):
+            x_1 = x.copy()
+            x_2 = x.copy()
+            x_1[j] += eps
+            x_2[j] -= eps
+            c[:, j] = (evaluate_outputs(x_1) - evaluate_outputs(x_2)) / (2 * eps)
+        return c
+
     def linearize_outputs(self, output_description):
         # Perturbs states in PowerSystemModel-object, as indicated by "output_description", and computes
         # the output matrix (or vector) "c" from the change in output.
         ps = self.ps
-        eps = self.eps
-        x = ps.x0.copy()
-        c = np.zeros((len(output_description), len(ps.x0)), dtype=complex)
-        for i, outp_ in enumerate(output_description):
-            c_tmp = np.zeros(ps.n_states, dtype=complex)
-            for j in range(ps.n_states):
+
+        def evaluate_outputs(x):
+            ps.ode_fun(0, x)
+            y = np.zeros(len(output_description), dtype=complex)
+            for i, outp_ in enumerate(output_description):
                 for outp__ in outp_:
                     var = outp__[0]
                     index = outp__[1]
                     gain = outp__[2] if len(outp__) == 3 else 1
+                    y[i] += getattr(ps, var)[index]*gain
+            return y
 
-                    x_1 = x.copy()
-                    x_2 = x.copy()
-
-                    x_1[j] += eps
-                    x_2[j] -= eps
-
-                    ps.ode_fun(0, x_1)
-                    var_1 = getattr(ps, var)[index]
-                    ps.ode_fun(0, x_2)
-                    var_2 = getattr(ps, var)[index]
-
-                    c_tmp[j] += (var_1 - var_2)/(2*eps)*gain
-
-            c[i, :] = c_tmp
-        self.c = c
-        return c
+        self.c = self.output_jacobian(evaluate_outputs, len(output_description))
+        return self.c
 
     def linearize_outputs_v3(self, output_description):
         # Perturbs states in PowerSystemModel-object, as indicated by "output_description", and computes
         # the output matrix (or vector) "c" from the change in output.
         ps = self.ps
-        eps = self.eps
-        x = ps.x0.copy()
-        c = np.zeros((len(output_description), len(ps.x0)), dtype=complex)
-        for i, outp_ in enumerate(output_description):
-            c_tmp = np.zeros(ps.n_states, dtype=complex)
-            for j in range(ps.n_states):
-                x_1 = x.copy()
-                x_2 = x.copy()
-                x_1[j] += eps
-                x_2[j] -= eps
-
-                ps.ode_fun(0, x_1)
-                var_1 = outp_(ps)
-                ps.ode_fun(0, x_2)
-                var_2 = outp_(ps)
-
-                c_tmp[j] += (var_1 - var_2) / (2 * eps)
-            c[i, :] = c_tmp
-        self.c = c
-        return c
 
-    def linearize_outputs_v4(self, output_description):
+        def evaluate_outputs(x):
+            ps.ode_fun(0, x)
+            return np.array([outp_(ps) for outp_ in output_description], dtype=complex)
 
+        self.c = self.output_jacobian(evaluate_outputs, len(output_description))
+        return self.c
+
+    def linearize_outputs_v4(self, output_description):
+        # Outputs are given as functions of (t, x, v). The algebraic equations are solved once for each perturbation,
+        # and all outputs are evaluated from the same solution.
         ps = self.ps
-        eps = self.eps
         t = 0
         x = ps.x0.copy()
         v = ps.v0.copy()
 
-        dtypes = np.zeros(len(output_description), dtype=np.dtype)
-        for i, outp_ in enumerate(output_description):
-            dtypes[i] = np.dtype(outp_(t, x, v))
-
-        if np.any(dtypes == 'complex128'):
+        dtypes = [np.asarray(outp_(t, x, v)).dtype for outp_ in output_description]
+        if any(np.issubdtype(dtype, np.complexfloating) for dtype in dtypes):
             dtype_c = 'complex128'
         else:
             dtype_c = 'float64'
 
-        c = np.zeros((len(output_description), len(ps.x0)), dtype=dtype_c)
-        for i, outp_ in enumerate(output_description):
-            c_tmp = np.zeros(ps.n_states, dtype=dtype_c)
-            for j in range(ps.n_states):
-                x_1 = x.copy()
-                x_2 = x.copy()
-                x_1[j] += eps
-                x_2[j] -= eps
-
-                t_1 = t
-                t_2 = t
-
-                ps.ode_fun(0, x_1)
-                v_1 = ps.solve_algebraic(0, x_1)
-                var_1 = outp_(t_1, x_1, v_1)
-                ps.ode_fun(0, x_2)
-                v_2 = ps.solve_algebraic(0, x_2)
-                var_2 = outp_(t_2, x_2, v_2)
-
-                c_tmp[j] += (var_1 - var_2) / (2 * eps)
-            c[i, :] = c_tmp
-        self.c = c
-        return c
+        def evaluate_outputs(x):
+            v = ps.solve_algebraic(t, x)
+            ps.state_derivatives(t, x, v)
+            return np.array([outp_(t, x, v) for outp_ in output_description], dtype=dtype_c)
+
+        self.c = self.output_jacobian(evaluate_outputs, len(output_description), dtype=dtype_c)
+        return self.c
 
     def get_mode_idx(self, mode_type=['em', 'non_conj'], damp_threshold=1, freq_range=[0.1, 3], sorted=True):
         # Get indices of modes from specified criteria.
@@ -0,0 +1,166 @@
+import numpy as np
+import scipy.linalg as sc_linalg
+import scipy.sparse as sp
+import scipy.sparse.linalg as sp_linalg
+from scipy import signal
+
+
+class LTIModel:
+    def __init__(self, a, b, c, d=None, hsv=None):
+        '''
+        Linear time-invariant state space model dx/dt = a*x + b*u, y = c*x + d*u (e.g. a reduced model from
+        balanced_truncation or krylov_reduction).
+        :param hsv: Hankel singular values of the stable part of the original model (from balanced_truncation).
+        '''
+        self.a = np.asarray(a)
+        self.b = np.asarray(b)
+        self.c = np.asarray(c)
+        self.d = np.zeros((self.c.shape[0], self.b.shape[1])) if d is None else np.asarray(d)
+        self.hsv = hsv
+        self.n_states = self.a.shape[0]
+        self.n_inputs = self.b.shape[1]
+        self.n_outputs = self.c.shape[0]
+
+    @classmethod
+    def from_linearization(cls, ps_lin):
+        # From a PowerSystemModelLinearization-object (after linearize, with inputs and outputs)
+        a = ps_lin.a.toarray() if sp.issparse(ps_lin.a) else ps_lin.a
+        d = ps_lin.d if ps_lin.d.shape == (ps_lin.c.shape[0], ps_lin.b.shape[1]) else None
+        return cls(a, ps_lin.b, ps_lin.c, d)
+
+    def frequency_response(self, freq):
+        # Frequency response, shape (len(freq), n_outputs, n_inputs). Frequencies in Hz.
+        omega = 2*np.pi*np.atleast_1d(freq)
+        eye = np.eye(self.n_states)
+        return np.array([self.c.dot(np.linalg.solve(1j*omega_*eye - self.a, self.b)) + self.d for omega_ in omega])
+
+    def discretize(self, dt):
+        # Zero order hold discretization: x[k + 1] = a_d*x[k] + b_d*u[k]
+        m = np.zeros((self.n_states + self.n_inputs,)*2)
+        m[:self.n_states, :self.n_states] = self.a
+        m[:self.n_states, self.n_states:] = self.b
+        m_d = sc_linalg.expm(m*dt)
+        return m_d[:self.n_states, :self.n_states], m_d[:self.n_states, self.n_states:]
+
+    def simulate(self, u, dt, x0=None):
+        '''
+        Simulates the model with piecewise constant inputs (exact zero order hold discretization).
+        :param u: Inputs, shape (n_steps, n_inputs).
+        :param dt: Time step.
+        :param x0: Initial state (deviation). Defaults to zero.
+        :return: Time, outputs (shape (n_steps, n_outputs)) and states (shape (n_steps, n_states)), where row k is
+        at time k*dt.
+        '''
+        u = np.asarray(u).reshape(-1, self.n_inputs)
+        a_d, b_d = self.discretize(dt)
+        x = np.zeros((len(u), self.n_states))
+        x[0] = 0 if x0 is None else x0
+        bu = u.dot(b_d.T)
+        for k in range(len(u) - 1):
+            x[k + 1] = a_d.dot(x[k]) + bu[k]
+        y = x.dot(self.c.T) + u.dot(self.d.T)
+        return dt*np.arange(len(u)), y, x
+
+    def to_state_space(self):
+        return signal.StateSpace(self.a, self.b, self.c, self.d)
+
+    def to_dict(self):
+        return {'a': self.a.tolist(), 'b': self.b.tolist(), 'c': self.c.tolist(), 'd': self.d.tolist()}
+
+
+def stable_unstable_split(a, b, c, margin=1e-6):
+    '''
+    Block diagonalizes a into a stable part (eigenvalues with real part < -margin) and the remaining part (unstable
+    or marginally stable modes, e.g. the zero eigenvalue of the rotor angles), using an ordered real Schur
+    decomposition and a Sylvester equation.
+    :return: (a, b, c) of the stable part and (a, b, c) of the remaining part.
+    '''
+    def is_stable(re, im=0.):
+        # Called with real and imaginary parts (real Schur form) or with the complex eigenvalue (complex Schur form)
+        return np.real(re) < -margin
+
+    t, z, k = sc_linalg.schur(a, output='complex' if np.iscomplexobj(a) else 'real', sort=is_stable)
+    x = sc_linalg.solve_sylvester(t[:k, :k], -t[k:, k:], -t[:k, k:])
+    # Transformation x_old = z*s*x_new, with s = [[I, x], [0, I]] (z is unitary)
+    b_t = z.conj().T.dot(b)
+    b_t[:k] -= x.dot(b_t[k:])
+    c_t = c.dot(z)
+    c_t[:, k:] += c_t[:, :k].dot(x)
+    return (t[:k, :k], b_t[:k], c_t[:, :k]), (t[k:, k:], b_t[k:], c_t[:, k:])
+
+
+def _sqrt_factor(p):
+    # Factor l such that p = l*l^H, for Hermitian positive semidefinite p
+    s, u = np.linalg.eigh((p + p.conj().T)/2)
+    return u*np.sqrt(np.maximum(s, 0))
+
+
+def balanced_truncation(a, b, c, d=None, n_states=None, tol=1e-6, margin=1e-6):
+    '''
+    Reduces a linear model by balanced truncation (square root method). The model is first split into a stable part
+    and the remaining (unstable or marginally stable) part, see stable_unstable_split. The stable part is balanced and
+    truncated, while the remaining part is kept as it is.
+    :param n_states: Number of states kept in the stable part. Defaults to the number of Hankel singular values
+    larger than tol times the largest one.
+    :param tol: Relative tolerance for Hankel singular values (if n_states is not given).
+    :param margin: Eigenvalues with real part >= -margin are not reduced.
+    :return: LTIModel, with the Hankel singular values of the stable part in the attribute hsv. The error bound in
+    the H-infinity norm is two times the sum of the truncated Hankel singular values.
+    '''
+    a = a.toarray() if sp.issparse(a) else np.asarray(a)
+    b = b.toarray() if sp.issparse(b) else np.asarray(b)
+    c = c.toarray() if sp.issparse(c) else np.asarray(c)
+    (a_s, b_s, c_s), (a_u, b_u, c_u) = stable_unstable_split(a, b, c, margin=margin)
+
+    # Gramians (conjugate transposes, for complex valued systems)
+    l_p = _sqrt_factor(sc_linalg.solve_continuous_lyapunov(a_s, -b_s.dot(b_s.conj().T)))
+    l_q = _sqrt_factor(sc_linalg.solve_continuous_lyapunov(a_s.conj().T, -c_s.conj().T.dot(c_s)))
+    u, hsv, vh = np.linalg.svd(l_q.conj().T.dot(l_p))
+    if n_states is None:
+        n_states = int(np.sum(hsv > tol*hsv[0])) if len(hsv) > 0 and hsv[0] > 0 else 0
+    n_states = min(n_states, len(hsv))
+
+    scale = 1/np.sqrt(hsv[:n_states])
+    t = l_p.dot(vh[:n_states].conj().T)*scale
+    t_inv = (u[:, :n_states]*scale).conj().T.dot(l_q.conj().T)
+
+    n_u = a_u.shape[0]
+    a_r = np.zeros((n_states + n_u,)*2, dtype=np.result_type(a_s, a_u, t))
+    a_r[:n_states, :n_states] = t_inv.dot(a_s).dot(t)
+    a_r[n_states:, n_states:] = a_u
+    b_r = np.vstack([t_inv.dot(b_s), b_u])
+    c_r = np.hstack([c_s.dot(t), c_u])
+    return LTIModel(a_r, b_r, c_r, d, hsv=hsv)
+
+
+def krylov_reduction(a, b, c, d=None, s0=(1.,), n_moments=10):
+    '''
+    Reduces a linear model by moment matching (rational Krylov method), for large sparse a. An orthonormal basis v of
+    the Krylov subspaces spanned by ((a - s*I)^-1)^k*(a - s*I)^-1*b, k = 0, ..., n_moments - 1, is computed for each
+    expansion point s (using one sparse LU factorization per point), and the model is projected onto it (one-sided,
+    x = v*x_r). The first n_moments moments of the transfer function around each expansion point are matched.
+    :param s0: Expansion points (rad/s). Complex points give real bases from the real and imaginary parts. Avoid
+    eigenvalues of a (e.g. s = 0 if the rotor angles give a zero eigenvalue).
+    :param n_moments: Number of moments matched at each expansion point.
+    :return: LTIModel
+    '''
+    a = sp.csc_matrix(a)
+    b = b.toarray() if sp.issparse(b) else np.asarray(b)
+    c = c.toarray() if sp.issparse(c) else np.asarray(c)
+    n = a.shape[0]
+    eye = sp.identity(n, format='csc')
+
+    blocks = []
+    for s in s0:
+        lu = sp_linalg.splu(sp.csc_matrix(a - s*eye, dtype=complex))
+        w = b.astype(complex)
+        for _ in range(n_moments):
+            w = lu.solve(w)
+            blocks += [w.real, w.imag] if np.iscomplex(s) else [w.real]
+            w /= np.linalg.norm(w, axis=0)
+
+    # Orthonormal basis, dropping (numerically) linearly dependent directions
+    u, s, _ = np.linalg.svd(np.hstack([block/np.maximum(np.linalg.norm(block, axis=0), 1e-300)
+                                       for block in blocks]), full_matrices=False)
+    v = u[:, s > 1e-10*s[0]]
+    return LTIModel(v.T.dot(a.dot(v)), v.T.dot(b), c.dot(v), d)
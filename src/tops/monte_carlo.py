@@ -0,0 +1,218 @@
+import numpy as np
+import multiprocessing
+from scipy import signal
+from tops.solvers_sde import philox_generator
+
+
+class OnlineMoments:
+    def __init__(self, shape):
+        '''
+        Running mean and variance (Welford's algorithm), element-wise for arrays of fixed shape.
+        :param shape: Shape of each observation.
+        '''
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def update(self, y):
+        self.n += 1
+        delta = y - self.mean
+        self.mean += delta/self.n
+        self._m2 += delta*(y - self.mean)
+
+    @property
+    def var(self):
+        if self.n < 2:
+            return np.full_like(self._m2, np.nan)
+        return self._m2/(self.n - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+class P2Quantile:
+    def __init__(self, p, shape):
+        '''
+        Streaming estimate of the p-quantile, element-wise for arrays of fixed shape, using the P^2-algorithm
+        (Jain & Chlamtac, 1985). Only five markers are stored per element, regardless of the number of observations.
+        :param p: Quantile (between 0 and 1).
+        :param shape: Shape of each observation.
+        '''
+        self.p = p
+        self.n = 0
+        self._q = np.zeros((5,) + tuple(shape))
+        self._pos = np.zeros((5,) + tuple(shape))
+        self._pos[:] = np.arange(1., 6.).reshape((5,) + (1,)*len(shape))
+        self._pos_desired = np.array([1, 1 + 2*p, 1 + 4*p, 3 + 2*p, 5])
+        self._pos_increment = np.array([0, p/2, p, (1 + p)/2, 1])
+
+    def update(self, y):
+        q = self._q
+        pos = self._pos
+        if self.n < 5:
+            q[self.n] = y
+            self.n += 1
+            if self.n == 5:
+                q.sort(axis=0)
+            return
+
+        self.n += 1
+        k = np.sum(y >= q[1:4], axis=0)
+        q[0] = np.minimum(q[0], y)
+        q[4] = np.maximum(q[4], y)
+        pos[1:] += np.arange(1, 5).reshape((4,) + (1,)*y.ndim) > k
+        self._pos_desired += self._pos_increment
+
+        for i in range(1, 4):
+            d = self._pos_desired[i] - pos[i]
+            adjust = ((d >= 1) & (pos[i + 1] - pos[i] > 1)) | ((d <= -1) & (pos[i - 1] - pos[i] < -1))
+            if not np.any(adjust):
+                continue
+            s = np.where(adjust, np.sign(d), 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                q_parabolic = q[i] + s/(pos[i + 1] - pos[i - 1])*(
+                    (pos[i] - pos[i - 1] + s)*(q[i + 1] - q[i])/(pos[i + 1] - pos[i]) +
+                    (pos[i + 1] - pos[i] - s)*(q[i] - q[i - 1])/(pos[i] - pos[i - 1])
+                )
+                q_neighbour = np.where(s > 0, q[i + 1], q[i - 1])
+                pos_neighbour = np.where(s > 0, pos[i + 1], pos[i - 1])
+                q_linear = q[i] + s*(q_neighbour - q[i])/(pos_neighbour - pos[i])
+            parabolic_ok = (q[i - 1] < q_parabolic) & (q_parabolic < q[i + 1])
+            q[i] = np.where(adjust, np.where(parabolic_ok, q_parabolic, q_linear), q[i])
+            pos[i] += s
+
+    @property
+    def value(self):
+        if self.n < 5:
+            return np.quantile(self._q[:self.n], self.p, axis=0)
+        return self._q[2].copy()
+
+
+_worker = {}
+
+
+def _init_worker(setup_fun):
+    _worker['ps'], _worker['make_solver'] = setup_fun()
+
+
+def _get_signal_funs(ps, signals):
+    return [getattr(getattr(ps, container)[mdl_key], output) for container, mdl_key, output in signals]
+
+
+def _describe(signals, record_every):
+    ps = _worker['ps']
+    sol = _worker['make_solver'](philox_generator(0))
+    signal_desc = []
+    for container, mdl_key, output in signals:
+        for name in getattr(ps, container)[mdl_key].par['name']:
+            signal_desc.append([name, output])
+    return np.array(signal_desc), sol.t, sol.dt*record_every
+
+
+def _run_path(args):
+    k, seed, signals, n_steps, record_every, psd_nperseg = args
+    sol = _worker['make_solver'](philox_generator(seed, stream=k))
+    signal_funs = _get_signal_funs(_worker['ps'], signals)
+
+    y = []
+    for i in range(n_steps):
+        sol.step()
+        if (i + 1) % record_every == 0:
+            y.append(np.concatenate([np.atleast_1d(fun(sol.x, sol.v)) for fun in signal_funs]))
+    y = np.array(y)
+
+    psd = None
+    if psd_nperseg:
+        _, psd = signal.welch(y, fs=1/(sol.dt*record_every), nperseg=min(psd_nperseg, len(y)), axis=0)
+    return y, psd
+
+
+class MonteCarloSDE:
+    def __init__(self, setup_fun, signals, n_paths, t_end, seed=0, n_workers=1, quantiles=(0.05, 0.5, 0.95),
+                 psd_nperseg=256, record_every=1, chunksize=1):
+        '''
+        Runs an ensemble of stochastic simulations (e.g. with EulerDAE_SDE), and updates statistics of selected
+        signals after each path. The trajectories are not stored, so memory does not depend on the number of paths.
+
+        Path k uses stream k of a counter-based random number generator (see philox_generator), so the results are
+        reproducible and do not depend on the number of workers or how paths are scheduled.
+
+        :param setup_fun: Function without arguments returning (ps, make_solver), where ps is an initialized
+        PowerSystemModel and make_solver(rng) returns a new solver (starting from the initial state) using the
+        random number generator rng. Called once in each worker process. With n_workers > 1, setup_fun must be
+        picklable (i.e. defined at module level).
+        :param signals: List of (container, model, output), e.g. [('gen', 'GEN', 'speed')].
+        :param n_paths: Number of paths.
+        :param t_end: Simulation time of each path.
+        :param seed: Seed of the ensemble.
+        :param n_workers: Number of worker processes. With n_workers=1, paths are simulated in this process.
+        :param quantiles: Quantiles that are estimated (using the P^2-algorithm).
+        :param psd_nperseg: Segment length used for estimating power spectral densities (Welch's method). Set to
+        None or 0 to skip PSD estimation.
+        :param record_every: Signals are sampled every record_every time step.
+        :param chunksize: Number of paths sent to a worker at a time.
+        '''
+        self.setup_fun = setup_fun
+        self.signals = [tuple(sig) for sig in signals]
+        self.n_paths = n_paths
+        self.t_end = t_end
+        self.seed = seed
+        self.n_workers = n_workers
+        self.quantile_list = list(quantiles)
+        self.psd_nperseg = psd_nperseg
+        self.record_every = record_every
+        self.chunksize = chunksize
+
+        self.n = 0
+        self.t = None
+        self.signal_desc = None
+        self.moments = None
+        self.quantiles = None
+        self.psd_freq = None
+        self.psd = None
+
+    def _init_statistics(self, signal_desc, t_0, dt):
+        n_steps = int(round((self.t_end - t_0)/(dt/self.record_every)))
+        n_rec = n_steps // self.record_every
+        self.signal_desc = signal_desc
+        self.t = t_0 + dt*np.arange(1, n_rec + 1)
+        shape = (n_rec, len(signal_desc))
+        self.moments = OnlineMoments(shape)
+        self.quantiles = {p: P2Quantile(p, shape) for p in self.quantile_list}
+        if self.psd_nperseg:
+            self.psd_freq = signal.welch(np.zeros(n_rec), fs=1/dt, nperseg=min(self.psd_nperseg, n_rec))[0]
+            self.psd = OnlineMoments((len(self.psd_freq), len(signal_desc)))
+        return n_steps
+
+    def update(self, y, psd):
+        self.n += 1
+        self.moments.update(y)
+        for quantile in self.quantiles.values():
+            quantile.update(y)
+        if psd is not None:
+            self.psd.update(psd)
+
+    def run(self):
+        def tasks(n_steps):
+            for k in range(self.n_paths):
+                yield k, self.seed, self.signals, n_steps, self.record_every, self.psd_nperseg
+
+        if self.n_workers == 1:
+            _init_worker(self.setup_fun)
+            n_steps = self._init_statistics(*_describe(self.signals, self.record_every))
+            for y, psd in map(_run_path, tasks(n_steps)):
+                self.update(y, psd)
+        else:
+            with multiprocessing.Pool(self.n_workers, initializer=_init_worker, initargs=(self.setup_fun,)) as pool:
+                n_steps = self._init_statistics(*pool.apply(_describe, (self.signals, self.record_every)))
+                for y, psd in pool.imap(_run_path, tasks(n_steps), chunksize=self.chunksize):
+                    self.update(y, psd)
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def std(self):
+        return self.moments.std
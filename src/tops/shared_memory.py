@@ -0,0 +1,212 @@
+import json
+import time
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+
+# Segments created by this process (by SharedMemoryInterface), which are tracked until they are unlinked
+_created = set()
+
+
+def _attach(name):
+    # Attach to an existing segment without letting the resource tracker of this process unlink it at exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: The segment is registered when attaching, and unregistered here
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _create(name, size):
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _created.add(name)
+    return shm
+
+
+def _unlink(shm):
+    _created.discard(shm.name)
+    shm.unlink()
+
+
+class SeqLockArray:
+    def __init__(self, shm, n):
+        '''
+        Array of n float64 values in a shared memory segment, preceded by an int64 sequence counter. The counter is
+        odd while the (single) writer updates the values, so readers can detect and retry torn reads.
+        '''
+        self.shm = shm
+        self.seq = np.ndarray((1,), dtype=np.int64, buffer=shm.buf, offset=0)
+        self.values = np.ndarray((n,), dtype=np.float64, buffer=shm.buf, offset=8)
+
+    @staticmethod
+    def nbytes(n):
+        return 8*(n + 1)
+
+    def write(self, values, idx=slice(None)):
+        self.seq[0] += 1
+        self.values[idx] = values
+        self.seq[0] += 1
+
+    def read(self, timeout=1.):
+        t_0 = time.perf_counter()
+        while True:
+            seq = self.seq[0]
+            if seq % 2 == 0:
+                values = self.values.copy()
+                if self.seq[0] == seq:
+                    return values, seq
+            if time.perf_counter() - t_0 > timeout:
+                raise TimeoutError('Could not get consistent read of shared memory.')
+
+    def release(self):
+        # Numpy views must be deleted before the segment can be closed
+        del self.seq, self.values
+
+
+class SharedMemoryInterface:
+    def __init__(self, sim, name, state_idx=None, outputs=(), inputs=(), period=None):
+        '''
+        Exposes signals of a running Simulator through shared memory segments, for controllers in other local
+        processes (see SharedMemoryClient). The segments hold float64 values, so complex outputs (e.g. voltages)
+        are stored as two values per unit, described by [..., unit, 'real'] and [..., unit, 'imag'].
+        Three segments are created:
+            name:           Layout (JSON), describing the other segments.
+            name + '_data': Time, states and outputs, written after each step (or with the given period).
+            name + '_inputs': Inputs, written by the client. Inputs that have changed since the last update are
+                              applied (with set_input) before the next step, so values set by other code are
+                              only overwritten when the client changes them.
+        Both data segments are protected by a sequence lock, so no locks or serialization are needed.
+        :param sim: Simulator
+        :param name: Name of the layout segment.
+        :param state_idx: Indices of states to expose.
+        :param outputs: List of (container, model, output), e.g. [('gen', 'GEN', 'speed')].
+        :param inputs: List of (container, model, input), e.g. [('vsc', 'VSC', 'p_ref')].
+        :param period: Period of updates (in simulated time). Defaults to every step.
+        '''
+        self.sim = sim
+        self.name = name
+        ps = sim.ps
+        self.state_idx = np.array([], dtype=int) if state_idx is None else np.asarray(state_idx, dtype=int)
+        self.output_funs = []
+        self.inputs = []
+        data_desc = [['state'] + list(desc) for desc in ps.state_desc[self.state_idx]]
+        x, v = sim.sol.x, sim.sol.v
+        for container, mdl_key, output in outputs:
+            mdl = getattr(ps, container)[mdl_key]
+            fun = getattr(mdl, output)
+            is_complex = np.iscomplexobj(fun(x, v))
+            self.output_funs.append((fun, is_complex))
+            for unit in mdl.par['name']:
+                desc = ['output', container, mdl_key, output, unit]
+                data_desc += [desc + ['real'], desc + ['imag']] if is_complex else [desc]
+        input_desc = []
+        for container, mdl_key, input_name in inputs:
+            mdl = getattr(ps, container)[mdl_key]
+            self.inputs.append((mdl, input_name, slice(len(input_desc), len(input_desc) + mdl.n_units)))
+            input_desc += [['input', container, mdl_key, input_name, unit] for unit in mdl.par['name']]
+
+        layout = {
+            'data': {'segment': name + '_data', 'desc': data_desc},
+            'inputs': {'segment': name + '_inputs', 'desc': input_desc},
+        }
+        layout_bytes = json.dumps(layout).encode()
+        self._shm_layout = _create(name, 8 + len(layout_bytes))
+        self._shm_layout.buf[:8] = np.int64(len(layout_bytes)).tobytes()
+        self._shm_layout.buf[8:8 + len(layout_bytes)] = layout_bytes
+
+        # The first value of the data segment is the time
+        self.data = SeqLockArray(
+            _create(name + '_data', SeqLockArray.nbytes(len(data_desc) + 1)), len(data_desc) + 1)
+        self.input_values = SeqLockArray(
+            _create(name + '_inputs', SeqLockArray.nbytes(len(input_desc))), len(input_desc))
+        self.input_values.write(np.concatenate(
+            [mdl._input_values[input_name] for mdl, input_name, _ in self.inputs] + [np.zeros(0)]))
+        self._input_seq = self.input_values.seq[0]
+        self._inputs_applied = self.input_values.values.copy()
+
+        self.write_data(sim)
+        sim.add_interface_function(self.name, self.interface_fun, period=period)
+
+    def write_data(self, sim):
+        x, v = sim.sol.x, sim.sol.v
+        values = [[sim.sol.t], x[self.state_idx]]
+        for fun, is_complex in self.output_funs:
+            y = np.atleast_1d(fun(x, v))
+            values.append(np.stack([y.real, y.imag], axis=-1).ravel() if is_complex else y)
+        self.data.write(np.concatenate(values))
+
+    def read_inputs(self):
+        if self.input_values.seq[0] == self._input_seq:
+            return
+        try:
+            # One attempt only, so that the simulation is not held up by the client. If the client is writing,
+            # the inputs are read after the next step instead.
+            values, seq = self.input_values.read(timeout=0)
+        except TimeoutError:
+            return
+        self._input_seq = seq
+        changed = values != self._inputs_applied
+        self._inputs_applied = values
+        for mdl, input_name, idx in self.inputs:
+            unit_idx = np.flatnonzero(changed[idx])
+            if len(unit_idx) > 0:
+                mdl.set_input(input_name, values[idx][unit_idx], unit_idx)
+
+    def interface_fun(self, sim):
+        self.write_data(sim)
+        self.read_inputs()
+
+    def close(self):
+        self.sim.remove_interface_function(self.name)
+        for array in [self.data, self.input_values]:
+            array.release()
+            array.shm.close()
+            _unlink(array.shm)
+        self._shm_layout.close()
+        _unlink(self._shm_layout)
+
+
+class SharedMemoryClient:
+    def __init__(self, name):
+        '''
+        Attaches to the segments of a SharedMemoryInterface by name (e.g. from another process).
+        '''
+        self._shm_layout = _attach(name)
+        n = int(np.frombuffer(self._shm_layout.buf[:8], dtype=np.int64)[0])
+        self.layout = json.loads(bytes(self._shm_layout.buf[8:8 + n]).decode())
+        self.data_desc = self.layout['data']['desc']
+        self.input_desc = self.layout['inputs']['desc']
+        self.data = SeqLockArray(_attach(self.layout['data']['segment']), len(self.data_desc) + 1)
+        self.input_values = SeqLockArray(_attach(self.layout['inputs']['segment']), len(self.input_desc))
+        self._input_idx = {tuple(desc[1:]): i for i, desc in enumerate(self.input_desc)}
+
+    def read(self):
+        '''
+        :return: Time, values of data signals (ordered as self.data_desc) and sequence number (which increases
+        with each update).
+        '''
+        values, seq = self.data.read()
+        return values[0], values[1:], seq
+
+    def wait_for_update(self, seq, timeout=1.):
+        # Spins until the data has been updated after the read with sequence number seq
+        t_0 = time.perf_counter()
+        while self.data.seq[0] <= seq:
+            if time.perf_counter() - t_0 > timeout:
+                raise TimeoutError('No update of shared memory.')
+        return self.read()
+
+    def write_inputs(self, setpoints):
+        '''
+        :param setpoints: List of (container, model, input, unit, value).
+        '''
+        idx = [self._input_idx[tuple(setpoint[:4])] for setpoint in setpoints]
+        self.input_values.write([setpoint[4] for setpoint in setpoints], idx)
+
+    def close(self):
+        for array in [self.data, self.input_values]:
+            array.release()
+            array.shm.close()
+        self._shm_layout.close()
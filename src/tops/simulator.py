@@ -1,10 +1,134 @@
 import tops.solvers as dps_sol
 import threading
+import time
+import heapq
 import numpy as np
 
 
+class RealTimeStats:
+    def __init__(self, dt, n_bins=50, latency_max=None):
+        '''
+        Timing statistics of a real-time simulation.
+        :param dt: Time step of the simulation.
+        :param n_bins: Number of bins in the step latency histogram.
+        :param latency_max: Upper edge of the histogram (defaults to 2*dt). Longer latencies are counted in the last bin.
+        '''
+        latency_max = 2*dt if latency_max is None else latency_max
+        self.bin_edges = np.linspace(0, latency_max, n_bins + 1)
+        self.latency_hist = np.zeros(n_bins, dtype=int)
+        self.n_steps = 0
+        self.n_ticks = 0
+        self.n_overruns = 0
+        self.latency_max = 0.
+        self.latency_sum = 0.
+        self.jitter_max = 0.
+
+    def add_step(self, latency):
+        # Wall clock time spent in one simulation step
+        self.n_steps += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        i = np.searchsorted(self.bin_edges, latency, side='right') - 1
+        self.latency_hist[min(i, len(self.latency_hist) - 1)] += 1
+
+    def add_tick(self, jitter, overrun):
+        # Jitter is the delay of the start of a tick relative to its deadline
+        self.n_ticks += 1
+        self.jitter_max = max(self.jitter_max, jitter)
+        self.n_overruns += overrun
+
+    @property
+    def latency_mean(self):
+        return self.latency_sum/self.n_steps if self.n_steps > 0 else np.nan
+
+    def summary(self):
+        return {
+            'n_steps': self.n_steps,
+            'n_ticks': self.n_ticks,
+            'n_overruns': self.n_overruns,
+            'latency_mean': self.latency_mean,
+            'latency_max': self.latency_max,
+            'jitter_max': self.jitter_max,
+        }
+
+
+class SignalRingBuffer:
+    def __init__(self, n_signals, capacity=1000, dtype=float):
+        '''
+        Preallocated ring buffer for one writer (the simulator thread) and any number of readers (see
+        RingBufferReader). The writer does not take locks: a sample is written to slot head % capacity, and then
+        published by incrementing the monotonic counter head (n_started is incremented before writing). Readers keep
+        their own cursor, and detect samples that were overwritten before (or while) they were copied.
+        :param n_signals: Number of signals per sample.
+        :param capacity: Number of samples stored.
+        :param dtype: Data type of the signals (complex for e.g. voltages and currents).
+        '''
+        self.capacity = capacity
+        self.t = np.zeros(capacity)
+        self.data = np.zeros((capacity, n_signals), dtype=dtype)
+        self.head = 0
+        self.n_started = 0
+
+    def write(self, t, values):
+        self.n_started = self.head + 1
+        i = self.head % self.capacity
+        self.t[i] = t
+        self.data[i] = values
+        self.head += 1
+
+    def reader(self, from_start=False):
+        return RingBufferReader(self, from_start=from_start)
+
+
+class RingBufferReader:
+    def __init__(self, buffer, from_start=False):
+        '''
+        Reader of a SignalRingBuffer. Starts at the newest sample, or at the oldest available sample if from_start.
+        The number of samples that were overwritten before they could be read is counted in n_lost.
+        '''
+        self.buffer = buffer
+        self.cursor = max(buffer.head - buffer.capacity, 0) if from_start else buffer.head
+        self.n_lost = 0
+
+    def available(self):
+        return self.buffer.head - self.cursor
+
+    def read(self, max_n=None):
+        '''
+        Returns copies (t, data) of the samples written since the last read (at most max_n samples).
+        '''
+        buf = self.buffer
+        head = buf.head
+        start = max(self.cursor, head - buf.capacity)
+        stop = head if max_n is None else min(head, start + max_n)
+        slots = np.arange(start, stop) % buf.capacity
+        t = buf.t[slots]
+        data = buf.data[slots]
+
+        # Samples may have been overwritten while copying (including the slot being written now)
+        first_valid = buf.n_started - buf.capacity
+        if first_valid > start:
+            n_skip = min(first_valid - start, len(slots))
+            t = t[n_skip:]
+            data = data[n_skip:]
+            start += n_skip
+        self.n_lost += start - self.cursor
+        self.cursor = max(stop, start)
+        return t, data
+
+
 class Simulator:
-    def __init__(self, ps, dt=5e-3, solver=dps_sol.ModifiedEulerDAE, t_end=np.inf, log_fun=None, ode_fun=None):
+    def __init__(self, ps, dt=5e-3, solver=dps_sol.ModifiedEulerDAE, t_end=np.inf, log_fun=None, ode_fun=None,
+                 real_time=False, steps_per_tick=1, speed=1.):
+        '''
+        :param real_time: If True, main_loop paces the simulation to the wall clock. Ticks of steps_per_tick time
+        steps are started at absolute deadlines (start time + n*steps_per_tick*dt/speed), so that timing errors do not
+        accumulate. If the simulation falls behind, the following ticks are started immediately until it has caught
+        up. Timing statistics are recorded in self.rt_stats.
+        :param steps_per_tick: Number of time steps simulated in each tick. Values larger than one reduce the
+        number of sleeps (and the overhead/jitter of the operating system timer) for small time steps.
+        :param speed: Simulated time per wall clock time.
+        '''
 
         self._stopped = False
         self.n_markers = 20
@@ -27,8 +151,17 @@ class Simulator:
         self.t = self.sol.t
 
         self.interface_functions = dict()
-        self.interface_functions_lock = threading.Lock()
+        self.interface_functions_lock = threading.RLock()
         self.interface_timers = dict()
+        self.scheduled_functions = dict()
+        self._schedule = []
+        self._schedule_counter = 0
+        self.ring_buffers = dict()
+
+        self.real_time = real_time
+        self.steps_per_tick = steps_per_tick
+        self.speed = speed
+        self.rt_stats = RealTimeStats(self.dt)
 
 
     def stopped(self):
@@ -42,37 +175,161 @@ class Simulator:
                 with self.interface_functions_lock:
                     for key, fun in self.interface_functions.items():
                         fun(self)
+                    self.run_scheduled_functions()
 
                 self.new_data_ready = True
                 self.new_data_cv.notify()
+
+            for buffer, signal_fun in self.ring_buffers.values():
+                buffer.write(self.sol.t, signal_fun())
+
+    def add_interface_function(self, name, fun, period=None, phase=0., priority=0):
+        '''
+        Adds a function fun(sim) that is called after simulation steps. With period=None, it is called after every
+        step (as functions in self.interface_functions). Otherwise, it is called after the first step reaching each
+        of the times phase + k*period, k = 0, 1, 2, ..., using a timing heap, so that functions with low rates
+        do not add overhead to the other steps. Functions due at the same step are called in order of decreasing
+        priority.
+        '''
+        with self.interface_functions_lock:
+            self.remove_interface_function(name)
+            if period is None:
+                self.interface_functions[name] = fun
+                return
+            k = max(0, int(np.ceil((self.sol.t - phase)/period - 1e-9)))
+            # Each registration gets its own token, so that heap entries of earlier registrations are skipped (also
+            # if the same function is registered again under the same name)
+            self.scheduled_functions[name] = (fun, period, phase, priority, object())
+            self._push_scheduled(name, k)
+
+    def add_timed_function(self, t, fun, name=None, priority=0):
+        '''
+        Adds a function fun(sim) that is called once, after the first step reaching time t (e.g. events).
+        :return: Name of the function (can be used with remove_interface_function).
+        '''
+        with self.interface_functions_lock:
+            if name is None:
+                name = 'timed_function_{}'.format(self._schedule_counter)
+            self.remove_interface_function(name)
+            self.scheduled_functions[name] = (fun, None, t, priority, object())
+            self._push_scheduled(name, 0)
+            return name
+
+    def remove_interface_function(self, name):
+        with self.interface_functions_lock:
+            self.interface_functions.pop(name, None)
+            # Heap entries of removed functions (or earlier registrations) are skipped when popped
+            self.scheduled_functions.pop(name, None)
+
+    def _push_scheduled(self, name, k):
+        fun, period, phase, priority, token = self.scheduled_functions[name]
+        self._schedule_counter += 1
+        t_next = phase if period is None else phase + k*period
+        heapq.heappush(self._schedule, (t_next, -priority, self._schedule_counter, name, k, token))
+
+    def _is_registered(self, name, token):
+        return name in self.scheduled_functions and self.scheduled_functions[name][4] is token
+
+    def run_scheduled_functions(self):
+        t = self.sol.t + 1e-9*self.dt
+        while self._schedule and self._schedule[0][0] <= t:
+            # All functions due at this step are called in order of decreasing priority (and then in the order they
+            # were scheduled), regardless of their due times within the step
+            due = []
+            while self._schedule and self._schedule[0][0] <= t:
+                due.append(heapq.heappop(self._schedule))
+            due.sort(key=lambda entry: entry[1:3])
+            for _, _, _, name, k, token in due:
+                if not self._is_registered(name, token):
+                    continue
+                fun = self.scheduled_functions[name][0]
+                if self.scheduled_functions[name][1] is None:
+                    # Timed functions are called once
+                    del self.scheduled_functions[name]
+                    fun(self)
+                    continue
+                fun(self)
+                if not self._is_registered(name, token):
+                    continue
+                _, period, phase, _, _ = self.scheduled_functions[name]
+                # Skip times that were passed within the same step (period < dt)
+                self._push_scheduled(name, max(k + 1, int(np.floor((t - phase)/period)) + 1))
+
+    def add_ring_buffer(self, name, state_idx=None, outputs=(), capacity=1000):
+        '''
+        Records selected signals in a SignalRingBuffer at every step. The buffer is written without locking, so
+        readers (e.g. plotters or loggers in other threads) can pull batches at their own pace using
+        buffer.reader().
+        :param name: Name of the buffer.
+        :param state_idx: Indices of states to record.
+        :param outputs: List of (container, model, output), e.g. [('gen', 'GEN', 'speed')].
+        :param capacity: Number of samples stored.
+        :return: SignalRingBuffer
+        '''
+        state_idx = np.array([], dtype=int) if state_idx is None else np.asarray(state_idx, dtype=int)
+        output_funs = [getattr(getattr(self.ps, container)[mdl_key], output) for container, mdl_key, output in outputs]
+
+        def signal_fun():
+            x, v = self.sol.x, self.sol.v
+            return np.concatenate([x[state_idx]] + [np.atleast_1d(fun(x, v)) for fun in output_funs])
+
+        # The data type is taken from the first sample, so that complex signals (e.g. voltages) are kept
+        sample = signal_fun()
+        buffer = SignalRingBuffer(len(sample), capacity=capacity, dtype=sample.dtype)
+        self.ring_buffers[name] = (buffer, signal_fun)
+        return buffer
     
     def main_loop(self):
+        if self.real_time:
+            self.real_time_loop()
+            return
+
         t = self.sol.t
         while not self.stopped() and t < self.t_end:
             self.make_simulation_step()
             t = self.sol.t
 
+    def real_time_loop(self):
+        tick = self.steps_per_tick*self.dt/self.speed
+        stats = self.rt_stats
+        t_wall_0 = time.perf_counter()
+        n_tick = 0
+        while not self.stopped() and self.sol.t < self.t_end:
+            deadline = t_wall_0 + n_tick*tick
+            t_wall = time.perf_counter()
+            if t_wall < deadline:
+                time.sleep(deadline - t_wall)
+            t_wall = time.perf_counter()
+            jitter = t_wall - deadline
+
+            for _ in range(self.steps_per_tick):
+                if self.stopped() or self.sol.t >= self.t_end:
+                    break
+                self.make_simulation_step()
+                t_wall_prev, t_wall = t_wall, time.perf_counter()
+                stats.add_step(t_wall - t_wall_prev)
+
+            n_tick += 1
+            stats.add_tick(jitter, t_wall > t_wall_0 + n_tick*tick)
+
 
 class InterfacerDirect:
-    def __init__(self, rts=None, name='InterfacerDirect'):
+    def __init__(self, rts=None, name='InterfacerDirect', fs=None, priority=0):
+        '''
+        :param fs: Rate (in simulated time) at which the interface function is called. If None, it is called after
+        every simulation step.
+        '''
+        self.interface_name = name
+        self.fs = fs
+        self.priority = priority
         if rts:
             self.connect(rts)
 
-        self.interface_name = name
-        self.fs = None
-        if self.fs:
-            self._timer = 0
-
     def connect(self, rts):
-        rts.interface_functions[self.interface_name] = self.interface_fun
+        period = 1/self.fs if self.fs else None
+        rts.add_interface_function(self.interface_name, self.interface_fun, period=period, priority=self.priority)
 
     def interface_fun(self, rts):
-        if self.fs:
-            if rts.sol.t < self._timer:
-                return
-            else:
-                self._timer += 1 / self.fs
-
         self.update(self.read_input_signal(rts))
         self.apply_ctrl_signal(rts, self.generate_ctrl_signal())
 
@@ -1,24 +1,341 @@
 from tops.solvers import EulerDAE
 import numpy as np
+import scipy.sparse as sp
+
+
+class StateNoise:
+    def __init__(self, state_idx, gain, noise_idx=None):
+        '''
+        Diffusion given as (state index, gain) pairs. Instead of building a dense (n_states, dim_w) matrix, the
+        Wiener increments are scattered directly into the states they act on.
+        :param state_idx: Global indices of the states driven by noise.
+        :param gain: Diffusion gain for each state (scalar or one value per state).
+        :param noise_idx: Index of the Wiener increment driving each state. Defaults to 0, 1, 2, ..., i.e. one
+        independent noise source per state.
+        '''
+        self.state_idx = np.atleast_1d(np.asarray(state_idx, dtype=int))
+        self.gain = np.broadcast_to(np.asarray(gain, dtype=float), self.state_idx.shape).copy()
+        if noise_idx is None:
+            self.noise_idx = np.arange(len(self.state_idx))
+        else:
+            self.noise_idx = np.broadcast_to(np.asarray(noise_idx, dtype=int), self.state_idx.shape).copy()
+
+    def apply(self, x, dw):
+        np.add.at(x, self.state_idx, self.gain*dw[self.noise_idx])
+
+
+class InputNoise:
+    def __init__(self, mdl, input_name, gain, unit_idx=None, noise_idx=None):
+        '''
+        White noise injected into an (unconnected) input of a model, e.g. 'g_setp' of DynamicLoad, instead of
+        directly into the states.
+        The input is perturbed by gain*dw/dt, which is held over the time step. For inputs that drive states
+        through an integrating block (e.g. DynamicLoadFiltered), this gives the usual Euler-Maruyama increment.
+        The perturbation is removed before the algebraic equations are solved at the end of the step, so the stored
+        algebraic variables are consistent with the inputs after the step (e.g. for 'g_setp' of DynamicLoad, which
+        acts directly on the algebraic equations), and values set with set_input between steps are not affected.
+        :param mdl: Model instance, e.g. ps.loads['DynamicLoad'].
+        :param input_name: Name of input, as given by mdl.input_list().
+        :param gain: Noise gain for each unit (scalar or one value per unit).
+        :param unit_idx: Units of the model that receive noise. Defaults to all units.
+        :param noise_idx: Index of the Wiener increment driving each unit. Defaults to 0, 1, 2, ...
+        '''
+        self.mdl = mdl
+        self.input_name = input_name
+        self.unit_idx = np.arange(mdl.n_units) if unit_idx is None else np.atleast_1d(np.asarray(unit_idx, dtype=int))
+        self.gain = np.broadcast_to(np.asarray(gain, dtype=float), self.unit_idx.shape).copy()
+        if noise_idx is None:
+            self.noise_idx = np.arange(len(self.unit_idx))
+        else:
+            self.noise_idx = np.broadcast_to(np.asarray(noise_idx, dtype=int), self.unit_idx.shape).copy()
+        self._input_0 = None
+
+    def apply(self, dw, dt):
+        values = self.mdl._input_values[self.input_name]
+        self._input_0 = values[self.unit_idx].copy()
+        values[self.unit_idx] = self._input_0 + self.gain*dw[self.noise_idx]/dt
+
+    def restore(self):
+        self.mdl._input_values[self.input_name][self.unit_idx] = self._input_0
+
+
+class OUInput(InputNoise):
+    def __init__(self, mdl, input_name, T, sigma, unit_idx=None, noise_idx=None, y_0=None):
+        '''
+        Ornstein-Uhlenbeck process added to an (unconnected) input of a model, e.g. 'g_setp'/'b_setp' of DynamicLoad
+        or 'p_ref' of VSC, to represent load or wind fluctuations with time constant T and standard deviation sigma.
+        The process is updated with the exact discretization
+            y_{k+1} = a*y_k + sigma*sqrt(1 - a^2)*xi_k,  a = exp(-dt/T),  xi_k = dw_k/sqrt(dt),
+        so its statistics are correct for any time step (the step size does not need to resolve T). The value y_k is
+        held over the time step, and removed from the input after the step, as for InputNoise.
+        :param mdl: Model instance, e.g. ps.loads['DynamicLoad'].
+        :param input_name: Name of input, as given by mdl.input_list().
+        :param T: Time constant for each unit (scalar or one value per unit).
+        :param sigma: Stationary standard deviation for each unit (scalar or one value per unit).
+        :param unit_idx: Units of the model that receive noise. Defaults to all units.
+        :param noise_idx: Index of the Wiener increment driving each unit. Defaults to 0, 1, 2, ...
+        :param y_0: Initial value of the process. Defaults to zero.
+        '''
+        super().__init__(mdl, input_name, sigma, unit_idx=unit_idx, noise_idx=noise_idx)
+        self.T = np.broadcast_to(np.asarray(T, dtype=float), self.unit_idx.shape).copy()
+        self.sigma = self.gain
+        self.y = np.zeros(len(self.unit_idx)) if y_0 is None else np.broadcast_to(y_0, self.unit_idx.shape).copy()
+        self._xi = np.zeros(len(self.unit_idx))
+        self._dt = 0
+
+    def apply(self, dw, dt):
+        values = self.mdl._input_values[self.input_name]
+        self._input_0 = values[self.unit_idx].copy()
+        values[self.unit_idx] = self._input_0 + self.y
+        self._xi = dw[self.noise_idx]/np.sqrt(dt)
+        self._dt = dt
+
+    def restore(self):
+        super().restore()
+        a = np.exp(-self._dt/self.T)
+        self.y = a*self.y + self.sigma*np.sqrt(1 - a**2)*self._xi
+
+
+def philox_generator(seed=None, stream=0):
+    '''
+    Counter-based random number generator (Philox). Stream k of a seed starts k*2^128 draws into the counter
+    space, so streams do not overlap, and stream k always gives the same numbers (e.g. for ensemble member k,
+    regardless of which worker simulates it).
+    :param seed: Seed (None gives fresh entropy from the OS).
+    :param stream: Stream number.
+    '''
+    return np.random.Generator(np.random.Philox(seed).jumped(stream))
+
+
+class NoiseBlocks:
+    def __init__(self, rng, shape, block_size=1000):
+        '''
+        Standard normal samples of given shape, generated in blocks of block_size samples, to avoid the overhead of
+        one small draw per time step. The sequence does not depend on block_size.
+        '''
+        self.rng = rng
+        self.shape = tuple(shape)
+        self.block_size = block_size
+        self._block = np.empty((0,) + self.shape)
+        self._k = 0
+
+    def next(self):
+        if self._k == len(self._block):
+            self._block = self.rng.standard_normal((self.block_size,) + self.shape)
+            self._k = 0
+        self._k += 1
+        return self._block[self._k - 1]
+
+
+def diffusion_fun(b):
+    '''
+    Returns a function that adds the diffusion term b*dw to a state vector (in place). b can be
+    - None or an empty list (no diffusion in the states),
+    - a StateNoise object or a list of (state index, gain) pairs, evaluated with an index scatter,
+    - a (constant) scipy.sparse matrix of shape (n_states, dim_w),
+    - a function b(t, x, v) returning a dense or sparse matrix of shape (n_states, dim_w).
+    '''
+    if b is None or isinstance(b, (list, tuple)) and len(b) == 0:
+        def add_diffusion(t, x, v, dw, out):
+            pass
+
+    elif isinstance(b, (StateNoise, list, tuple)):
+        state_noise = b if isinstance(b, StateNoise) else StateNoise(*zip(*b))
+
+        def add_diffusion(t, x, v, dw, out):
+            state_noise.apply(out, dw)
+
+    elif sp.issparse(b):
+        b_mat = sp.csr_matrix(b)
+
+        def add_diffusion(t, x, v, dw, out):
+            out += b_mat.dot(dw)
+
+    else:
+        def add_diffusion(t, x, v, dw, out):
+            out += b(t, x, v).dot(dw)
+
+    return add_diffusion
+
 
 class EulerDAE_SDE(EulerDAE):
-    def __init__(self, *args, dim_w=0, **kwargs):
+    def __init__(self, *args, dim_w=0, b=None, input_noise=(), rng=None, stream=0, block_size=1000, **kwargs):
         '''
         First implementation of a Stochastic Differential Equation Solver, based on following code snippet:
         https://en.wikipedia.org/wiki/Euler%E2%80%93Maruyama_method
+        :param dim_w: Number of independent Wiener processes.
+        :param b: Diffusion term (see diffusion_fun). Can also be set after initialization (sol.b = ...).
+        :param input_noise: List of InputNoise- or OUInput-objects, for noise injected into model inputs.
+        :param rng: Random number generator (numpy Generator), or seed (int or None) for a counter-based generator
+        (see philox_generator).
+        :param stream: Stream number, used if rng is a seed.
+        :param block_size: Number of time steps for which noise is generated at a time.
         '''
         super().__init__(*args, **kwargs)
         self.dim_w = dim_w
-        self.b = lambda t, x, v: np.zeros((len(self.x), self.dim_w))
+        self.b = b
+        self.input_noise = list(input_noise)
+        self.rng = philox_generator(rng, stream) if rng is None or isinstance(rng, (int, np.integer)) else rng
+        self.noise = NoiseBlocks(self.rng, self.noise_shape(), block_size)
         self.dw = np.zeros(self.dim_w)
-        
+
+    @property
+    def b(self):
+        return self._b
+
+    @b.setter
+    def b(self, b):
+        self._b = b
+        self.add_diffusion = diffusion_fun(b)
+        self.additive_noise = not callable(b)
+
+    def noise_shape(self):
+        return (self.dim_w,)
 
     def step(self):
-        self.dw = np.random.normal(loc=0.0, scale=np.sqrt(self.dt), size=self.dim_w)
+        self.dw = self.noise.next()*np.sqrt(self.dt)
         if self.t < self.t_end:
-            self.x[:] = self.x + self.f(self.t, self.x, self.v)*self.dt + np.dot(self.b(self.t, self.x, self.v), self.dw)
+            for noise in self.input_noise:
+                noise.apply(self.dw, self.dt)
+
+            x = self.x + self.f(self.t, self.x, self.v)*self.dt
+            self.add_diffusion(self.t, self.x, self.v, self.dw, x)
+            self.x[:] = x
             self.t += self.dt
+            # Input noise is removed before the algebraic equations are solved, so that v is consistent with the
+            # inputs after the step (also for inputs acting directly on the algebraic equations)
+            for noise in self.input_noise:
+                noise.restore()
+            self.v[:] = self.g_inv(self.t, self.x)
+
+        else:
+            print('End of simulation time reached.')
+
+
+class HeunDAE_SDE(EulerDAE_SDE):
+    def __init__(self, *args, **kwargs):
+        '''
+        Stochastic Heun method (predictor-corrector), with the algebraic equations solved for the predicted states.
+        For additive noise (b given as StateNoise, pairs or a sparse matrix) it has strong order 1, but the drift is
+        integrated with second order accuracy, which allows larger time steps than EulerDAE_SDE (see also
+        SRA1DAE_SDE). For state dependent b (given as a function), it converges to the Stratonovich solution.
+        '''
+        super().__init__(*args, **kwargs)
+
+    def step(self):
+        self.dw = self.noise.next()*np.sqrt(self.dt)
+        if self.t < self.t_end:
+            t, x, v, dt, dw = self.t, self.x, self.v, self.dt, self.dw
+            for noise in self.input_noise:
+                noise.apply(dw, dt)
+
+            dxdt_0 = self.f(t, x, v)
+            diffusion = np.zeros_like(x)
+            self.add_diffusion(t, x, v, dw, diffusion)
+            x_1 = x + dxdt_0*dt + diffusion
+            v_1 = self.g_inv(t + dt, x_1)
+            dxdt_1 = self.f(t + dt, x_1, v_1)
+
+            if not self.additive_noise:
+                diffusion_1 = np.zeros_like(x)
+                self.add_diffusion(t + dt, x_1, v_1, dw, diffusion_1)
+                diffusion = (diffusion + diffusion_1)/2
+
+            self.x[:] = x + (dxdt_0 + dxdt_1)/2*dt + diffusion
+            self.t += dt
+            for noise in self.input_noise:
+                noise.restore()
+            self.v[:] = self.g_inv(self.t, self.x)
+
+        else:
+            print('End of simulation time reached.')
+
+
+class SRA1DAE_SDE(EulerDAE_SDE):
+    def __init__(self, *args, **kwargs):
+        '''
+        Stochastic Runge-Kutta method SRA1 (Roessler, 2010) for additive noise, strong order 1.5, with two drift
+        evaluations per step (same cost as HeunDAE_SDE). In addition to the Wiener increments dw, the iterated
+        integrals dz = int(W(s) - W(t), s=t..t+dt) are sampled, and stored in self.dz.
+        The diffusion term must be constant (b given as StateNoise, pairs or a sparse matrix). Input noise is held
+        over both stages, which gives strong order 1 for the noise injected in inputs.
+        '''
+        super().__init__(*args, **kwargs)
+        self.dz = np.zeros(self.dim_w)
+
+    def noise_shape(self):
+        return (2, self.dim_w)
+
+    def step(self):
+        dw, dv = self.noise.next()*np.sqrt(self.dt)
+        self.dw = dw
+        self.dz = self.dt/2*(dw + dv/np.sqrt(3))
+        if not self.additive_noise:
+            raise ValueError('SRA1DAE_SDE requires additive noise (constant diffusion term).')
+
+        if self.t < self.t_end:
+            t, x, v, dt = self.t, self.x, self.v, self.dt
+            for noise in self.input_noise:
+                noise.apply(dw, dt)
+
+            dxdt_0 = self.f(t, x, v)
+            x_1 = x + 0.75*dxdt_0*dt
+            self.add_diffusion(t, x, v, 1.5*self.dz/dt, x_1)
+            t_1 = t + 0.75*dt
+            dxdt_1 = self.f(t_1, x_1, self.g_inv(t_1, x_1))
+
+            x_new = x + (dxdt_0/3 + 2*dxdt_1/3)*dt
+            self.add_diffusion(t, x, v, dw, x_new)
+            self.x[:] = x_new
+            self.t += dt
+            for noise in self.input_noise:
+                noise.restore()
+            self.v[:] = self.g_inv(self.t, self.x)
+
+        else:
+            print('End of simulation time reached.')
+
+
+class MilsteinDAE_SDE(EulerDAE_SDE):
+    def __init__(self, *args, **kwargs):
+        '''
+        Milstein-type method for Ito SDEs with state dependent (diagonal) noise, strong order 1.
+        The derivative of the diffusion term is approximated without derivatives (Kloeden & Platen, 1992,
+        eq. 11.1.5), by evaluating b (with the algebraic equations solved) at one supporting state per Wiener
+        process. The drift is integrated with the Heun predictor-corrector, as in HeunDAE_SDE.
+        For additive noise the Milstein correction vanishes, and SRA1DAE_SDE should be used instead.
+        '''
+        super().__init__(*args, **kwargs)
+
+    def step(self):
+        self.dw = self.noise.next()*np.sqrt(self.dt)
+        if self.t < self.t_end:
+            t, x, v, dt, dw = self.t, self.x, self.v, self.dt, self.dw
+            for noise in self.input_noise:
+                noise.apply(dw, dt)
+
+            dxdt_0 = self.f(t, x, v)
+            diffusion = np.zeros_like(x)
+            self.add_diffusion(t, x, v, dw, diffusion)
+
+            if not self.additive_noise:
+                b_0 = self.b(t, x, v)
+                b_0 = b_0.toarray() if sp.issparse(b_0) else np.asarray(b_0)
+                x_drift = x + dxdt_0*dt
+                for j in np.flatnonzero(np.any(b_0 != 0, axis=0)):
+                    x_sup = x_drift + b_0[:, j]*np.sqrt(dt)
+                    b_sup = self.b(t, x_sup, self.g_inv(t, x_sup))
+                    b_sup_j = b_sup[:, [j]].toarray()[:, 0] if sp.issparse(b_sup) else np.asarray(b_sup)[:, j]
+                    diffusion += (b_sup_j - b_0[:, j])*(dw[j]**2 - dt)/(2*np.sqrt(dt))
+
+            x_1 = x + dxdt_0*dt + diffusion
+            dxdt_1 = self.f(t + dt, x_1, self.g_inv(t + dt, x_1))
+
+            self.x[:] = x + (dxdt_0 + dxdt_1)/2*dt + diffusion
+            self.t += dt
+            for noise in self.input_noise:
+                noise.restore()
             self.v[:] = self.g_inv(self.t, self.x)
 
         else:
-            print('End of simulation time reached.')
\ No newline at end of file
+            print('End of simulation time reached.')
@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 from tops.solvers import Euler, ModifiedEuler, SimpleRK4
 
 
@@ -75,20 +76,11 @@ def newton_rhapson_power_flow(y_bus, v_0, p_sum_bus, q_sum_bus, bus_types, tol,
 
 
 def remove_recarray_field(a, field):
-    names = []
-    col_dtypes = []
-    data = []
-    for i, name in enumerate(a.dtype.names):
-        if not name == field:
-            # print(i, name)
-            names.append(name)
-            col_dtypes.append(a.dtype[i])
-            data.append(a[name])
-
-    dtypes = [(name_, dtype_) for name_, dtype_ in zip(names, col_dtypes)]
-
-    entries = [entry for entry in zip(*data)]
-    return np.array(entries, dtype=dtypes)
+    '''
+    Remove column from recarray.
+    :return: View of the remaining columns (no data is copied). Note that changes in the view also affect a.
+    '''
+    return a[[name for name in a.dtype.names if not name == field]]
 
 
 def combine_recarrays(a, b):
@@ -98,8 +90,9 @@ def combine_recarrays(a, b):
     :param b:
     :return:
     '''
-    new_dtype = a.dtype.descr + b.dtype.descr
-    c = np.zeros(a.shape, new_dtype)
+    # dtype from the fields (not descr), since a or b can be views with gaps between the fields
+    new_dtype = [(name, a.dtype[name]) for name in a.dtype.names] + [(name, b.dtype[name]) for name in b.dtype.names]
+    c = np.empty(a.shape, new_dtype)
     for name in a.dtype.names:
         c[name] = a[name]
 
@@ -112,15 +105,20 @@ def combine_recarrays(a, b):
 def replace_str_col(a, col, strings):
     '''
     Replaces column with strings (col) in structured array (a) with new strings.
-    dtype is updated if new strings are longer than previous strings.
+    The column gets the dtype of the new strings (e.g. longer strings than before).
     :param a: Structured array
     :param col: String that points to column of a
     :param strings: Array of strings that will replace content in a[col]
-    :return: Structured array with updated column
+    :return: Structured array with updated column (a new array, where the column is moved to the front)
     '''
-    new_strings = np.array(strings, dtype=[(col, strings.dtype)])
-    a_old = remove_recarray_field(a, col)
-    return combine_recarrays(new_strings, a_old)
+    strings = np.asarray(strings)
+    new_dtype = [(col, strings.dtype)] + [(name, a.dtype[name]) for name in a.dtype.names if not name == col]
+    c = np.empty(a.shape, new_dtype)
+    c[col] = strings
+    for name in a.dtype.names:
+        if not name == col:
+            c[name] = a[name]
+    return c
 
 
 def concatenate_structured_arrays(a_list):
@@ -129,56 +127,66 @@ def concatenate_structured_arrays(a_list):
     :param a_list:
     :return:
     '''
-    entries = []
-    for a in a_list:
-        for row in a:
-            entries.append(row)
-
     header = a_list[0].dtype.names
-    # # Get dtype for each column
-    # # data = model[td][1:]
-    # entries_T = list(map(list, zip(*entries)))
-    # col_dtypes = [np.array(col).dtype for col in entries_T]
-    #
-    # # entries = [tuple(entry) for entry in data]
-    # dtypes = [(name_, dtype_) for name_, dtype_ in zip(header, col_dtypes)]
+    return structured_array_from_columns(header, [np.concatenate([a[name] for a in a_list]) for name in header])
 
-    # return np.array(entries, dtype=dtypes)
-    return structured_array_from_list(header, entries)
 
+def structured_array_from_columns(names, columns):
+    '''
+    Structured array from columns. The dtype of each column is inferred once (as np.array(column).dtype), and the
+    array is filled column by column.
+    :param names: Field names
+    :param columns: List of columns (lists or arrays)
+    :return: Structured array
+    '''
+    columns = [np.asarray(col) for col in columns]
+    n_rows = len(columns[0]) if len(columns) > 0 else 0
+    a = np.empty(n_rows, dtype=[(name_, col.dtype) for name_, col in zip(names, columns)])
+    for name_, col in zip(names, columns):
+        a[name_] = col
+    return a
 
-def structured_array_from_list(names, entries):
-    entries_T = list(map(list, zip(*entries)))
-    col_dtypes = [np.array(col).dtype for col in entries_T]
-
-    entries_tup = [tuple(entry) for entry in entries]
-    dtypes = [(name_, dtype_) for name_, dtype_ in zip(names, col_dtypes)]
 
-    return np.array(entries_tup, dtype=dtypes)
+def structured_array_from_list(names, entries):
+    # Rows are transposed to columns, see structured_array_from_columns
+    return structured_array_from_columns(names, [list(col) for col in zip(*entries)])
+
+
+class NameIndex:
+    def __init__(self, names):
+        '''
+        Hash index of names (e.g. bus names or unit names of a model), for lookups without scanning the names.
+        Duplicate names map to the first occurrence.
+        '''
+        self.names = names
+        self.index = dict()
+        for i, name in enumerate(np.asarray(names).tolist()):
+            self.index.setdefault(name, i)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def lookup(self, a, return_mask=False):
+        # Same behaviour as lookup_strings: For lists/arrays, indices of the names that are found (and optionally
+        # the mask of found names). For single names, the index (nan if not found).
+        if isinstance(a, np.ndarray) or isinstance(a, list):
+            lookups = np.array([self.index.get(a_, -1) for a_ in np.asarray(a).tolist()], dtype=int)
+            found = lookups >= 0
+            if return_mask:
+                return lookups[found], found
+            else:
+                return lookups[found]
+        else:
+            return self.index.get(a.item() if isinstance(a, np.generic) else a, np.nan)
 
 
 def lookup_strings(a, b, return_mask=False):
-    # Function to find the index of the element in b that equal the element in a, for each element in a
-    if isinstance(a, np.ndarray) or isinstance(a, list):
-        lookups = []
-        found = []
-        for a_ in a:
-            lookup = np.where(b == a_)[0]
-            if len(lookup) > 0:
-                lookups.append(lookup[0])
-                found.append(True)
-            else:
-                found.append(False)
-        if return_mask:
-            return np.array(lookups), np.array(found)
-        else:
-            return np.array(lookups)
-    else:
-        lookup = np.where(b == a)[0]
-        if len(lookup) > 0:
-            return lookup[0]
-        else:
-            return np.nan
+    # Function to find the index of the element in b that equal the element in a, for each element in a.
+    # For repeated lookups in b, use NameIndex(b) directly.
+    return NameIndex(b).lookup(a, return_mask=return_mask)
 
 
 def jacobian_num(f, x, eps=1e-10, **params):
@@ -200,6 +208,58 @@ def jacobian_num(f, x, eps=1e-10, **params):
     return J
 
 
+def color_columns(pattern):
+    '''
+    Greedy coloring of the columns of a sparsity pattern, such that columns with the same color have no nonzero
+    rows in common (and can be perturbed together when computing a Jacobian numerically). Columns are colored in
+    order of decreasing number of conflicts (Welsh-Powell).
+    :param pattern: Sparse matrix (nonzeros indicate possible nonzeros in the Jacobian).
+    :return: Array with color of each column.
+    '''
+    pattern = sp.csc_matrix(pattern, dtype=bool)
+    conflicts = sp.csr_matrix((pattern.T @ pattern).astype(bool))
+    n_conflicts = np.diff(conflicts.indptr)
+    colors = -np.ones(pattern.shape[1], dtype=int)
+    for j in np.argsort(-n_conflicts, kind='stable'):
+        neighbour_colors = colors[conflicts.indices[conflicts.indptr[j]:conflicts.indptr[j + 1]]]
+        used = np.zeros(len(neighbour_colors) + 1, dtype=bool)
+        used[neighbour_colors[(neighbour_colors >= 0) & (neighbour_colors < len(used))]] = True
+        colors[j] = np.argmin(used)
+    return colors
+
+
+def jacobian_num_colored(f, x, pattern, colors=None, eps=1e-10, **params):
+    '''
+    Numerical computation of a sparse Jacobian, perturbing all columns with the same color simultaneously (see
+    color_columns), so that 2*n_colors function evaluations are needed instead of 2*n.
+    :param f: Function
+    :param x: Point of linearization.
+    :param pattern: Sparse matrix (nonzeros indicate possible nonzeros in the Jacobian).
+    :param colors: Column colors (computed from pattern if not given).
+    :return: Jacobian (sparse csr-matrix)
+    '''
+    pattern = sp.csc_matrix(pattern, dtype=bool)
+    if colors is None:
+        colors = color_columns(pattern)
+
+    rows = pattern.indices
+    cols = np.repeat(np.arange(pattern.shape[1]), np.diff(pattern.indptr))
+    data = np.zeros(len(rows))
+    for color in range(max(colors, default=-1) + 1):
+        perturbed = colors == color
+        x1 = x.copy()
+        x2 = x.copy()
+
+        x1[perturbed] += eps
+        x2[perturbed] -= eps
+
+        df = (f(x1, **params) - f(x2, **params)) / (2 * eps)
+        mask = perturbed[cols]
+        data[mask] = df[rows[mask]]
+
+    return sp.csr_matrix((data, (rows, cols)), shape=pattern.shape)
+
+
 class DynamicModel:  # This is not used anymore?
     # Empty dummy-class for dynamic models (Gen, AVR, GOV, PSS etc.)
     def __init__(self):
@@ -0,0 +1,66 @@
+import numpy as np
+import scipy.sparse as sp
+import tops.dynamic as dps
+import tops.utility_functions as utils
+from tops.autodiff import DualArray, jacobian
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_dual_array_derivatives():
+    def f(x):
+        z = x[0] + 1j*x[1]
+        y = np.zeros(8, dtype=complex) if not isinstance(x, DualArray) else DualArray.zeros(8, x.n_tan, complex)
+        y[0] = np.exp(1j*x[2])*z/(2 + x[0]**2)
+        y[1] = abs(z)*np.angle(z)
+        y[2] = np.conj(z)*z.imag
+        y[3] = np.sqrt(x[3])*np.sin(x[2]) - np.cos(x[3])
+        y[4] = np.minimum(np.maximum(x[0], 0.1), 0.2) + np.clip(x[1], -1, 1)
+        y[5] = np.sum(x[:3]*np.array([1, 2, 3]))
+        y[6] = np.arctan2(x[1], x[0]) + np.tanh(x[3])
+        y[7] = np.where(x[0] > 0, x[1]**2, x[2])
+        return y
+
+    x = np.array([0.7, -0.4, 0.3, 1.5])
+    y, jac = f(DualArray.seed(x, np.eye(4))).val, f(DualArray.seed(x, np.eye(4))).tan.T
+    assert np.allclose(y, f(x))
+    jac_num = np.array([(f(x + 1e-7*e) - f(x - 1e-7*e))/2e-7 for e in np.eye(4)]).T
+    assert np.allclose(jac, jac_num, atol=1e-6)
+
+
+def test_dual_array_views():
+    x = DualArray.seed(np.arange(6.), np.eye(6))
+    X = x[2:].view(dtype=[('a', float), ('b', float)])
+    assert np.array_equal(X['b'].val, [3, 5])
+    X['a'][:] = 2*X['b']
+    assert np.array_equal(x.val, [0, 1, 6, 3, 10, 5])
+    assert np.array_equal(x.tan[:, 2], 2*np.eye(6)[3])
+
+    X['a'][X['a'] > 7] *= 0
+    assert np.array_equal(x.val, [0, 1, 6, 3, 0, 5])
+    assert np.all(x.tan[:, 4] == 0)
+
+
+def test_jacobian():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    f, jac = jacobian(ps, 0, ps.x0)
+    assert np.allclose(f, ps.ode_fun(0, ps.x0))
+    jac_num = utils.jacobian_num(lambda x: ps.ode_fun(0, x), ps.x0, eps=1e-6)
+    assert np.allclose(jac, jac_num, atol=1e-6)
+
+    # Jacobian-vector products
+    d = np.random.default_rng(0).standard_normal((ps.n_states, 2))
+    assert np.allclose(jacobian(ps, 0, ps.x0, d)[1], jac.dot(d))
+
+    # Outputs are still cached in normal evaluations
+    ps.ode_fun(0, ps.x0)
+    assert ps.gen['GEN']._store_output is False
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize(autodiff=True)
+    assert np.allclose(ps_lin.a, jac)
+    ps_lin.linearize(sparse=True, autodiff=True)
+    assert sp.issparse(ps_lin.a)
+    assert np.allclose(ps_lin.a.toarray(), jac)
@@ -0,0 +1,32 @@
+import numpy as np
+import tops.dyn_models.pss as pss_lib
+
+
+def test_block_names():
+    n_units = 2000
+    pss = pss_lib.STAB1(
+        name=np.array(['PSS{}'.format(i) for i in range(n_units)]), gen=np.array(['G1']*n_units),
+        K=np.full(n_units, 50.), T=np.full(n_units, 10.), T_1=np.full(n_units, 0.5), T_2=np.full(n_units, 0.5),
+        T_3=np.full(n_units, 0.05), T_4=np.full(n_units, 0.05), H_lim=np.full(n_units, 0.03),
+    )
+
+    # Blocks with equal names get suffixes in the order they are found (ordered by attribute name)
+    assert list(pss.lead_lag_1.par['name'][:2]) == ['PSS0/LeadLag', 'PSS1/LeadLag']
+    assert list(pss.lead_lag_2.par['name'][:2]) == ['PSS0/LeadLag-2', 'PSS1/LeadLag-2']
+    assert pss.gain.par['name'][-1] == 'PSS{}/Gain'.format(n_units - 1)
+
+    # The name columns are replaced by wider ones, and the name indices follow the new names
+    assert pss.gain.par.dtype['name'].itemsize > np.dtype('<U4').itemsize
+    assert pss.gain.name_index.lookup('PSS5/Gain') == 5
+    assert np.isnan(pss.gain.name_index.lookup('Gain'))
+
+    # Parameters and state descriptions are kept
+    assert np.all(pss.gain.par['K'] == 50.)
+    assert pss.par.dtype.names[0] == 'name' and pss.gain.par.dtype.names[0] == 'name'
+    assert np.all(pss.washout.state_desc[:, 0] == pss.washout.par['name'])
+    assert len(np.unique(np.concatenate([pss.lead_lag_1.state_desc[:, 0], pss.lead_lag_2.state_desc[:, 0]]))) \
+        == 2*n_units
+
+
+if __name__ == '__main__':
+    test_block_names()
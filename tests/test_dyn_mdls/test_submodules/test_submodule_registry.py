@@ -0,0 +1,36 @@
+import inspect
+import tops.dynamic as dps
+import tops.dyn_models.utils as utils
+
+
+def get_submodules_inspect(mdl):
+    # Reference: discovery of sub-modules by inspecting all attributes
+    output = [mdl]
+    for attr, value in inspect.getmembers(mdl):
+        if not (attr.startswith('__') and attr.endswith('__')) and isinstance(value, utils.DAEModel):
+            output += get_submodules_inspect(value)
+    return output
+
+
+def test_submodule_registry():
+    import tops.ps_models.ieee39_all_ctrl as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    for mdl in ps.dyn_mdls:
+        assert utils.get_submodules(mdl) == get_submodules_inspect(mdl)
+
+    # Overwriting a block with something else removes it from the registry
+    mdl = ps.gov['TGOV1']
+    n_submodules = len(utils.get_submodules(mdl))
+    block_name = sorted(mdl._submodules)[0]
+    block = getattr(mdl, block_name)
+    setattr(mdl, block_name, None)
+    assert block not in utils.get_submodules(mdl)
+    assert len(utils.get_submodules(mdl)) < n_submodules
+    setattr(mdl, block_name, block)
+    assert len(utils.get_submodules(mdl)) == n_submodules
+
+
+if __name__ == '__main__':
+    test_submodule_registry()
@@ -0,0 +1,96 @@
+import numpy as np
+import tops.dynamic as dps
+import tops.solvers as dps_sol
+from tops.simulator import Simulator
+from tops.events import EventEngine
+
+
+def load_ps():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    return ps
+
+
+events = [
+    (1.0, 'fault', 'B8', 'apply'),
+    (1.0, 'line', 'L7-8-1', 'disconnect'),
+    (1.05, 'fault', 'B8', 'clear'),
+    (1.5, 'trafo', 'T4', 'disconnect'),
+    (1.5, 'load', 'L2', 'set', 1867, 100),
+    (1.6, 'trafo', 'T4', 'connect'),
+    (1.7, 'setpoint', ('gen', 'GEN', 'v_aux'), 0.01, 'G1'),
+]
+
+
+def simulate_manual(ps, t_end=2, dt=5e-3):
+    # Reference: events applied one at a time, with conditions in the loop
+    sol = dps_sol.ModifiedEulerDAE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, t_end, max_step=dt)
+    fault_bus = dps.dps_uf.lookup_strings('B8', ps.buses['name'])
+    applied = np.zeros(len(events), dtype=bool)
+    while sol.t < t_end - 0.5*dt:
+        sol.step()
+        for i, (t, kind, *args) in enumerate(events):
+            if sol.t >= t - 0.5*dt and not applied[i]:
+                applied[i] = True
+                if kind == 'fault':
+                    ps.y_bus_red_mod[(fault_bus,)*2] = 1e6 if args[1] == 'apply' else 0
+                elif kind == 'line':
+                    ps.lines['Line'].event(ps, *args)
+                elif kind == 'trafo':
+                    ps.trafos['Trafo'].event(ps, *args)
+                elif kind == 'load':
+                    ps.loads['Load'].event(ps, *args)
+                elif kind == 'setpoint':
+                    ps.gen['GEN'].set_input('v_aux', args[1], 0)
+                sol.v[:] = ps.solve_algebraic(sol.t, sol.x)
+    return sol.x.copy()
+
+
+def test_event_engine():
+    import warnings
+    from scipy.sparse import SparseEfficiencyWarning
+    warnings.simplefilter('ignore', SparseEfficiencyWarning)
+    x_manual = simulate_manual(load_ps())
+
+    # Plain solver loop
+    ps = load_ps()
+    dt = 5e-3
+    engine = EventEngine(ps, events, dt=dt)
+    assert len(engine.groups) == 5
+    sol = dps_sol.ModifiedEulerDAE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, 2, max_step=dt)
+    while sol.t < 2 - 0.5*dt:
+        sol.step()
+        engine.update(sol)
+    assert np.allclose(sol.x, x_manual)
+    assert not ps.lines['Line'].connected[lookup_line(ps, 'L7-8-1')]
+
+    # Simulator, with events on the timing heap
+    ps = load_ps()
+    sim = Simulator(ps, dt=dt, t_end=2 - 0.5*dt)
+    engine = EventEngine(ps, events, dt=dt)
+    engine.attach(sim)
+    sim.main_loop()
+    assert np.allclose(sim.sol.x, x_manual)
+    assert len(engine.log) == 5
+    assert len(sim.scheduled_functions) == 0
+
+
+def test_event_priority():
+    # Events are applied before or after interface functions due at the same step, depending on the priorities
+    dt = 5e-3
+    for priority, applied_before in [(0, False), (2, True)]:
+        ps = load_ps()
+        sim = Simulator(ps, dt=dt, t_end=0.12)
+        engine = EventEngine(ps, [(0.1, 'setpoint', ('gen', 'GEN', 'v_aux'), 0.01, 'G1')], dt=dt)
+        calls = []
+        sim.add_interface_function('logger', lambda sim: calls.append((sim.sol.t, len(engine.log))), period=0.05,
+                                   priority=1)
+        engine.attach(sim, priority=priority)
+        sim.main_loop()
+        assert np.allclose([t for t, _ in calls], [dt, 0.05, 0.1])
+        assert [n_applied for _, n_applied in calls] == [0, 0, int(applied_before)]
+        assert len(engine.log) == 1
+
+def lookup_line(ps, name):
+    return list(ps.lines['Line'].par['name']).index(name)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_eigenvalue_sensitivities():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    ps_lin.eigenvalue_decomposition()
+    mode_idx = ps_lin.get_mode_idx(['em', 'non_conj'])
+    eigs = ps_lin.eigs[mode_idx]
+
+    parameters = [(('gen', 'GEN'), 'H', None), (ps.pss['STAB1'].gain, 'K', 'PSS1/Gain'), (('lines', 'Line'), 'X', 1)]
+    sens = ps_lin.eigenvalue_sensitivities(parameters, mode_idx)
+    assert sens.shape == (ps.gen['GEN'].n_units + 2, len(mode_idx))
+    assert len(ps_lin.sensitivity_parameters) == len(sens)
+
+    # The parameters are not changed (also not the dtype of integer parameters)
+    assert ps.pss['STAB1'].gain.par.dtype['K'] == int
+    assert ps.lines['Line'].data is ps.lines['Line'].par
+
+    # Compare with finite differences of eigenvalues from new linearizations
+    y_bus_red = ps.y_bus_red.copy()
+    for (mdl, field, unit), sens_ in zip(ps_lin.sensitivity_parameters, sens):
+        # Perturbed in a copy with float dtype (for integer parameters)
+        par_0 = mdl.par
+        shares_data = getattr(mdl, 'data', None) is par_0
+        mdl.par = par_0.astype([(name, float if name == field else par_0.dtype[name]) for name in par_0.dtype.names])
+        if shares_data:
+            mdl.data = mdl.par
+        p_0 = mdl.par[field][unit]
+        h = 1e-4*max(abs(p_0), 1)
+        eigs_p = []
+        for p in [p_0 + h, p_0 - h]:
+            mdl.par[field][unit] = p
+            ps.y_bus_red = sp.csr_matrix(ps.kron_reduction(ps.build_y_bus_dyn(), ps.bus_idx_red))
+            ps_lin.linearize()
+            ps_lin.eigenvalue_decomposition()
+            eigs_p.append(np.array([ps_lin.eigs[np.argmin(abs(ps_lin.eigs - eig))] for eig in eigs]))
+        mdl.par = par_0
+        if shares_data:
+            mdl.data = par_0
+        sens_fd = (eigs_p[0] - eigs_p[1])/(2*h)
+        assert np.max(abs(sens_fd)) > 0
+        assert np.allclose(sens_, sens_fd, rtol=1e-3, atol=1e-3*np.max(abs(sens_fd)))
+
+    # The network is restored
+    ps.y_bus_red = ps.kron_reduction(ps.build_y_bus_dyn(), ps.bus_idx_red)
+    assert np.allclose(ps.y_bus_red, y_bus_red.toarray())
+
+
+def test_eigenvalue_sensitivities_no_effect():
+    # Parameters that are only used at initialization give a warning
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    y_bus_red = ps.y_bus_red.copy()
+    with pytest.warns(UserWarning, match='does not change the model equations'):
+        sens = ps_lin.eigenvalue_sensitivities([(('loads', 'Load'), 'P', 0)])
+    assert np.all(sens == 0)
+    assert abs(ps.y_bus_red - y_bus_red).max() == 0
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_eigenvalue_sweep():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    pss = ps.pss['STAB1']
+
+    def set_gain(value):
+        pss.gain.par['K'][:] = value
+
+    gains = np.linspace(0, 50, 11)
+    ps_lin = PowerSystemModelLinearization(ps)
+    eigs = ps_lin.eigenvalue_sweep(set_gain, gains)
+    assert eigs.shape == (len(gains), len(ps_lin.get_mode_idx(['em', 'non_conj'])))
+
+    # Tracked eigenvalues are eigenvalues of the full decomposition at each point
+    for gain, eigs_ in zip(gains[[1, 5, 10]], eigs[[1, 5, 10]]):
+        set_gain(gain)
+        ps_lin.linearize()
+        ps_lin.eigenvalue_decomposition()
+        assert all(np.min(abs(ps_lin.eigs - eig)) < 1e-6*abs(eig) for eig in eigs_)
+    assert len(np.unique(np.round(eigs[-1], 6))) == eigs.shape[1]
+
+    # Continuous trajectories
+    assert np.all(ps_lin.sweep_mac > 0.8)
+    assert np.max(abs(np.diff(eigs, axis=0))) < 1
+
+    # Sparse linearization gives the same trajectories
+    eigs_sparse = ps_lin.eigenvalue_sweep(set_gain, gains, sparse=True)
+    assert np.allclose(eigs_sparse, eigs, atol=1e-5)
+
+
+def test_track_modes_all_assigned():
+    # The same mode is tracked twice, and the only ARPACK candidate for the second one is already assigned
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    ps_lin.eigenvalue_decomposition()
+    mode_idx = ps_lin.get_mode_idx(['em', 'non_conj'])[[0, 0]]
+    with pytest.warns(UserWarning, match='could not be tracked'):
+        eigs, rev, lev, mac = ps_lin.track_modes(
+            ps_lin.eigs[mode_idx], ps_lin.rev[:, mode_idx], ps_lin.lev[mode_idx], k=1)
+    assert np.allclose(eigs, ps_lin.eigs[mode_idx])
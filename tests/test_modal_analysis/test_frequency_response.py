@@ -0,0 +1,26 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_frequency_response():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen = ps.gen['GEN']
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    b = np.eye(ps.n_states)[:, gen.state_idx_global['speed'][:2]]
+    c = np.eye(ps.n_states)[gen.state_idx_global['angle']]
+    freq = np.logspace(-2, 1, 50)
+
+    h_ref = np.array([c.dot(np.linalg.solve(2j*np.pi*f*np.eye(ps.n_states) - ps_lin.a, b)) for f in freq])
+    h = ps_lin.frequency_response(freq, b=b, c=c)
+    assert h.shape == (len(freq), gen.n_units, 2)
+    assert np.allclose(h, h_ref)
+
+    ps_lin.linearize(sparse=True)
+    h_lu = ps_lin.frequency_response(freq, b=b, c=c)
+    assert np.allclose(h_lu, h_ref, rtol=1e-4, atol=1e-6)
+    assert np.allclose(ps_lin.frequency_response(freq, method='schur', b=b, c=c), h_lu)
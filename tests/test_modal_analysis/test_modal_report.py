@@ -0,0 +1,37 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_modal_report():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen = ps.gen['GEN']
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    ps_lin.b = np.eye(ps.n_states)[:, gen.state_idx_global['speed']]
+    ps_lin.c = np.eye(ps.n_states)[gen.state_idx_global['angle']]
+    ps_lin.eigenvalue_decomposition()
+    report = ps_lin.modal_report()
+    mode_idx = report['mode_idx']
+    n_modes = len(mode_idx)
+    assert np.array_equal(mode_idx, ps_lin.get_mode_idx(['em', 'non_conj']))
+
+    assert report['participation'].shape == (ps.n_states, n_modes)
+    assert len(report['state_desc']) == ps.n_states
+    assert np.allclose(report['participation'].sum(axis=0), 1)
+
+    # Speed mode shapes
+    assert np.array_equal(report['gen_names'], gen.par['name'])
+    mode_shapes = ps_lin.rev[np.ix_(gen.state_idx_global['speed'], mode_idx)]
+    assert np.allclose(abs(report['speed_mode_shapes']).max(axis=0), 1)
+    for i in range(n_modes):
+        ratio = report['speed_mode_shapes'][:, i]/mode_shapes[:, i]
+        assert np.allclose(ratio, ratio[0])
+
+    # Residues, compared with residues for one mode at a time
+    assert report['residues'].shape == (n_modes, gen.n_units, gen.n_units)
+    for i, idx in enumerate(mode_idx):
+        assert np.allclose(report['residues'][i], ps_lin.residues(idx))
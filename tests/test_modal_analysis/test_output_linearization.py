@@ -0,0 +1,32 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_linearize_outputs_v4():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen = ps.gen['GEN']
+
+    output_description = [lambda t, x, v, i=i: gen.p_e(x, v)[i] for i in range(gen.n_units)]
+    output_description += [lambda t, x, v: gen.speed(x, v)[0]]
+    ps_lin = PowerSystemModelLinearization(ps)
+    c = ps_lin.linearize_outputs_v4(output_description)
+    assert c.shape == (gen.n_units + 1, ps.n_states)
+    assert c.dtype == float
+
+    # Speed output
+    c_speed = np.zeros(ps.n_states)
+    c_speed[gen.state_idx_global['speed'][0]] = 1
+    assert np.allclose(c[-1], c_speed)
+
+    # Electrical power, compared with perturbing each output separately
+    eps = 1e-6
+    x0 = ps.x0.copy()
+    for j in gen.state_idx_global['angle']:
+        x_1, x_2 = x0.copy(), x0.copy()
+        x_1[j] += eps
+        x_2[j] -= eps
+        dp_e = (gen.p_e(x_1, ps.solve_algebraic(0, x_1)) - gen.p_e(x_2, ps.solve_algebraic(0, x_2)))/(2*eps)
+        assert np.allclose(c[:-1, j], dp_e, rtol=1e-3, atol=1e-3)
@@ -0,0 +1,64 @@
+import numpy as np
+import scipy.sparse as sp
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_relinearize():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    ps_lin.eigenvalue_decomposition()
+    mode_idx = ps_lin.get_mode_idx(['em', 'non_conj'])
+    eigs_0 = ps_lin.eigs[mode_idx].copy()
+    assert len(ps_lin.relinearize()) == 0
+
+    # Retune one PSS: only the rows of states depending on its output are recomputed
+    ps.pss['STAB1'].gain.par['K'][0] = 30
+    rows = ps_lin.relinearize(mode_idx=mode_idx)
+    assert 0 < len(rows) < ps.n_states/2
+    assert np.all(np.isin(ps.pss['STAB1'].state_idx_global[0].tolist(), rows))
+    a = ps_lin.a.copy()
+    assert not ps_lin.eigenvalues_ready
+    # The last decomposition is kept, and the tracked modes are stored separately
+    assert np.array_equal(ps_lin.eigs[mode_idx], eigs_0)
+    eigs = ps_lin.tracked_modes['eigs']
+    assert not np.allclose(eigs, eigs_0)
+
+    # Tracking again, from the last tracked modes
+    ps.pss['STAB1'].gain.par['K'][0] = 40
+    ps_lin.relinearize(mode_idx=mode_idx)
+    assert not np.allclose(ps_lin.tracked_modes['eigs'], eigs)
+    ps.pss['STAB1'].gain.par['K'][0] = 30
+    ps_lin.relinearize(mode_idx=mode_idx)
+    assert np.allclose(ps_lin.tracked_modes['eigs'], eigs)
+
+    ps_lin.linearize()
+    assert np.allclose(a, ps_lin.a, atol=1e-6)
+    ps_lin.eigenvalue_decomposition()
+    assert ps_lin.tracked_modes is None
+    assert np.allclose(eigs, ps_lin.eigs[mode_idx])
+
+    # Sparse, with automatic differentiation
+    ps_lin.linearize(sparse=True, autodiff=True)
+    # Input and output matrices are kept by both the incremental and the full update
+    b = np.random.default_rng(0).standard_normal((ps.n_states, 2))
+    c = np.random.default_rng(1).standard_normal((3, ps.n_states))
+    ps_lin.b, ps_lin.c = b.copy(), c.copy()
+    ps.avr['SEXS'].par['K'][1] *= 0.5
+    rows = ps_lin.relinearize(autodiff=True)
+    assert 0 < len(rows) < ps.n_states/2
+    assert sp.issparse(ps_lin.a)
+    assert np.array_equal(ps_lin.b, b) and np.array_equal(ps_lin.c, c)
+    a = ps_lin.a.toarray()
+    ps_lin.linearize(autodiff=True)
+    assert np.allclose(a, ps_lin.a)
+
+    # Generator parameters affect the network interface, giving full linearization
+    ps_lin.b, ps_lin.c = b.copy(), c.copy()
+    ps.gen['GEN'].par['H'][0] *= 1.1
+    assert len(ps_lin.relinearize()) == ps.n_states
+    assert np.array_equal(ps_lin.b, b) and np.array_equal(ps_lin.c, c)
@@ -0,0 +1,28 @@
+import numpy as np
+import scipy.sparse as sp
+import tops.dynamic as dps
+import tops.utility_functions as utils
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_color_columns():
+    pattern = sp.random(60, 60, density=0.05, random_state=0, format='csc') + sp.eye(60)
+    colors = utils.color_columns(pattern)
+    pattern = pattern.toarray() != 0
+    for row in pattern:
+        assert len(np.unique(colors[row])) == row.sum()
+
+
+def test_sparse_linearization():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    a_dense = ps_lin.a.copy()
+
+    ps_lin.linearize(sparse=True)
+    assert sp.issparse(ps_lin.a)
+    assert max(ps_lin.colors) + 1 < ps.n_states/2
+    assert np.allclose(ps_lin.a.toarray(), a_dense, rtol=0, atol=1e-6)
@@ -0,0 +1,23 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+
+
+def test_targeted_eigenvalues():
+    import tops.ps_models.ieee39 as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize(sparse=True)
+    ps_lin.eigenvalue_decomposition()
+    em_modes = ps_lin.eigs[ps_lin.get_mode_idx(['em', 'non_conj'], damp_threshold=0.3)]
+
+    ps_lin.eigenvalue_decomposition_targeted()
+    for eig in em_modes:
+        assert min(abs(ps_lin.eigs - eig)) < 1e-6
+
+    a = ps_lin.a.toarray()
+    assert np.allclose(ps_lin.lev.dot(ps_lin.rev), np.eye(len(ps_lin.eigs)), atol=1e-8)
+    assert np.allclose(ps_lin.lev.dot(a), ps_lin.eigs[:, None]*ps_lin.lev, atol=1e-6)
+    assert np.allclose(a.dot(ps_lin.rev), ps_lin.rev*ps_lin.eigs, atol=1e-6)
@@ -0,0 +1,68 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.modal_analysis import PowerSystemModelLinearization
+from tops.model_reduction import LTIModel, balanced_truncation, krylov_reduction
+
+
+def get_linear_model():
+    import tops.ps_models.ieee39 as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen = ps.gen['GEN']
+    ps_lin = PowerSystemModelLinearization(ps)
+    ps_lin.linearize()
+    ps_lin.b = np.eye(ps.n_states)[:, gen.state_idx_global['speed'][:2]]
+    ps_lin.c = np.eye(ps.n_states)[gen.state_idx_global['speed'][[0, 5, 9]]]
+    return LTIModel.from_linearization(ps_lin)
+
+
+def test_balanced_truncation():
+    model = get_linear_model()
+    freq = np.logspace(-2, 1, 50)
+    h = model.frequency_response(freq)
+
+    reduced = balanced_truncation(model.a, model.b, model.c, n_states=20)
+    assert reduced.n_states < 30
+    assert reduced.frequency_response(freq).shape == h.shape
+    # Error bound (H-infinity norm, here evaluated on the frequency grid)
+    error = np.max([np.linalg.norm(h_, 2) for h_ in reduced.frequency_response(freq) - h])
+    assert error <= 2*np.sum(reduced.hsv[20:])
+
+    # Step response, with zero order hold simulation
+    u = np.zeros((500, model.n_inputs))
+    u[:, 0] = 0.01
+    t, y, x = model.simulate(u, 0.01)
+    t_r, y_r, x_r = reduced.simulate(u, 0.01)
+    assert y_r.shape == (500, model.n_outputs)
+    assert np.allclose(t_r, t)
+    assert np.max(abs(y_r - y)) < 1e-3*np.max(abs(y))
+
+    ss = reduced.to_state_space()
+    assert np.allclose(ss.A, reduced.a)
+    assert np.allclose(np.array(reduced.to_dict()['c']), reduced.c)
+
+
+def test_balanced_truncation_complex():
+    # Unitary, complex change of coordinates: same transfer function and Hankel singular values
+    model = get_linear_model()
+    rng = np.random.default_rng(0)
+    q, _ = np.linalg.qr(rng.normal(size=(model.n_states,)*2) + 1j*rng.normal(size=(model.n_states,)*2))
+    a, b, c = q.conj().T.dot(model.a).dot(q), q.conj().T.dot(model.b), model.c.dot(q)
+    freq = np.logspace(-2, 1, 50)
+    h = model.frequency_response(freq)
+
+    reduced = balanced_truncation(model.a, model.b, model.c, n_states=20)
+    reduced_complex = balanced_truncation(a, b, c, n_states=20)
+    assert np.allclose(reduced_complex.hsv, reduced.hsv, rtol=1e-6, atol=1e-8*reduced.hsv[0])
+    error = np.max([np.linalg.norm(h_, 2) for h_ in reduced_complex.frequency_response(freq) - h])
+    assert error <= 2*np.sum(reduced.hsv[20:])
+
+
+def test_krylov_reduction():
+    model = get_linear_model()
+    freq = np.linspace(0.2, 1.5, 30)
+    h = model.frequency_response(freq)
+
+    reduced = krylov_reduction(model.a, model.b, model.c, s0=2j*np.pi*np.array([0.2, 0.6, 1., 1.5]), n_moments=3)
+    assert reduced.n_states < 60
+    assert np.max(abs(reduced.frequency_response(freq) - h)) < 1e-2*np.max(abs(h))
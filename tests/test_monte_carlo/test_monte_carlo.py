@@ -0,0 +1,47 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.solvers_sde import EulerDAE_SDE
+from tops.monte_carlo import MonteCarloSDE, OnlineMoments, P2Quantile
+
+
+def setup_sm_ib():
+    import tops.ps_models.sm_ib as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+
+    def make_solver(rng):
+        return EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, max_step=5e-3, dim_w=2,
+                            b=[(idx, 1e-3) for idx in speed_idx], rng=rng)
+    return ps, make_solver
+
+
+def test_streaming_statistics():
+    rng = np.random.default_rng(0)
+    y = rng.standard_normal((2000, 3))
+    moments = OnlineMoments(3)
+    quantiles = {p: P2Quantile(p, (3,)) for p in [0.1, 0.5, 0.9]}
+    for y_ in y:
+        moments.update(y_)
+        [q.update(y_) for q in quantiles.values()]
+
+    assert np.allclose(moments.mean, y.mean(axis=0))
+    assert np.allclose(moments.var, y.var(axis=0, ddof=1))
+    for p, q in quantiles.items():
+        assert max(abs(q.value - np.quantile(y, p, axis=0))) < 0.1
+
+
+def test_monte_carlo_reproducible():
+    kwargs = dict(signals=[('gen', 'GEN', 'speed')], n_paths=6, t_end=0.5, seed=1, psd_nperseg=32)
+    mc_serial = MonteCarloSDE(setup_sm_ib, **kwargs)
+    mc_serial.run()
+    mc_parallel = MonteCarloSDE(setup_sm_ib, n_workers=2, **kwargs)
+    mc_parallel.run()
+
+    assert mc_serial.n == 6
+    assert mc_serial.mean.shape == (100, 2)
+    assert np.all(mc_serial.std[-1] > 0)
+    assert np.array_equal(mc_serial.mean, mc_parallel.mean)
+    assert np.array_equal(mc_serial.quantiles[0.5].value, mc_parallel.quantiles[0.5].value)
+    assert np.array_equal(mc_serial.psd.mean, mc_parallel.psd.mean)
+    assert mc_serial.psd.mean.shape == (len(mc_serial.psd_freq), 2)
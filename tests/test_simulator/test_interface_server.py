@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import numpy as np
+import tops.dynamic as dps
+from tops.simulator import Simulator
+from tops.interface_server import InterfaceServer, InterfaceClient, ClientWriter
+
+
+def test_interface_server():
+    import tops.ps_models.sm_ib as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    P_m_0 = ps.gen['GEN']._input_values['P_m'].copy()
+
+    sim = Simulator(ps, dt=5e-3, t_end=np.inf)
+    server = InterfaceServer(sim)
+    client = InterfaceClient(server.start())
+    thread = threading.Thread(target=sim.main_loop)
+    thread.start()
+
+    try:
+        client.subscribe('speed', [('gen', 'GEN', 'speed')], rate=20)
+        msg = client.receive()
+        assert msg['op'] == 'subscribed' and msg['desc'] == [['G1', 'speed'], ['IB', 'speed']]
+
+        client.set([('gen', 'GEN', 'P_m', 1.5*P_m_0[0], 'G1')])
+        client.set([('gen', 'GEN', 'P_x', 0.)])
+        # Unknown units are rejected, without applying the other setpoints of the message
+        client.set([('gen', 'GEN', 'P_m', 0., 'IB'), ('gen', 'GEN', 'P_m', 0., 'G9')])
+        t, speed = [], []
+        errors = []
+        while len(t) < 10:
+            msg = client.receive()
+            if msg['op'] == 'error':
+                errors.append(msg)
+            else:
+                t.append(msg['t'])
+                speed.append(msg['values'][0])
+        assert len(errors) == 2
+        assert 'Unit G9 not found in GEN' in errors[1]['message']
+        assert ps.gen['GEN']._input_values['P_m'][1] == P_m_0[1]
+        assert np.allclose(np.diff(t), 0.05)
+        assert speed[-1] > max(speed[0], 0)
+        assert ps.gen['GEN']._input_values['P_m'][0] == 1.5*P_m_0[0]
+
+        client.unsubscribe('speed')
+        client.unsubscribe('speed')
+        while client.receive()['op'] != 'error':
+            pass
+    finally:
+        sim._stopped = True
+        thread.join()
+        client.close()
+        server.stop()
+    assert len(sim.scheduled_functions) == 0
+
+
+def test_interface_server_complex_outputs():
+    import tops.ps_models.sm_ib as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    sim = Simulator(ps, dt=5e-3, t_end=np.inf)
+    server = InterfaceServer(sim)
+    client = InterfaceClient(server.start())
+    thread = threading.Thread(target=sim.main_loop)
+    thread.start()
+
+    try:
+        client.subscribe('i', [('gen', 'GEN', 'speed'), ('gen', 'GEN', 'i')], rate=20)
+        msg = client.receive()
+        assert msg['op'] == 'subscribed'
+        assert msg['desc'] == [['G1', 'speed'], ['IB', 'speed'], ['G1', 'i'], ['IB', 'i']]
+        msg = client.receive()
+        assert msg['op'] == 'data'
+        speed, i = msg['values'][:2], msg['values'][2:]
+        assert all(isinstance(value, float) for value in speed)
+        i = np.array(i)
+        assert i.shape == (2, 2)
+        assert np.allclose(i[:, 0] + 1j*i[:, 1], ps.gen['GEN'].i(ps.x0, ps.v0), atol=1e-2)
+    finally:
+        sim._stopped = True
+        thread.join()
+        # The server is stopped while the client is still connected
+        server.stop()
+        client.close()
+    assert len(sim.scheduled_functions) == 0
+
+
+def test_client_writer_slow_client():
+    # Messages are written one at a time after the transport has drained, and data messages are dropped when too
+    # many are waiting
+    class SlowWriter:
+        def __init__(self):
+            self.written = []
+
+        def write(self, data):
+            self.written.append(data)
+
+        async def drain(self):
+            await asyncio.Event().wait()
+
+        def close(self):
+            pass
+
+    async def run():
+        writer = SlowWriter()
+        client = ClientWriter(writer, max_pending=3)
+        for k in range(10):
+            client.send({'op': 'data', 'k': k}, droppable=True)
+        client.send({'op': 'error', 'message': ''})
+        await asyncio.sleep(0.01)
+        client.close()
+        return writer, client
+
+    writer, client = asyncio.run(run())
+    assert len(writer.written) == 1
+    assert client.n_dropped == 7
+    assert len(client.pending) == 3
@@ -0,0 +1,24 @@
+import time
+import numpy as np
+import tops.dynamic as dps
+from tops.simulator import Simulator
+
+
+def test_real_time_pacing():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    t_end = 0.25
+    sim = Simulator(ps, dt=5e-3, t_end=t_end, real_time=True, steps_per_tick=5)
+    t_wall = time.perf_counter()
+    sim.main_loop()
+    t_wall = time.perf_counter() - t_wall
+
+    stats = sim.rt_stats
+    assert stats.n_steps == 50
+    assert stats.n_ticks == 10
+    assert sum(stats.latency_hist) == stats.n_steps
+    # The last tick is started at t_end - tick, and takes (at least) the time needed to simulate it
+    assert t_wall >= t_end - 5*5e-3
+    assert np.isclose(sim.sol.t, t_end)
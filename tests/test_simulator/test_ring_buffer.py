@@ -0,0 +1,59 @@
+import threading
+import numpy as np
+import tops.dynamic as dps
+from tops.simulator import Simulator, SignalRingBuffer
+
+
+def test_ring_buffer_overwrite():
+    buffer = SignalRingBuffer(2, capacity=10)
+    reader = buffer.reader()
+    for k in range(25):
+        buffer.write(k, [k, 2*k])
+    t, data = reader.read(max_n=5)
+    assert reader.n_lost == 15
+    assert np.array_equal(t, np.arange(15, 20))
+    t, data = reader.read()
+    assert np.array_equal(t, np.arange(20, 25))
+    assert np.array_equal(data[:, 1], 2*t)
+    assert reader.available() == 0
+
+
+def test_ring_buffer_concurrent_reader():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    sim = Simulator(ps, dt=5e-3, t_end=2)
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+    buffer = sim.add_ring_buffer('speed', state_idx=speed_idx, outputs=[('gen', 'GEN', 'speed')], capacity=16)
+    reader = buffer.reader()
+
+    thread = threading.Thread(target=sim.main_loop)
+    thread.start()
+    t, data = [], []
+    while thread.is_alive() or reader.available() > 0:
+        t_new, data_new = reader.read()
+        t.append(t_new)
+        data.append(data_new)
+    thread.join()
+    t = np.concatenate(t)
+    data = np.concatenate(data)
+
+    # Samples are in order, each sample is consistent, and lost samples are accounted for
+    assert np.all(np.diff(t) > 0)
+    assert np.allclose(data[:, :4], data[:, 4:])
+    assert len(t) + reader.n_lost == int(round(sim.sol.t/sim.dt))
+
+
+def test_ring_buffer_complex():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    sim = Simulator(ps, dt=5e-3, t_end=0.05)
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+    buffer = sim.add_ring_buffer('v_t', state_idx=speed_idx, outputs=[('gen', 'GEN', 'v_t')])
+    reader = buffer.reader()
+    sim.main_loop()
+    t, data = reader.read()
+    assert buffer.data.dtype == complex
+    assert np.allclose(data[-1, 4:], ps.gen['GEN'].v_t(sim.sol.x, sim.sol.v))
+    assert np.all(abs(data[:, 4:].imag) > 0)
@@ -0,0 +1,80 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.simulator import Simulator, InterfacerDirect
+
+
+def test_interface_function_schedule():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    sim = Simulator(ps, dt=5e-3, t_end=1)
+
+    calls = []
+    sim.interface_functions['every_step'] = lambda sim: calls.append(('every_step', sim.sol.t))
+    sim.add_interface_function('10Hz', lambda sim: calls.append(('10Hz', sim.sol.t)), period=0.1, phase=0.05)
+    sim.add_interface_function('low', lambda sim: calls.append(('low', sim.sol.t)), period=0.25, priority=-1)
+    sim.add_interface_function('high', lambda sim: calls.append(('high', sim.sol.t)), period=0.25, priority=1)
+    sim.add_interface_function('fast', lambda sim: calls.append(('fast', sim.sol.t)), period=1e-3)
+    interfacer = InterfacerDirect(sim, name='Interfacer', fs=20)
+    n_interfacer = []
+    interfacer.update = lambda input: n_interfacer.append(sim.sol.t)
+    sim.main_loop()
+
+    def times(name):
+        return np.array([t for key, t in calls if key == name])
+
+    n_steps = len(times('every_step'))
+    assert np.allclose(times('10Hz'), np.arange(0.05, 1, 0.1))
+    assert len(times('fast')) == n_steps
+    assert len(n_interfacer) == int(np.floor(sim.sol.t*20 + 1e-6)) + 1
+    # Same time: higher priority first
+    keys = [key for key, _ in calls if key in ['low', 'high']]
+    assert keys == ['high', 'low']*len(times('high'))
+
+    sim.remove_interface_function('10Hz')
+    sim.t_end = 2
+    sim.main_loop()
+    assert len(times('10Hz')) == 10
+    assert 'every_step' in sim.interface_functions
+
+
+def test_reregister_interface_function():
+    # Registering the same function again under the same name replaces the schedule (no duplicate calls)
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    sim = Simulator(ps, dt=5e-3, t_end=0.5)
+
+    calls = []
+
+    def log(sim):
+        calls.append(('log', sim.sol.t))
+
+    def once(sim):
+        calls.append(('once', sim.sol.t))
+
+    sim.add_interface_function('log', log, period=0.1)
+    sim.add_interface_function('log', log, period=0.1)
+    sim.add_timed_function(0.2, once, name='once')
+    sim.add_timed_function(0.2, once, name='once')
+    sim.main_loop()
+    t_log = [t for key, t in calls if key == 'log']
+    assert len(t_log) == 6
+    assert np.allclose(t_log[1:], np.arange(0.1, 0.55, 0.1))
+    assert len([t for key, t in calls if key == 'once']) == 1
+
+
+def test_priority_within_step():
+    # Functions due at the same step are called in order of priority, also if their due times differ
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    sim = Simulator(ps, dt=5e-3, t_end=0.12)
+
+    calls = []
+    sim.add_interface_function('low', lambda sim: calls.append(('low', sim.sol.t)), period=0.05, phase=0.001)
+    sim.add_interface_function('high', lambda sim: calls.append(('high', sim.sol.t)), period=0.05, phase=0.003,
+                               priority=10)
+    sim.main_loop()
+    assert [key for key, _ in calls] == ['high', 'low']*3
+    assert np.allclose([t for _, t in calls], np.repeat([0.005, 0.055, 0.105], 2))
@@ -0,0 +1,99 @@
+import os
+import time
+import threading
+import multiprocessing
+import numpy as np
+import tops.dynamic as dps
+from tops.simulator import Simulator
+from tops.shared_memory import SharedMemoryInterface, SharedMemoryClient
+
+
+def controller(name, P_m, result):
+    # Runs in another process: follows the updates (by sequence number) until the simulation has advanced 0.05 s
+    # from the first read, then raises the mechanical power of G1
+    client = SharedMemoryClient(name)
+    t_0, values, seq = client.read()
+    times = [t_0]
+    while times[-1] < t_0 + 0.05 - 1e-9:
+        t, values, seq = client.wait_for_update(seq, timeout=10)
+        times.append(t)
+    client.write_inputs([('gen', 'GEN', 'P_m', 'G1', P_m)])
+    result.put((client.data_desc, times))
+    client.close()
+
+
+def test_shared_memory_interface():
+    import tops.ps_models.sm_ib as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    P_m_0 = ps.gen['GEN']._input_values['P_m'].copy()
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+
+    sim = Simulator(ps, dt=5e-3, t_end=np.inf)
+    name = 'tops_test_{}'.format(os.getpid())
+    interface = SharedMemoryInterface(sim, name, state_idx=speed_idx, outputs=[('gen', 'GEN', 'P_e')],
+                                      inputs=[('gen', 'GEN', 'P_m')], period=0.01)
+
+    result = multiprocessing.Queue()
+    process = multiprocessing.Process(target=controller, args=(name, 1.5*P_m_0[0], result))
+    process.start()
+    thread = threading.Thread(target=sim.main_loop)
+    thread.start()
+    try:
+        data_desc, times = result.get(timeout=20)
+        process.join()
+        t_wait = time.perf_counter()
+        while ps.gen['GEN']._input_values['P_m'][0] == P_m_0[0] and time.perf_counter() - t_wait < 10:
+            time.sleep(1e-3)
+    finally:
+        sim._stopped = True
+        thread.join()
+        interface.close()
+
+    assert [desc[0] for desc in data_desc] == ['state']*2 + ['output']*2
+    assert data_desc[3] == ['output', 'gen', 'GEN', 'P_e', 'IB']
+    # Each update (new sequence number) has a later time
+    assert np.all(np.diff(times) > 0)
+    assert times[-1] > times[0] + 0.05 - 1e-9
+    assert ps.gen['GEN']._input_values['P_m'][0] == 1.5*P_m_0[0]
+    assert ps.gen['GEN']._input_values['P_m'][1] == P_m_0[1]
+
+
+def test_shared_memory_complex_outputs_and_inputs():
+    import tops.ps_models.sm_ib as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    gen = ps.gen['GEN']
+    P_m_0 = gen._input_values['P_m'].copy()
+
+    sim = Simulator(ps, dt=5e-3, t_end=np.inf)
+    name = 'tops_test_complex_{}'.format(os.getpid())
+    interface = SharedMemoryInterface(sim, name, outputs=[('gen', 'GEN', 'v_t')], inputs=[('gen', 'GEN', 'P_m')])
+    client = SharedMemoryClient(name)
+    try:
+        # Complex outputs are stored as real and imaginary parts
+        assert client.data_desc[:2] == [['output', 'gen', 'GEN', 'v_t', 'G1', 'real'],
+                                        ['output', 'gen', 'GEN', 'v_t', 'G1', 'imag']]
+        sim.make_simulation_step()
+        t, values, seq = client.read()
+        assert np.allclose(values[0::2] + 1j*values[1::2], gen.v_t(sim.sol.x, sim.sol.v))
+        assert np.all(values[1::2] != 0)
+
+        # Only inputs changed by the client are applied, values set by other code are kept
+        gen.set_input('P_m', 0.9*P_m_0[1], 1)
+        client.write_inputs([('gen', 'GEN', 'P_m', 'G1', 1.1*P_m_0[0])])
+        sim.make_simulation_step()
+        assert gen._input_values['P_m'][0] == 1.1*P_m_0[0]
+        assert gen._input_values['P_m'][1] == 0.9*P_m_0[1]
+
+        # A torn write (odd sequence number) is skipped, and the inputs are read after a later step
+        client.input_values.seq[0] += 1
+        client.input_values.values[0] = 1.2*P_m_0[0]
+        sim.make_simulation_step()
+        assert gen._input_values['P_m'][0] == 1.1*P_m_0[0]
+        client.input_values.seq[0] += 1
+        sim.make_simulation_step()
+        assert gen._input_values['P_m'][0] == 1.2*P_m_0[0]
+    finally:
+        client.close()
+        interface.close()
@@ -0,0 +1,115 @@
+import numpy as np
+import scipy.sparse as sp
+import tops.dynamic as dps
+from tops.solvers_sde import EulerDAE_SDE, StateNoise, InputNoise, OUInput, philox_generator
+
+
+def load_ps():
+    import tops.ps_models.k2a as model_data
+    model = model_data.load()
+    model['loads'] = {'DynamicLoadFiltered': [
+        model['loads'][0] + ['T_g', 'T_b'],
+        *[row + [0.1, 0.1] for row in model['loads'][1:]]
+    ]}
+    ps = dps.PowerSystemModel(model=model)
+    ps.init_dyn_sim()
+    return ps
+
+
+def simulate(ps, n_steps=100, seed=0, **kwargs):
+    sol = EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, max_step=5e-3, rng=seed, **kwargs)
+    for _ in range(n_steps):
+        sol.step()
+    return sol.x.copy()
+
+
+def test_diffusion_formats():
+    # Dense function, sparse matrix and (state index, gain) pairs should give identical trajectories
+    ps = load_ps()
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+    dim_w = len(speed_idx)
+
+    b_dense = np.zeros((ps.n_states, dim_w))
+    b_dense[speed_idx, np.arange(dim_w)] = 1e-3
+
+    x_dense = simulate(ps, dim_w=dim_w, b=lambda t, x, v: b_dense)
+    x_sparse = simulate(ps, dim_w=dim_w, b=sp.csr_matrix(b_dense))
+    x_pairs = simulate(ps, dim_w=dim_w, b=[(idx, 1e-3) for idx in speed_idx])
+
+    assert max(abs(x_dense - ps.x_0)) > 0
+    assert np.allclose(x_dense, x_sparse, rtol=0, atol=1e-12)
+    assert np.allclose(x_dense, x_pairs, rtol=0, atol=1e-12)
+
+
+def test_input_noise():
+    # Noise on the input of a first order filter equals noise on the filter state, scaled by 1/T
+    ps = load_ps()
+    load = ps.loads['DynamicLoadFiltered']
+    g_setp_0 = load._input_values['g_setp'].copy()
+
+    x_input = simulate(ps, dim_w=2, input_noise=[InputNoise(load, 'g_setp', gain=0.01)])
+    assert np.array_equal(load._input_values['g_setp'], g_setp_0)
+
+    x_state = simulate(ps, dim_w=2, b=StateNoise(load.lpf_g.state_idx_global['x'], 0.01/load.lpf_g.par['T']))
+    assert max(abs(x_input - ps.x_0)) > 0
+    assert np.allclose(x_input, x_state, rtol=0, atol=1e-10)
+
+
+def test_input_noise_algebraic():
+    # With noise on an input of the algebraic equations (g_setp of DynamicLoad), the stored algebraic variables
+    # should be consistent with the (restored) inputs after each step
+    import tops.ps_models.k2a as model_data
+    model = model_data.load()
+    model['loads'] = {'DynamicLoad': model['loads']}
+    ps = dps.PowerSystemModel(model=model)
+    ps.init_dyn_sim()
+    load = ps.loads['DynamicLoad']
+    sol = EulerDAE_SDE(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, max_step=5e-3, rng=0, dim_w=2,
+                       input_noise=[InputNoise(load, 'g_setp', gain=0.01)])
+    for _ in range(10):
+        sol.step()
+        assert np.allclose(sol.v, ps.solve_algebraic(sol.t, sol.x), rtol=0, atol=1e-12)
+    assert max(abs(sol.x - ps.x_0)) > 0
+
+
+def test_empty_state_noise():
+    ps = load_ps()
+    assert np.array_equal(simulate(ps, dim_w=2, b=[]), simulate(ps, dim_w=2, b=None))
+
+
+def test_noise_streams():
+    # Noise should depend only on seed and stream, not on the block size used for pregeneration
+    ps = load_ps()
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+    b = StateNoise(speed_idx, 1e-3)
+    x_1 = simulate(ps, dim_w=len(speed_idx), b=b, seed=3, block_size=1)
+    x_2 = simulate(ps, dim_w=len(speed_idx), b=b, seed=3, block_size=64)
+    x_3 = simulate(ps, dim_w=len(speed_idx), b=b, seed=3, stream=1)
+    assert np.allclose(x_1, x_2, rtol=0, atol=0)
+    assert not np.allclose(x_1, x_3)
+
+
+def test_ou_input():
+    # Stationary variance and autocorrelation of the OU process should not depend on the time step
+    ps = load_ps()
+    load = ps.loads['DynamicLoadFiltered']
+    T = np.array([0.5, 2.])
+    sigma = np.array([0.01, 0.02])
+    for dt in [0.01, 1.]:
+        ou = OUInput(load, 'g_setp', T=T, sigma=sigma)
+        rng = philox_generator(0)
+        y = []
+        for _ in range(50000):
+            ou.apply(rng.normal(0, np.sqrt(dt), 2), dt)
+            y.append(load._input_values['g_setp'].copy())
+            ou.restore()
+        y = np.array(y)[1000:] - load._input_values['g_setp']
+        assert np.allclose(np.std(y, axis=0), sigma, rtol=0.1)
+        rho = np.sum(y[1:]*y[:-1], axis=0)/np.sum(y**2, axis=0)
+        assert np.allclose(rho, np.exp(-dt/T), atol=0.05)
+
+    ou = OUInput(load, 'g_setp', T=1, sigma=0.01, y_0=0.01)
+    g_setp_0 = load._input_values['g_setp'].copy()
+    x = simulate(ps, dim_w=2, input_noise=[ou])
+    assert np.array_equal(load._input_values['g_setp'], g_setp_0)
+    assert max(abs(x - ps.x_0)) > 0
@@ -0,0 +1,61 @@
+import numpy as np
+import tops.dynamic as dps
+from tops.solvers_sde import EulerDAE_SDE, HeunDAE_SDE, SRA1DAE_SDE, MilsteinDAE_SDE
+
+
+class BrownianPath:
+    # Replaces the random number generator of the solver, to feed increments of one Brownian path at any step size
+    def __init__(self, dw_fine, h_fine, h):
+        m = int(round(h/h_fine))
+        dw = dw_fine.reshape(-1, m, dw_fine.shape[1])
+        w = np.cumsum(dw, axis=1) - dw
+        self.dw = dw.sum(axis=1)
+        dz = ((w + dw/2)*h_fine).sum(axis=1)
+        self.dv = np.sqrt(3)*(2*dz/h - self.dw)
+        self.h = h
+        self.k = 0
+
+    def standard_normal(self, size):
+        # Next block of normalized increments
+        rows = slice(self.k, self.k + size[0])
+        self.k += size[0]
+        if len(size) == 3:
+            return np.stack([self.dw[rows], self.dv[rows]], axis=1)/np.sqrt(self.h)
+        return self.dw[rows]/np.sqrt(self.h)
+
+
+def test_sde_schemes_convergence():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+    speed_idx = ps.gen['GEN'].state_idx_global['speed']
+
+    t_end = 0.5
+    h_fine = 1e-5
+    dw_fine = np.random.default_rng(0).normal(0, np.sqrt(h_fine), (int(round(t_end/h_fine)), 4))
+
+    def simulate(solver, h, b):
+        sol = solver(ps.state_derivatives, ps.solve_algebraic, 0, ps.x_0, max_step=h, dim_w=4, b=b,
+                     rng=BrownianPath(dw_fine, h_fine, h), block_size=int(round(t_end/h)))
+        for _ in range(int(round(t_end/h))):
+            sol.step()
+        return sol.x.copy()
+
+    # Additive noise
+    b = [(idx, 1e-2) for idx in speed_idx]
+    x_ref = simulate(SRA1DAE_SDE, 1e-4, b)
+    err = {solver: np.linalg.norm(simulate(solver, 5e-3, b) - x_ref) for solver in
+           [EulerDAE_SDE, HeunDAE_SDE, SRA1DAE_SDE]}
+    assert err[HeunDAE_SDE] < err[EulerDAE_SDE]
+    assert err[SRA1DAE_SDE] < 0.5*err[EulerDAE_SDE]
+
+    # Multiplicative (Ito) noise
+    def b_mult(t, x, v):
+        mat = np.zeros((len(x), 4))
+        mat[speed_idx, np.arange(4)] = 1e-2*(1 + 10*x[speed_idx])
+        return mat
+
+    x_ref = simulate(MilsteinDAE_SDE, 1e-4, b_mult)
+    err_euler = np.linalg.norm(simulate(EulerDAE_SDE, 1e-2, b_mult) - x_ref)
+    err_milstein = np.linalg.norm(simulate(MilsteinDAE_SDE, 1e-2, b_mult) - x_ref)
+    assert err_milstein < 0.5*err_euler
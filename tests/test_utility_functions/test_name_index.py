@@ -0,0 +1,38 @@
+import numpy as np
+import tops.dynamic as dps
+import tops.utility_functions as dps_uf
+
+
+def test_name_index():
+    names = np.array(['B1', 'B2', 'B3', 'B2'])
+    index = dps_uf.NameIndex(names)
+
+    # Duplicates map to the first occurrence, missing names are dropped (or nan for single names)
+    idx, mask = index.lookup(['B3', 'B4', 'B2'], return_mask=True)
+    assert list(idx) == [2, 1]
+    assert list(mask) == [True, False, True]
+    assert index.lookup(np.array(['B1', 'B3'])).tolist() == [0, 2]
+    assert index.lookup(np.str_('B3')) == 2
+    assert np.isnan(index.lookup('B4'))
+
+    # Integer keys (as for reduced bus indices)
+    assert dps_uf.lookup_strings(np.array([4, 7]), np.array([7, 5, 4])).tolist() == [2, 0]
+
+
+def test_model_name_index():
+    import tops.ps_models.k2a as model_data
+    ps = dps.PowerSystemModel(model=model_data.load())
+    ps.init_dyn_sim()
+
+    assert ps.bus_index.lookup(ps.buses['name'][::-1]).tolist() == list(range(ps.n_bus))[::-1]
+    gen = ps.gen['GEN']
+    assert gen.name_index.lookup('G3') == list(gen.par['name']).index('G3')
+
+    # The index follows replacement of par
+    gen.par = gen.par[::-1].copy()
+    assert gen.name_index.lookup('G3') == list(gen.par['name']).index('G3')
+
+
+if __name__ == '__main__':
+    test_name_index()
+    test_model_name_index()
@@ -0,0 +1,45 @@
+import numpy as np
+import tops.utility_functions as dps_uf
+
+
+def structured_array_from_list_rows(names, entries):
+    # Reference: Row by row construction
+    col_dtypes = [np.array(list(col)).dtype for col in zip(*entries)]
+    return np.array([tuple(entry) for entry in entries], dtype=list(zip(names, col_dtypes)))
+
+
+def test_structured_arrays():
+    import tops.ps_models.n44 as model_data
+    model = model_data.load()
+    for key in ['buses', 'lines', 'generators']:
+        data = model[key] if isinstance(model[key], list) else list(model[key].values())[0]
+        a = dps_uf.structured_array_from_list(data[0], data[1:])
+        a_ref = structured_array_from_list_rows(data[0], data[1:])
+        assert a.dtype == a_ref.dtype
+        assert a.tolist() == a_ref.tolist()
+
+    a = dps_uf.structured_array_from_list(['name', 'K', 'T'], [('A', 1, 0.5), ('BB', 2, 1)])
+    assert a.dtype == np.dtype([('name', '<U2'), ('K', int), ('T', float)])
+
+    # Removing a field gives a view, without copying data
+    b = dps_uf.remove_recarray_field(a, 'K')
+    assert b.dtype.names == ('name', 'T')
+    assert np.shares_memory(a, b)
+
+    c = dps_uf.combine_recarrays(b, np.ones(2, dtype=[('K', float)]))
+    assert c.dtype.names == ('name', 'T', 'K')
+    assert c.dtype.itemsize == a.dtype['name'].itemsize + 16
+    assert c.tolist() == [('A', 0.5, 1.), ('BB', 1., 1.)]
+
+    # replace_str_col gives a new array, with the dtype of the column updated if needed
+    e = dps_uf.replace_str_col(a, 'name', np.array(['C', 'DDD']))
+    assert list(a['name']) == ['A', 'BB'] and list(e['name']) == ['C', 'DDD']
+    assert e.dtype['name'] == np.dtype('<U3') and e.tolist() == [('C', 1, 0.5), ('DDD', 2, 1.)]
+
+    d = dps_uf.concatenate_structured_arrays([a, dps_uf.structured_array_from_list(['name', 'K', 'T'], [('CCC', 3, 2)])])
+    assert d.dtype == np.dtype([('name', '<U3'), ('K', int), ('T', float)])
+    assert d.tolist() == [('A', 1, 0.5), ('BB', 2, 1.), ('CCC', 3, 2.)]
+
+
+if __name__ == '__main__':
+    test_structured_arrays()